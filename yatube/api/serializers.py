@@ -0,0 +1,113 @@
+import json
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from django.db.models import Model, QuerySet
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+class Field(NamedTuple):
+    """Поле ответа: колонки для only(), связь для select_related и
+    функция, достающая значение из объекта.
+    """
+    columns: Tuple[str, ...]
+    related: Optional[str]
+    get: Callable
+
+
+def isoformat(name: str) -> Callable:
+    return lambda obj: getattr(obj, name).isoformat()
+
+
+POST_FIELDS: Dict[str, Field] = {
+    'id': Field(('id',), None, lambda post: post.pk),
+    'text': Field(('text',), None, lambda post: post.text),
+    'pub_date': Field(('pub_date',), None, isoformat('pub_date')),
+    'updated': Field(('updated',), None, isoformat('updated')),
+    'author': Field(
+        ('author', 'author__username'),
+        'author',
+        lambda post: post.author.username
+    ),
+    'group': Field(
+        ('group', 'group__slug'),
+        'group',
+        lambda post: post.group.slug if post.group_id else None
+    ),
+    'image': Field(
+        ('image',),
+        None,
+        lambda post: post.image.url if post.image else None
+    ),
+    'comments_count': Field(
+        ('comments_count',), None, lambda post: post.comments_count
+    ),
+}
+
+COMMENT_FIELDS: Dict[str, Field] = {
+    'id': Field(('id',), None, lambda comment: comment.pk),
+    'post': Field(('post',), None, lambda comment: comment.post_id),
+    'text': Field(('text',), None, lambda comment: comment.text),
+    'created': Field(('created',), None, isoformat('created')),
+    'author': Field(
+        ('author', 'author__username'),
+        'author',
+        lambda comment: comment.author.username
+    ),
+}
+
+
+def parse_fields(
+    value: Optional[str],
+    available: Dict[str, Field]
+) -> Tuple[str, ...]:
+    """Список полей из ?fields=a,b; без параметра - все поля."""
+    if not value:
+        return tuple(available)
+    names = tuple(dict.fromkeys(
+        name.strip() for name in value.split(',') if name.strip()
+    ))
+    unknown = [name for name in names if name not in available]
+    if unknown or not names:
+        raise ApiError(400, f'Неизвестные поля: {", ".join(unknown)}')
+    return names
+
+
+def restrict(
+    queryset: QuerySet,
+    names: Tuple[str, ...],
+    available: Dict[str, Field],
+    key: str
+) -> QuerySet:
+    """Читает из базы только колонки запрошенных полей и ключа курсора
+    и подтягивает JOIN-ом только нужные связи.
+    """
+    columns = {'id', key}
+    related = set()
+    for name in names:
+        field = available[name]
+        columns.update(field.columns)
+        if field.related:
+            related.add(field.related)
+    # select_related() без аргументов тянет все связи, поэтому пустой
+    # набор только сбрасывает JOIN-ы исходного queryset.
+    queryset = queryset.select_related(None)
+    if related:
+        queryset = queryset.select_related(*sorted(related))
+    return queryset.only(*sorted(columns))
+
+
+def serialize(obj: Model, names: Tuple[str, ...], available) -> Dict:
+    return {name: available[name].get(obj) for name in names}
+
+
+def dumps(data) -> bytes:
+    """Компактный JSON: без пробелов и \\u-экранирования кириллицы."""
+    return json.dumps(
+        data, ensure_ascii=False, separators=(',', ':')
+    ).encode()
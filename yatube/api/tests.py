@@ -0,0 +1,155 @@
+import json
+from http import HTTPStatus
+
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+from . import views
+
+
+def read_json(response):
+    if response.streaming:
+        return json.loads(b''.join(response.streaming_content))
+    return json.loads(response.content)
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}',
+                author=cls.author,
+                group=cls.group if i % 2 else None
+            )
+            for i in range(5)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def collect(self, client, url, **params):
+        """Проходит ленту API по курсорам и возвращает все объекты."""
+        results, cursor = [], None
+        while True:
+            if cursor:
+                params['cursor'] = cursor
+            response = client.get(url, params)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            data = read_json(response)
+            results.extend(data['results'])
+            cursor = data['next']
+            if cursor is None:
+                return results
+
+    def test_feeds_paginate_by_cursor(self):
+        """Ленты API листаются курсором и совпадают с лентами сайта."""
+        expected_ids = [post.pk for post in reversed(self.posts)]
+        feeds = {
+            reverse('api:posts'): (self.guest_client, expected_ids),
+            reverse('api:group', args=(self.group.slug,)): (
+                self.guest_client,
+                [pk for pk in expected_ids if pk in (
+                    self.posts[1].pk, self.posts[3].pk
+                )]
+            ),
+            reverse('api:profile', args=(self.author.username,)): (
+                self.guest_client, expected_ids
+            ),
+            reverse('api:follow'): (self.reader_client, expected_ids),
+        }
+        for url, (client, ids) in feeds.items():
+            with self.subTest(url=url):
+                results = self.collect(client, url, limit=2)
+                self.assertEqual([post['id'] for post in results], ids)
+
+    def test_sparse_fields(self):
+        """fields оставляет в ответе только запрошенные поля."""
+        response = self.guest_client.get(
+            reverse('api:posts'), {'fields': 'id,author', 'limit': 1}
+        )
+        self.assertEqual(
+            read_json(response)['results'],
+            [{'id': self.posts[-1].pk, 'author': self.author.username}]
+        )
+        response = self.guest_client.get(
+            reverse('api:post_detail', args=(self.posts[1].pk,)),
+            {'fields': 'text,group'}
+        )
+        self.assertEqual(
+            read_json(response), {'text': 'Пост 1', 'group': 'group'}
+        )
+
+    def test_post_comments(self):
+        """Комментарии поста отдаются страницами от новых к старым."""
+        post = self.posts[0]
+        comments = [
+            Comment.objects.create(
+                post=post, author=self.reader, text=f'Комментарий {i}'
+            )
+            for i in range(3)
+        ]
+        results = self.collect(
+            self.guest_client,
+            reverse('api:post_comments', args=(post.pk,)),
+            limit=2,
+            fields='id,author'
+        )
+        self.assertEqual(
+            results,
+            [
+                {'id': comment.pk, 'author': 'reader'}
+                for comment in reversed(comments)
+            ]
+        )
+
+    def test_errors_are_json(self):
+        """Ошибки запроса отдаются в JSON с нужным статусом."""
+        cases = (
+            (self.guest_client, reverse('api:follow'), {},
+             HTTPStatus.UNAUTHORIZED),
+            (self.guest_client, reverse('api:posts'), {'fields': 'secret'},
+             HTTPStatus.BAD_REQUEST),
+            (self.guest_client, reverse('api:posts'), {'limit': 1000},
+             HTTPStatus.BAD_REQUEST),
+            (self.guest_client, reverse('api:posts'), {'cursor': 'мусор'},
+             HTTPStatus.BAD_REQUEST),
+            (self.guest_client, reverse('api:post_detail', args=(0,)), {},
+             HTTPStatus.NOT_FOUND),
+        )
+        for client, url, params, status in cases:
+            with self.subTest(url=url, params=params):
+                response = client.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', read_json(response))
+
+    def test_posts_feed_is_a_single_query(self):
+        """Страница ленты читается одним запросом без JOIN лишних таблиц."""
+        with self.assertNumQueries(1) as queries:
+            read_json(self.guest_client.get(
+                reverse('api:posts'), {'fields': 'id,text'}
+            ))
+        self.assertNotIn('JOIN', queries.captured_queries[0]['sql'])
+
+    def test_page_is_read_before_streaming(self):
+        """Строки страницы читаются в представлении: при отправке ответа
+        маршрутизация реплик и учет запросов уже не действуют.
+        """
+        request = RequestFactory().get(reverse('api:posts'), {'limit': 2})
+        with self.assertNumQueries(1):
+            response = views.posts(request)
+        with self.assertNumQueries(0):
+            data = read_json(response)
+        self.assertEqual(len(data['results']), 2)
+        self.assertIsNotNone(data['next'])
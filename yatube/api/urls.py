@@ -0,0 +1,22 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('v1/posts/', views.posts, name='posts'),
+    path('v1/posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'v1/posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
+    path('v1/groups/<slug:slug>/posts/', views.group_posts, name='group'),
+    path(
+        'v1/users/<str:username>/posts/',
+        views.profile_posts,
+        name='profile'
+    ),
+    path('v1/follow/', views.follow_posts, name='follow'),
+]
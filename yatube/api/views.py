@@ -0,0 +1,186 @@
+from functools import wraps
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.http import (Http404, HttpRequest, HttpResponse,
+                         StreamingHttpResponse)
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+
+from posts.models import Comment, Group, Post, User
+from posts.timeline import get_timeline_page
+from posts.utils import NEXT, decode_cursor, encode_cursor, keyset_slice
+
+from .serializers import (COMMENT_FIELDS, POST_FIELDS, ApiError, Field,
+                          dumps, parse_fields, restrict, serialize)
+
+CONTENT_TYPE = 'application/json'
+
+
+def api_view(view: Callable) -> Callable:
+    """Только чтение, ошибки отдаются в JSON, а не HTML-страницей."""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            error = ApiError(404, 'Не найдено.')
+        except ApiError as raised:
+            error = raised
+        return HttpResponse(
+            dumps({'detail': error.detail}),
+            status=error.status,
+            content_type=CONTENT_TYPE
+        )
+    return wrapper
+
+
+def get_limit(request: HttpRequest, default: int) -> int:
+    try:
+        limit = int(request.GET.get('limit', default))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= settings.API_MAX_LIMIT:
+        raise ApiError(
+            400, f'limit должен быть от 1 до {settings.API_MAX_LIMIT}.'
+        )
+    return limit
+
+
+def get_position(request: HttpRequest) -> Optional[Tuple]:
+    """Позиция курсора; API листает ленты только вперед."""
+    cursor = request.GET.get('cursor')
+    position = decode_cursor(cursor)
+    if cursor and (position is None or position[0] != NEXT):
+        raise ApiError(400, 'Неверный курсор.')
+    return position
+
+
+class KeysetPage:
+    """Страница ленты по курсору, прочитанная в представлении.
+
+    Строк не больше API_MAX_LIMIT + 1, поэтому их можно держать
+    в памяти: чтения идут, пока действуют маршрутизация реплик и учет
+    запросов, а ошибка базы становится ответом с ошибкой, а не
+    оборванным JSON под статусом 200. Лишняя (limit + 1)-я строка
+    только показывает, что есть следующая страница.
+    """
+
+    def __init__(
+        self,
+        queryset: QuerySet,
+        position: Optional[Tuple],
+        limit: int,
+        key: str
+    ) -> None:
+        objects = list(keyset_slice(queryset, position, limit + 1, key))
+        self.objects = objects[:limit]
+        self.next_cursor: Optional[str] = None
+        if len(objects) > limit:
+            last = self.objects[-1]
+            self.next_cursor = encode_cursor(
+                NEXT, getattr(last, key), last.pk
+            )
+
+    def __iter__(self) -> Iterator:
+        return iter(self.objects)
+
+
+def stream_list(
+    objects: Iterable,
+    page,
+    names: Tuple[str, ...],
+    available: Dict[str, Field]
+) -> StreamingHttpResponse:
+    """Отдает {"results": [...], "next": курсор} по одному объекту,
+    не собирая JSON ответа в памяти. Объекты уже прочитаны из базы,
+    при отправке выполняется только сериализация.
+    """
+    def chunks() -> Iterator[bytes]:
+        yield b'{"results":['
+        separator = b''
+        for obj in objects:
+            yield separator + dumps(serialize(obj, names, available))
+            separator = b','
+        yield b'],"next":' + dumps(page.next_cursor) + b'}'
+
+    return StreamingHttpResponse(chunks(), content_type=CONTENT_TYPE)
+
+
+def stream_posts(
+    request: HttpRequest,
+    queryset: QuerySet
+) -> StreamingHttpResponse:
+    names = parse_fields(request.GET.get('fields'), POST_FIELDS)
+    page = KeysetPage(
+        restrict(queryset, names, POST_FIELDS, 'pub_date'),
+        get_position(request),
+        get_limit(request, settings.NUM_POSTS),
+        'pub_date'
+    )
+    return stream_list(page, page, names, POST_FIELDS)
+
+
+@api_view
+def posts(request):
+    return stream_posts(request, Post.objects.all())
+
+
+@api_view
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return stream_posts(request, group.posts.all())
+
+
+@api_view
+def profile_posts(request, username):
+    author = get_object_or_404(User, username=username)
+    return stream_posts(request, author.posts.all())
+
+
+@api_view
+def follow_posts(request):
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Нужна авторизация.')
+    names = parse_fields(request.GET.get('fields'), POST_FIELDS)
+    get_position(request)
+    page_obj = get_timeline_page(
+        request.user,
+        request.GET.get('cursor'),
+        get_limit(request, settings.NUM_POSTS)
+    )
+    return stream_list(page_obj, page_obj.paginator, names, POST_FIELDS)
+
+
+@api_view
+def post_detail(request, post_id):
+    names = parse_fields(request.GET.get('fields'), POST_FIELDS)
+    post = get_object_or_404(
+        restrict(Post.objects.all(), names, POST_FIELDS, 'pub_date'),
+        pk=post_id
+    )
+    return HttpResponse(
+        dumps(serialize(post, names, POST_FIELDS)),
+        content_type=CONTENT_TYPE
+    )
+
+
+@api_view
+def post_comments(request, post_id):
+    names = parse_fields(request.GET.get('fields'), COMMENT_FIELDS)
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    page = KeysetPage(
+        restrict(
+            Comment.objects.filter(post_id=post_id),
+            names,
+            COMMENT_FIELDS,
+            'created'
+        ),
+        get_position(request),
+        get_limit(request, settings.NUM_COMMENTS),
+        'created'
+    )
+    return stream_list(page, page, names, COMMENT_FIELDS)
@@ -0,0 +1,162 @@
+"""SQLite с настройкой соединения и статистикой блокировок.
+
+ENGINE = 'core.backends.sqlite3' принимает в OPTIONS, кроме параметров
+sqlite3.connect:
+
+- pragmas: словарь PRAGMA, применяемых к каждому новому соединению
+  (journal_mode, synchronous, busy_timeout, mmap_size, cache_size...);
+- transaction_mode: DEFERRED, IMMEDIATE или EXCLUSIVE для BEGIN
+  в transaction.atomic. При IMMEDIATE блокировка записи берется в начале
+  транзакции и ожидается по busy_timeout. Отложенная транзакция, которая
+  сначала читает, а потом пишет, в WAL сразу получает «database is
+  locked», если другой писатель успел зафиксировать изменения.
+
+Время открытия соединений и ожидания блокировки записи копится по
+псевдониму базы во всем процессе: connections[alias].get_stats().
+"""
+import re
+import threading
+import time
+from typing import Dict
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+Database = base.Database
+
+PRAGMA_NAME_RE = re.compile(r'^[a-z_]+$')
+PRAGMA_VALUE_RE = re.compile(r'^-?\w+$')
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+def apply_pragmas(connection: Database.Connection, pragmas: dict) -> None:
+    """Выполняет PRAGMA name = value для каждого элемента pragmas."""
+    for name, value in pragmas.items():
+        value = str(value)
+        if not (PRAGMA_NAME_RE.match(name) and PRAGMA_VALUE_RE.match(value)):
+            raise ImproperlyConfigured(f'Недопустимая PRAGMA {name}={value}')
+        connection.execute(f'PRAGMA {name} = {value}').fetchall()
+
+
+def is_lock_error(error: Exception) -> bool:
+    return 'database is locked' in str(error)
+
+
+class ConnectionStats:
+    """Счетчики соединений одной базы, общие для всех потоков."""
+    FIELDS = (
+        'connects', 'connect_time', 'connect_time_max',
+        'lock_waits', 'lock_wait_time', 'lock_wait_time_max',
+        'lock_timeouts',
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats = dict.fromkeys(self.FIELDS, 0)
+
+    def record_connect(self, seconds: float) -> None:
+        self._record('connects', 'connect_time', seconds)
+
+    def record_lock_wait(self, seconds: float) -> None:
+        self._record('lock_waits', 'lock_wait_time', seconds)
+
+    def record_lock_timeout(self) -> None:
+        with self._lock:
+            self._stats['lock_timeouts'] += 1
+
+    def _record(self, counter: str, total: str, seconds: float) -> None:
+        with self._lock:
+            self._stats[counter] += 1
+            self._stats[total] += seconds
+            self._stats[f'{total}_max'] = max(
+                self._stats[f'{total}_max'], seconds
+            )
+
+    def get(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        for counter, total in (
+            ('connects', 'connect_time'), ('lock_waits', 'lock_wait_time')
+        ):
+            stats[f'{total}_avg'] = (
+                stats[total] / stats[counter] if stats[counter] else None
+            )
+        return stats
+
+
+_stats: Dict[str, ConnectionStats] = {}
+_stats_lock = threading.Lock()
+
+
+def get_connection_stats(alias: str) -> ConnectionStats:
+    with _stats_lock:
+        return _stats.setdefault(alias, ConnectionStats())
+
+
+class SQLiteCursorWrapper(base.SQLiteCursorWrapper):
+    """Считает запросы, не дождавшиеся блокировки (busy_timeout)."""
+    stats = None
+
+    def execute(self, query, params=None):
+        try:
+            return super().execute(query, params)
+        except Database.OperationalError as error:
+            if is_lock_error(error):
+                self.stats.record_lock_timeout()
+            raise
+
+    def executemany(self, query, param_list):
+        try:
+            return super().executemany(query, param_list)
+        except Database.OperationalError as error:
+            if is_lock_error(error):
+                self.stats.record_lock_timeout()
+            raise
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = get_connection_stats(self.alias)
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        self.transaction_mode = params.pop(
+            'transaction_mode', 'DEFERRED'
+        ).upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'transaction_mode: ожидается одно из {TRANSACTION_MODES}'
+            )
+        return params
+
+    def get_new_connection(self, conn_params):
+        started = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        apply_pragmas(connection, self.pragmas)
+        self.stats.record_connect(time.perf_counter() - started)
+        return connection
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=SQLiteCursorWrapper)
+        cursor.stats = self.stats
+        return cursor
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode == 'DEFERRED':
+            self.cursor().execute('BEGIN')
+            return
+        # Ожидание блокировки записи целиком приходится на BEGIN.
+        started = time.perf_counter()
+        try:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        finally:
+            self.stats.record_lock_wait(time.perf_counter() - started)
+
+    def get_stats(self) -> dict:
+        return self.stats.get()
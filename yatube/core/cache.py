@@ -0,0 +1,202 @@
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Как и у LocMemCache, локальный уровень общий для всех потоков процесса:
+# django.core.cache.caches создает отдельный экземпляр бэкенда на поток.
+_local_caches = {}
+_generations = {}
+_stats = {}
+_locks = {}
+
+GENERATION_KEY = 'tiered:generation:{namespace}'
+_MISSING = object()
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кэш: маленький LRU в памяти процесса (L1) поверх
+    общего для всех воркеров кэша (L2, любой другой алиас из CACHES).
+
+    У каждого пространства ключей (namespace) свое поколение в L2.
+    Перезапись, incr и удаление существующего ключа меняют поколение
+    его пространства, а L1 перечитывает поколения известных ему
+    пространств не чаще раза в GENERATION_CHECK_INTERVAL секунд
+    и отбрасывает записи старого поколения. Так изменение в одном
+    воркере инвалидирует L1 остальных, не задевая ключи других
+    пространств. Первое заполнение ключа поколение не меняет: ключа
+    еще нет в L2, значит, и в L1 других воркеров его нет дольше
+    L1_TIMEOUT.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._l1_max_entries = options.get('L1_MAX_ENTRIES', 1000)
+        self._l1_timeout = options.get('L1_TIMEOUT', 60)
+        self._check_interval = options.get('GENERATION_CHECK_INTERVAL', 1)
+        self._local = _local_caches.setdefault(location, OrderedDict())
+        self._generations = _generations.setdefault(
+            location, {'checked': 0, 'values': {}}
+        )
+        self._stats = _stats.setdefault(location, dict.fromkeys(
+            ('l1_hits', 'l1_misses', 'l2_hits', 'l2_misses'), 0
+        ))
+        self._lock = _locks.setdefault(location, threading.Lock())
+
+    @property
+    def shared(self) -> BaseCache:
+        return caches[self._shared_alias]
+
+    @staticmethod
+    def namespace(key: str) -> str:
+        """Пространство ключа: часть до первого ':' ('feed_version:index'
+        -> 'feed_version'), а у ключей без ':' - до последней точки
+        (фрагменты шаблонов: 'template.cache.index_page.<hash>').
+        """
+        key = str(key)
+        if ':' in key:
+            return key.split(':', 1)[0]
+        return key.rsplit('.', 1)[0]
+
+    def _refresh_generations(self) -> None:
+        now = time.monotonic()
+        if now - self._generations['checked'] < self._check_interval:
+            return
+        namespaces = list(self._generations['values'])
+        values = self.shared.get_many([
+            GENERATION_KEY.format(namespace=namespace)
+            for namespace in namespaces
+        ])
+        self._generations['values'] = {
+            namespace: values.get(GENERATION_KEY.format(namespace=namespace))
+            for namespace in namespaces
+        }
+        self._generations['checked'] = now
+
+    def _generation(self, namespace: str):
+        self._refresh_generations()
+        values = self._generations['values']
+        if namespace not in values:
+            values[namespace] = self.shared.get(
+                GENERATION_KEY.format(namespace=namespace)
+            )
+        return values[namespace]
+
+    def _bump_generation(self, namespace: str) -> str:
+        generation = uuid.uuid4().hex
+        self.shared.set(
+            GENERATION_KEY.format(namespace=namespace), generation, None
+        )
+        self._generations['values'][namespace] = generation
+        return generation
+
+    def _store_local(self, local_key, value, generation, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            timeout = self._l1_timeout
+        expires = time.monotonic() + min(timeout, self._l1_timeout)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[local_key] = (pickled, expires, generation)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self._l1_max_entries:
+                self._local.popitem(last=False)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_key(key, version=version)
+        self.validate_key(local_key)
+        generation = self._generation(self.namespace(key))
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is not None:
+                pickled, expires, entry_generation = entry
+                if (
+                    expires > time.monotonic()
+                    and entry_generation == generation
+                ):
+                    self._local.move_to_end(local_key)
+                    self._stats['l1_hits'] += 1
+                    return pickle.loads(pickled)
+                del self._local[local_key]
+            self._stats['l1_misses'] += 1
+
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self._count('l2_misses')
+            return default
+        self._count('l2_hits')
+        self._store_local(local_key, value, generation, DEFAULT_TIMEOUT)
+        return value
+
+    def _after_write(
+        self, key, version, value=_MISSING, timeout=None, bump=True
+    ):
+        local_key = self.make_key(key, version=version)
+        namespace = self.namespace(key)
+        if bump:
+            generation = self._bump_generation(namespace)
+        else:
+            generation = self._generation(namespace)
+        with self._lock:
+            self._local.pop(local_key, None)
+        if value is not _MISSING and timeout != 0:
+            self._store_local(local_key, value, generation, timeout)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # add вместо отдельной проверки: заполнение нового ключа стоит
+        # одной записи в L2 и не сбрасывает L1 других воркеров.
+        if self.shared.add(key, value, timeout, version=version):
+            self._after_write(key, version, value, timeout, bump=False)
+            return
+        self.shared.set(key, value, timeout, version=version)
+        self._after_write(key, version, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._after_write(key, version, value, timeout, bump=False)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        existed = self.shared.has_key(key, version=version)
+        self.shared.delete(key, version=version)
+        self._after_write(key, version, bump=existed)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        self._after_write(key, version)
+        return value
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def clear(self):
+        self.shared.clear()
+        with self._lock:
+            self._local.clear()
+            self._generations['values'] = {}
+            self._generations['checked'] = 0
+
+    def get_stats(self) -> dict:
+        """Попадания и промахи по уровням для текущего процесса."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['l1_entries'] = len(self._local)
+        for tier in ('l1', 'l2'):
+            total = stats[f'{tier}_hits'] + stats[f'{tier}_misses']
+            stats[f'{tier}_hit_ratio'] = (
+                stats[f'{tier}_hits'] / total if total else None
+            )
+        return stats
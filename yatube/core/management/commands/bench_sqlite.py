@@ -0,0 +1,155 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.backends.sqlite3.base import apply_pragmas, is_lock_error
+
+SCHEMA = '''
+    CREATE TABLE post (
+        id INTEGER PRIMARY KEY,
+        text TEXT NOT NULL,
+        comments_count INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE comment (
+        id INTEGER PRIMARY KEY,
+        post_id INTEGER NOT NULL REFERENCES post (id),
+        text TEXT NOT NULL
+    );
+    CREATE INDEX comment_post_idx ON comment (post_id, id);
+'''
+READ_SQL = '''
+    SELECT post.text, post.comments_count, comment.text
+    FROM post LEFT JOIN comment ON comment.post_id = post.id
+    WHERE post.id = ? ORDER BY comment.id DESC LIMIT 20
+'''
+# Как add_comment: чтение поста, затем запись в той же транзакции.
+WRITE_SQL = (
+    'SELECT comments_count FROM post WHERE id = ?',
+    "INSERT INTO comment (post_id, text) VALUES (?, 'Комментарий')",
+    'UPDATE post SET comments_count = comments_count + 1 WHERE id = ?',
+)
+SCENARIOS = {
+    # Настройки sqlite3 и Django по умолчанию.
+    'по умолчанию': ({'journal_mode': 'delete'}, 'BEGIN'),
+    'SQLITE_PRAGMAS': (settings.SQLITE_PRAGMAS, 'BEGIN IMMEDIATE'),
+}
+
+
+def run_worker(path, pragmas, begin, writer, posts, deadline, seed):
+    """Выполняет операции до deadline: (операций, ошибок блокировки)."""
+    rnd = random.Random(seed)
+    connection = sqlite3.connect(path, isolation_level=None)
+    apply_pragmas(connection, pragmas)
+    done = errors = 0
+    while time.time() < deadline:
+        post_id = rnd.randint(1, posts)
+        try:
+            if writer:
+                connection.execute(begin)
+                for sql in WRITE_SQL:
+                    connection.execute(sql, (post_id,))
+                connection.execute('COMMIT')
+            else:
+                connection.execute(READ_SQL, (post_id,)).fetchall()
+            done += 1
+        except sqlite3.OperationalError as error:
+            if not is_lock_error(error):
+                raise
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            errors += 1
+    connection.close()
+    return done, errors
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность чтения и записи SQLite '
+        'при параллельных процессах с настройками по умолчанию '
+        'и с SQLITE_PRAGMAS. Работает на временной базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--duration', type=float, default=5.0,
+            help='Длительность каждого сценария, секунды.'
+        )
+
+    def handle(self, *args, **options):
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for number, (name, (pragmas, begin)) in enumerate(
+                SCENARIOS.items()
+            ):
+                path = os.path.join(directory, f'bench_{number}.sqlite3')
+                self.seed(path, pragmas, options)
+                results[name] = self.run_scenario(
+                    path, pragmas, begin, options
+                )
+                self.stdout.write(
+                    self.style.MIGRATE_HEADING(name) + ' ' + self.format(
+                        results[name], options['duration']
+                    )
+                )
+
+        baseline, tuned = (results[name] for name in SCENARIOS)
+        for index, kind in enumerate(('чтение', 'запись')):
+            gain = (
+                tuned[index][0] / baseline[index][0]
+                if baseline[index][0] else float('inf')
+            )
+            self.stdout.write(f'{kind}: x{gain:.2f}')
+
+    def seed(self, path, pragmas, options):
+        connection = sqlite3.connect(path, isolation_level=None)
+        apply_pragmas(connection, pragmas)
+        connection.executescript(SCHEMA)
+        connection.execute('BEGIN')
+        connection.executemany(
+            'INSERT INTO post (id, text) VALUES (?, ?)',
+            ((i, f'Пост {i}') for i in range(1, options['posts'] + 1))
+        )
+        connection.executemany(
+            'INSERT INTO comment (post_id, text) VALUES (?, ?)',
+            (
+                (i % options['posts'] + 1, f'Комментарий {i}')
+                for i in range(options['comments'])
+            )
+        )
+        connection.execute('COMMIT')
+        connection.close()
+
+    def run_scenario(self, path, pragmas, begin, options):
+        workers = [False] * options['readers'] + [True] * options['writers']
+        deadline = time.time() + options['duration']
+        with multiprocessing.Pool(len(workers)) as pool:
+            outcomes = pool.starmap(run_worker, (
+                (path, pragmas, begin, writer, options['posts'], deadline,
+                 seed)
+                for seed, writer in enumerate(workers)
+            ))
+        reads = [o for o, writer in zip(outcomes, workers) if not writer]
+        writes = [o for o, writer in zip(outcomes, workers) if writer]
+        return tuple(
+            (sum(done for done, _ in part), sum(err for _, err in part))
+            for part in (reads, writes)
+        )
+
+    @staticmethod
+    def format(result, duration):
+        (reads, read_errors), (writes, write_errors) = result
+        return (
+            f'чтений/с: {reads / duration:.0f}, '
+            f'записей/с: {writes / duration:.0f}, '
+            f'ошибок блокировки: {read_errors + write_errors}'
+        )
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.tasks import (MAX_ATTEMPTS, claim_task, requeue_stale_tasks,
+                        run_pending_tasks, run_task)
+
+
+class Command(BaseCommand):
+    help = 'Фоновый воркер очереди задач.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить готовые задачи и выйти.'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Пауза между опросами пустой очереди, секунды.'
+        )
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS)
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_tasks()
+        if requeued:
+            self.stdout.write(f'Возвращено в очередь: {requeued}')
+        if options['once']:
+            processed = run_pending_tasks(options['max_attempts'])
+            self.stdout.write(f'Выполнено задач: {processed}')
+            return
+        while True:
+            claimed = claim_task()
+            if claimed is None:
+                time.sleep(options['sleep'])
+                continue
+            run_task(claimed, options['max_attempts'])
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.routers import sync_replicas
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу в реплики из DATABASE_REPLICAS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Повторять копирование каждые N секунд; 0 - один раз.'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('DATABASE_REPLICAS пуст.')
+        while True:
+            beat = sync_replicas()
+            self.stdout.write(
+                f'Реплики обновлены: {", ".join(settings.DATABASE_REPLICAS)}'
+                f' ({beat:%H:%M:%S})'
+            )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
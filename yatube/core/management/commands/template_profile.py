@@ -0,0 +1,91 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.templateprof import TEMPLATE_ROW, aggregate, read_profiles
+
+SORT_KEYS = {
+    'self': lambda row: row[2],
+    'cumulative': lambda row: row[1],
+    'calls': lambda row: row[0],
+    'avg': lambda row: row[1] / row[0],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Отчет профилировщика шаблонов (TEMPLATE_PROFILE) по всем '
+        'записанным запросам.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sort', choices=sorted(SORT_KEYS), default='self',
+            help='Порядок строк: собственное или полное время, вызовы, '
+                 'среднее полное время вызова.'
+        )
+        parser.add_argument('--limit', type=int, default=30)
+        parser.add_argument(
+            '--view',
+            help='Только запросы представления, например '
+                 'posts.views.index.'
+        )
+        parser.add_argument(
+            '--by-tag', action='store_true',
+            help='Свести разные места к имени тега, фильтра или шаблона.'
+        )
+        parser.add_argument(
+            '--file', default=settings.TEMPLATE_PROFILE_FILE
+        )
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Удалить записанные профили.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['file']
+        if options['reset']:
+            if os.path.exists(path):
+                os.remove(path)
+            self.stdout.write('Профили удалены.')
+            return
+        if not os.path.exists(path):
+            raise CommandError(
+                f'Нет профилей в {path}: включите TEMPLATE_PROFILE.'
+            )
+        requests, rows = aggregate(
+            read_profiles(path), options['view'], options['by_tag']
+        )
+        if not requests:
+            self.stdout.write('Нет запросов с рендерингом шаблонов.')
+            return
+        total = sum(own for _, _, own in rows.values())
+        self.stdout.write(
+            f'Запросов: {requests}, рендеринг: {total * 1000:.1f} мс, '
+            f'в среднем {total * 1000 / requests:.2f} мс на запрос'
+        )
+        self.stdout.write(
+            f'{"вызовы":>9} {"полное, мс":>11} {"своё, мс":>10} '
+            f'{"своё, %":>8}  место'
+        )
+        ordered = sorted(
+            rows.items(),
+            key=lambda item: SORT_KEYS[options['sort']](item[1]),
+            reverse=True
+        )
+        for key, (calls, cumulative, own) in ordered[:options['limit']]:
+            self.stdout.write(
+                f'{calls:>9} {cumulative * 1000:>11.2f} {own * 1000:>10.2f} '
+                f'{own / total * 100 if total else 0:>8.1f}  '
+                f'{self.location(key)}'
+            )
+
+    @staticmethod
+    def location(key):
+        if len(key) == 1:
+            return key[0]
+        name, line, label = key
+        if label == TEMPLATE_ROW:
+            return f'{name} {label}'
+        return f'{name}:{line} {label}'
@@ -0,0 +1,175 @@
+import json
+import logging
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+
+from .querytrace import QueryTracer
+from .routers import (PRIMARY_PIN_COOKIE, RoutingState, enter_request,
+                      leave_request)
+from .templateprof import (append_profile, install_hooks, start_profile,
+                           stop_profile)
+from .writer import WriteTimeout
+
+logger = logging.getLogger('core.querytrace')
+
+
+class QueryTraceMiddleware:
+    """Считает SQL-запросы каждого запроса и пишет в лог структурированную
+    запись, если представление превысило свой бюджет (@query_budget)
+    или QUERY_BUDGET_DEFAULT.
+
+    Сводка доступна в request.query_trace.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_TRACE:
+            return self.get_response(request)
+        tracer = QueryTracer()
+        request.query_budget = settings.QUERY_BUDGET_DEFAULT
+        request.query_view = None
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(tracer))
+            response = self.get_response(request)
+        request.query_trace = tracer.summary(request.query_budget)
+        if request.query_trace['over_budget']:
+            record = {
+                'view': request.query_view,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                **request.query_trace,
+            }
+            logger.warning(
+                'Превышен бюджет запросов: %s',
+                json.dumps(record, ensure_ascii=False),
+                extra={'query_trace': record},
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.QUERY_TRACE:
+            return None
+        budget = getattr(view_func, 'query_budget', None)
+        if budget is not None:
+            request.query_budget = budget
+        request.query_view = (
+            f'{view_func.__module__}.{view_func.__qualname__}'
+        )
+        return None
+
+
+class WriteQueueMiddleware:
+    """Изменение, не дождавшееся очереди записи (WriteTimeout), отменено:
+    клиент получает 503 и может повторить запрос.
+    """
+
+    def __init__(self, get_response):
+        if not settings.WRITE_QUEUE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, WriteTimeout):
+            return None
+        response = HttpResponse(
+            'Сервис перегружен, повторите запрос.',
+            status=HTTPStatus.SERVICE_UNAVAILABLE,
+            content_type='text/plain; charset=utf-8',
+        )
+        response['Retry-After'] = '1'
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Разрешает чтение с реплик для GET/HEAD-запросов (core.routers).
+
+    Запрос, который что-то записал, выдает cookie с временем записи:
+    следующие запросы клиента читают с основной базы, пока реплики
+    не догонят эту запись.
+    """
+    SAFE_METHODS = ('GET', 'HEAD')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState(
+            use_replicas=(
+                bool(settings.DATABASE_REPLICAS)
+                and request.method in self.SAFE_METHODS
+            ),
+            written_after=self.written_after(request),
+        )
+        token = enter_request(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            leave_request(token)
+        if state.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE,
+                str(datetime.now(timezone.utc).timestamp()),
+                max_age=settings.REPLICA_MAX_LAG,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    @staticmethod
+    def written_after(request):
+        try:
+            return datetime.fromtimestamp(
+                float(request.COOKIES[PRIMARY_PIN_COOKIE]), timezone.utc
+            )
+        except (KeyError, ValueError, OverflowError, OSError):
+            return None
+
+
+class TemplateProfileMiddleware:
+    """Профилирует рендеринг шаблонов каждого запроса (core.templateprof)
+    и дописывает профиль в TEMPLATE_PROFILE_FILE.
+
+    Профиль запроса доступен в request.template_profile.
+    """
+
+    def __init__(self, get_response):
+        if not settings.TEMPLATE_PROFILE:
+            raise MiddlewareNotUsed
+        install_hooks()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.template_view = None
+        profile, token = start_profile()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_profile(token)
+        request.template_profile = profile
+        if profile.rows:
+            append_profile(settings.TEMPLATE_PROFILE_FILE, {
+                'view': request.template_view,
+                'path': request.path,
+                'total': profile.total,
+                'rows': profile.as_rows(),
+            })
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.template_view = (
+            f'{view_func.__module__}.{view_func.__qualname__}'
+        )
+        return None
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.6 on 2026-10-18 05:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_mediablob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplicaHeartbeat',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('beat', models.DateTimeField(verbose_name='Метка')),
+            ],
+            options={
+                'verbose_name': 'Метка репликации',
+                'verbose_name_plural': 'Метки репликации',
+            },
+        ),
+    ]
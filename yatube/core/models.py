@@ -0,0 +1,67 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Отложенная задача для фонового воркера (manage.py run_tasks)."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Задача', max_length=200)
+    payload = models.TextField('Аргументы', default='{}')
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField('Попытки', default=0)
+    run_after = models.DateTimeField('Не раньше', default=timezone.now)
+    started = models.DateTimeField('Начата', blank=True, null=True)
+    error = models.TextField('Ошибка', blank=True)
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        indexes = [
+            models.Index(
+                fields=['status', 'run_after', 'id'],
+                name='task_queue_idx',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.status})'
+
+
+class MediaBlob(models.Model):
+    """Число ссылок на файл в ContentAddressedStorage."""
+    name = models.CharField('Файл', max_length=255, unique=True)
+    refcount = models.PositiveIntegerField('Число ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.refcount})'
+
+
+class ReplicaHeartbeat(models.Model):
+    """Метка времени основной базы. Ее копия на реплике показывает,
+    насколько реплика отстает (core.routers).
+    """
+    beat = models.DateTimeField('Метка')
+
+    class Meta:
+        verbose_name = 'Метка репликации'
+        verbose_name_plural = 'Метки репликации'
+
+    def __str__(self) -> str:
+        return f'{self.beat:%Y-%m-%d %H:%M:%S}'
@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, Optional
+
+import django
+from django.conf import settings
+
+DJANGO_DIR = os.path.dirname(django.__file__)
+TRACING_FILES = {
+    os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'middleware.py'),
+}
+
+
+def query_budget(max_queries: int) -> Callable:
+    """Объявляет, сколько SQL-запросов допустимо для представления.
+
+    QueryTraceMiddleware пишет в лог запросы, превысившие бюджет.
+    Атрибут переносится functools.wraps, поэтому порядок относительно
+    login_required и transaction.atomic не важен.
+    """
+    def decorator(view: Callable) -> Callable:
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+_project_paths: Dict[str, Optional[str]] = {}
+
+
+def project_path(filename: str) -> Optional[str]:
+    """Путь файла относительно проекта или None для Django, библиотек
+    и самого трассировщика. Результат кэшируется по имени файла.
+    """
+    if filename not in _project_paths:
+        path = os.path.abspath(filename)
+        _project_paths[filename] = (
+            None if (
+                path in TRACING_FILES
+                or path.startswith(DJANGO_DIR)
+                or 'site-packages' in path
+                or not path.startswith(settings.BASE_DIR)
+            ) else os.path.relpath(path, settings.BASE_DIR)
+        )
+    return _project_paths[filename]
+
+
+def find_call_site() -> str:
+    """Ближайший к запросу кадр кода проекта: файл, строка, функция.
+
+    Кадры обходятся напрямую, без traceback.extract_stack, который
+    читает исходники.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        path = project_path(frame.f_code.co_filename)
+        if path is not None:
+            return f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return 'unknown'
+
+
+class QueryTracer:
+    """Обертка execute_wrapper: время, SQL и место вызова каждого
+    запроса.
+    """
+
+    def __init__(self) -> None:
+        self.queries: List[Dict] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'params': repr(params),
+                'duration': time.perf_counter() - started,
+                'call_site': find_call_site(),
+            })
+
+    def summary(self, budget: Optional[int] = None) -> Dict:
+        """Число запросов, суммарное время в мс и повторы.
+
+        duplicates - один и тот же SQL с теми же параметрами,
+        similar - один SQL с разными параметрами (признак N+1).
+        """
+        exact = Counter((query['sql'], query['params'])
+                        for query in self.queries)
+        call_sites = defaultdict(set)
+        by_sql = Counter()
+        for query in self.queries:
+            call_sites[query['sql']].add(query['call_site'])
+            by_sql[query['sql']] += 1
+        return {
+            'queries': len(self.queries),
+            'db_time_ms': round(
+                sum(query['duration'] for query in self.queries) * 1000, 3
+            ),
+            'budget': budget,
+            'over_budget': budget is not None and len(self.queries) > budget,
+            'duplicates': [
+                {
+                    'sql': sql,
+                    'count': count,
+                    'call_sites': sorted(call_sites[sql]),
+                }
+                for (sql, _), count in exact.most_common() if count > 1
+            ],
+            'similar': [
+                {
+                    'sql': sql,
+                    'count': count,
+                    'call_sites': sorted(call_sites[sql]),
+                }
+                for sql, count in by_sql.most_common() if count > 1
+            ],
+        }
@@ -0,0 +1,194 @@
+"""Чтение с реплик базы для GET-запросов.
+
+ReplicaRoutingMiddleware открывает на время запроса состояние маршрутизации.
+Реплики получают только чтения GET/HEAD-запросов, всё остальное
+(записи, команды manage.py, фоновые задачи) идет в default.
+
+Отставание реплики - возраст метки ReplicaHeartbeat в ее копии: метку
+на основной базе обновляет sync_replicas перед копированием. Реплика
+старше REPLICA_MAX_LAG не используется. После записи клиент получает
+cookie с ее временем и читает только с реплик, которые уже содержат
+метку не старше этой записи (read-your-writes).
+
+Кэши, ключ которых - версия ленты, не должны заполняться с реплики:
+иначе отставшая копия закрепится под новой версией до следующей правки.
+Такие кэши либо заполняются внутри read_primary(), либо добавляют
+к ключу read_position().
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils import timezone
+
+from .models import ReplicaHeartbeat
+
+PRIMARY_PIN_COOKIE = 'primary_since'
+
+
+class RoutingState:
+    """Маршрутизация одного HTTP-запроса."""
+    __slots__ = ('use_replicas', 'written_after', 'alias', 'wrote')
+
+    def __init__(
+        self,
+        use_replicas: bool,
+        written_after: Optional[datetime] = None
+    ):
+        self.use_replicas = use_replicas
+        self.written_after = written_after
+        self.alias: Optional[str] = None
+        self.wrote = False
+
+
+_state: ContextVar = ContextVar('db_routing', default=None)
+
+
+def enter_request(state: RoutingState):
+    return _state.set(state)
+
+
+def leave_request(token) -> None:
+    _state.reset(token)
+
+
+def note_write() -> None:
+    """Запрос пишет: дальше он и его клиент читают с основной базы."""
+    state = _state.get()
+    if state is not None:
+        state.wrote = True
+        state.use_replicas = False
+        state.alias = None
+
+
+class ReplicaLag:
+    """Метки реплик, прочитанные не чаще REPLICA_LAG_CHECK_INTERVAL."""
+
+    def __init__(self):
+        self._beats: Dict[str, Tuple[float, Optional[datetime]]] = {}
+
+    def beat(self, alias: str) -> Optional[datetime]:
+        """Метка реплики; None, если реплика недоступна или пуста."""
+        checked, beat = self._beats.get(alias, (None, None))
+        now = time.monotonic()
+        if (checked is None
+                or now - checked >= settings.REPLICA_LAG_CHECK_INTERVAL):
+            try:
+                beat = ReplicaHeartbeat.objects.using(alias).values_list(
+                    'beat', flat=True
+                ).first()
+            except DatabaseError:
+                beat = None
+            self._beats[alias] = (now, beat)
+        return beat
+
+    def forget(self) -> None:
+        self._beats.clear()
+
+
+replica_lag = ReplicaLag()
+
+
+def choose_replica(written_after: Optional[datetime] = None) -> Optional[str]:
+    """Случайная реплика с допустимым отставанием, содержащая записи
+    клиента; None - читать с основной базы.
+    """
+    fresh_since = timezone.now() - timedelta(
+        seconds=settings.REPLICA_MAX_LAG
+    )
+    if written_after is not None:
+        fresh_since = max(fresh_since, written_after)
+    candidates = []
+    for alias in settings.DATABASE_REPLICAS:
+        beat = replica_lag.beat(alias)
+        if beat is not None and beat >= fresh_since:
+            candidates.append(alias)
+    return random.choice(candidates) if candidates else None
+
+
+def read_alias() -> str:
+    """База, с которой читает текущий запрос."""
+    state = _state.get()
+    if state is None or not state.use_replicas:
+        return DEFAULT_DB_ALIAS
+    if state.alias is None:
+        # Одна реплика на весь запрос: все чтения видят один снимок.
+        state.alias = choose_replica(state.written_after) or (
+            DEFAULT_DB_ALIAS
+        )
+    return state.alias
+
+
+def read_position() -> str:
+    """Снимок, который читает запрос: default или реплика с ее меткой.
+
+    Метка меняется с каждой копией, поэтому ключ с read_position()
+    не переживает обновление реплики.
+    """
+    alias = read_alias()
+    if alias == DEFAULT_DB_ALIAS:
+        return alias
+    return f'{alias}@{replica_lag.beat(alias)}'
+
+
+@contextmanager
+def read_primary():
+    """Чтения внутри блока идут в default; после него запрос снова
+    читает со своей реплики, если ничего не записал.
+    """
+    state = _state.get()
+    if state is None or not state.use_replicas:
+        yield
+        return
+    state.use_replicas = False
+    try:
+        yield
+    finally:
+        state.use_replicas = not state.wrote
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        note_write()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему вместе с копией файла основной базы.
+        return db not in settings.DATABASE_REPLICAS
+
+
+def touch_heartbeat(now: Optional[datetime] = None) -> datetime:
+    """Обновляет метку на основной базе."""
+    now = now or timezone.now()
+    ReplicaHeartbeat.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+        pk=1, defaults={'beat': now}
+    )
+    return now
+
+
+def copy_database(alias: str, source: str = DEFAULT_DB_ALIAS) -> None:
+    """Копирует базу source в реплику alias через sqlite3 backup:
+    копия согласованна, читатели реплики не видят ее наполовину.
+    """
+    for name in (source, alias):
+        connections[name].ensure_connection()
+    connections[source].connection.backup(connections[alias].connection)
+
+
+def sync_replicas(now: Optional[datetime] = None) -> datetime:
+    """Обновляет метку и копирует основную базу во все реплики."""
+    beat = touch_heartbeat(now)
+    for alias in settings.DATABASE_REPLICAS:
+        copy_database(alias)
+    return beat
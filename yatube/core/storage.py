@@ -0,0 +1,108 @@
+import hashlib
+import os
+import posixpath
+import uuid
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage, Storage
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+from .models import MediaBlob
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, где имя файла - хэш его содержимого.
+
+    Файл кладется в upload_to/ab/cd/<sha256>.<ext>: вложенные каталоги
+    не дают разрастись одному каталогу, а одинаковые загрузки получают
+    одно имя и пишутся на диск один раз.
+    """
+    SHARD_DEPTH = 2
+    SHARD_WIDTH = 2
+
+    def hashed_name(self, name: str, content: File) -> str:
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        shards = [
+            digest[i * self.SHARD_WIDTH:(i + 1) * self.SHARD_WIDTH]
+            for i in range(self.SHARD_DEPTH)
+        ]
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(
+            posixpath.dirname(name), *shards, digest + extension
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        return self._save(self.hashed_name(name, content), content)
+
+    def _save(self, name, content):
+        # Файл без ссылок может ждать удаления в delete_orphan: такой
+        # файл пишется заново. Проверка и acquire_blob идут в одной
+        # транзакции write() под блокировкой записи, поэтому удаление
+        # не вклинится между ними.
+        if self.exists(name) and MediaBlob.objects.using(
+            DEFAULT_DB_ALIAS
+        ).filter(name=name, refcount__gt=0).exists():
+            return name
+        # Пишем во временный файл и атомарно переименовываем: параллельная
+        # загрузка того же содержимого перезапишет файл тем же байтами.
+        temp_name = super()._save(f'{name}.{uuid.uuid4().hex}.tmp', content)
+        os.replace(self.path(temp_name), self.path(name))
+        return name
+
+
+def acquire_blob(name: str) -> None:
+    """Увеличивает число ссылок на файл. Вызывается в той же транзакции
+    записи, что и сохранение файла в хранилище.
+    """
+    blobs = MediaBlob.objects.filter(name=name)
+    if blobs.update(refcount=F('refcount') + 1):
+        return
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(name=name, refcount=1)
+    except IntegrityError:
+        blobs.update(refcount=F('refcount') + 1)
+
+
+def release_blob(name: str, storage: Storage) -> None:
+    """Уменьшает число ссылок на файл; файл без ссылок удаляется после
+    коммита.
+    """
+    blobs = MediaBlob.objects.filter(name=name)
+    if blobs.filter(refcount__gt=1).update(refcount=F('refcount') - 1):
+        return
+    deleted, _ = blobs.delete()
+    if deleted:
+        transaction.on_commit(lambda: delete_orphan(name, storage))
+
+
+def delete_orphan(name: str, storage: Storage) -> None:
+    """Удаляет файл, если на него так и не появилось ссылок.
+
+    Проверка и удаление выполняются в транзакции основной базы, то есть
+    под блокировкой записи (BEGIN IMMEDIATE): загрузка того же
+    содержимого либо уже записала ссылку, либо запишет файл заново
+    после удаления.
+    """
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        # Пока ждали коммита, тот же файл мог загрузить кто-то еще.
+        if MediaBlob.objects.using(DEFAULT_DB_ALIAS).filter(
+            name=name
+        ).exists():
+            return
+        try:
+            storage.delete(name)
+        except SuspiciousFileOperation:
+            # Имя указывает за пределы хранилища - этот файл не наш.
+            pass
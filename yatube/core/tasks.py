@@ -0,0 +1,101 @@
+import json
+import logging
+from datetime import timedelta
+from typing import Callable, Optional
+
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+STALE_AFTER = timedelta(minutes=10)
+
+
+def task(func: Callable) -> Callable:
+    """Помечает функцию как задачу, которую можно ставить в очередь."""
+    func.task_name = f'{func.__module__}.{func.__qualname__}'
+    return func
+
+
+def enqueue(func: Callable, **kwargs) -> Task:
+    """Ставит задачу в очередь.
+
+    Строка очереди пишется в той же транзакции, что и вызвавшие ее
+    изменения, поэтому воркер увидит задачу только после коммита.
+    """
+    return Task.objects.create(
+        name=func.task_name,
+        payload=json.dumps(kwargs),
+    )
+
+
+def claim_task() -> Optional[Task]:
+    """Забирает из очереди одну готовую к запуску задачу.
+
+    Захват - условный UPDATE по статусу, поэтому одну задачу не возьмут
+    два воркера.
+    """
+    now = timezone.now()
+    pending = Task.objects.filter(status=Task.PENDING, run_after__lte=now)
+    while True:
+        task_id = pending.order_by('run_after', 'pk').values_list(
+            'pk', flat=True
+        ).first()
+        if task_id is None:
+            return None
+        claimed = Task.objects.filter(
+            pk=task_id, status=Task.PENDING
+        ).update(status=Task.RUNNING, attempts=F('attempts') + 1, started=now)
+        if claimed:
+            return Task.objects.get(pk=task_id)
+
+
+def run_task(claimed: Task, max_attempts: int = MAX_ATTEMPTS) -> bool:
+    """Выполняет захваченную задачу, успешная задача удаляется из очереди.
+
+    После ошибки задача возвращается в очередь с экспоненциальной
+    задержкой, а после max_attempts попыток остается в статусе failed.
+    """
+    try:
+        func = import_string(claimed.name)
+        if not hasattr(func, 'task_name'):
+            raise ImportError(f'{claimed.name} не помечена как задача')
+        func(**json.loads(claimed.payload))
+    except Exception as error:
+        logger.exception('Задача %s упала', claimed)
+        if claimed.attempts >= max_attempts:
+            status, run_after = Task.FAILED, claimed.run_after
+        else:
+            status = Task.PENDING
+            run_after = timezone.now() + timedelta(
+                seconds=2 ** claimed.attempts
+            )
+        Task.objects.filter(pk=claimed.pk).update(
+            status=status, run_after=run_after, error=repr(error)
+        )
+        return False
+    claimed.delete()
+    return True
+
+
+def requeue_stale_tasks(stale_after: timedelta = STALE_AFTER) -> int:
+    """Возвращает в очередь задачи, брошенные упавшим воркером."""
+    return Task.objects.filter(
+        status=Task.RUNNING,
+        started__lt=timezone.now() - stale_after
+    ).update(status=Task.PENDING)
+
+
+def run_pending_tasks(max_attempts: int = MAX_ATTEMPTS) -> int:
+    """Выполняет все готовые задачи и возвращает их число."""
+    processed = 0
+    claimed = claim_task()
+    while claimed is not None:
+        run_task(claimed, max_attempts)
+        processed += 1
+        claimed = claim_task()
+    return processed
@@ -0,0 +1,189 @@
+"""Профилировщик рендеринга шаблонов Django.
+
+При TEMPLATE_PROFILE TemplateProfileMiddleware подменяет
+Node.render_annotated и Template._render: каждый узел шаблона (тег,
+{% include %}, переменная с фильтрами) и каждый шаблон получают число
+вызовов, полное время и собственное время - без вложенных узлов.
+Строка профиля - (шаблон, строка в нем, узел, тег), поэтому видно,
+какое именно место index.html или posts/includes/post.html медленное.
+
+Профиль каждого запроса дописывается строкой JSON в TEMPLATE_PROFILE_FILE,
+отчет по всем запросам и воркерам печатает manage.py template_profile.
+"""
+import json
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.template.base import Node, Template, TextNode, TokenType
+
+TEMPLATE_ROW = '<шаблон>'
+LABEL_LENGTH = 80
+
+_profile: ContextVar = ContextVar('template_profile', default=None)
+_hooks_lock = threading.Lock()
+_file_lock = threading.Lock()
+_original_render_annotated = Node.render_annotated
+_original_template_render = Template._render
+
+
+class TemplateProfile:
+    """Время рендеринга одного запроса по строкам профиля."""
+
+    def __init__(self) -> None:
+        # Ключ -> [вызовы, полное время, собственное время]
+        self.rows: Dict[Tuple[str, int, str, str], List] = {}
+        self._children = [0.0]
+
+    def call(
+        self,
+        key: Tuple[str, int, str, str],
+        render: Callable,
+        *args
+    ):
+        self._children.append(0.0)
+        started = time.perf_counter()
+        try:
+            return render(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = self._children.pop()
+            self._children[-1] += elapsed
+            row = self.rows.get(key)
+            if row is None:
+                row = self.rows[key] = [0, 0.0, 0.0]
+            row[0] += 1
+            row[1] += elapsed
+            row[2] += elapsed - children
+
+    @property
+    def total(self) -> float:
+        return self._children[0]
+
+    def as_rows(self) -> List[list]:
+        return [
+            [name, line, label, tag, calls, cumulative, own]
+            for (name, line, label, tag), (calls, cumulative, own)
+            in self.rows.items()
+        ]
+
+
+def tag_name(token) -> str:
+    """{% url ... %} -> {% url %}, {{ x|date:"d" }} -> {{ |date }}.
+
+    Разбирается исходный токен: подпись узла может быть обрезана.
+    """
+    if token.token_type == TokenType.VAR:
+        filters = [
+            part.split(':')[0].strip()
+            for part in token.contents.split('|')[1:]
+        ]
+        return '{{ |' + '|'.join(filters) + ' }}' if filters else '{{ }}'
+    words = token.contents.split()
+    keep = 2 if words[:1] == ['include'] else 1
+    return '{% ' + ' '.join(words[:keep]) + ' %}'
+
+
+def node_key(node: Node) -> Tuple[str, int, str, str]:
+    """Шаблон, строка, исходный текст узла и имя тега; кэшируется
+    на узле.
+    """
+    key = node.__dict__.get('_profile_key')
+    if key is None:
+        origin = getattr(node, 'origin', None)
+        token = getattr(node, 'token', None)
+        name = getattr(origin, 'template_name', None) or '<string>'
+        if token is None:
+            label, line = type(node).__name__, 0
+            tag = label
+        else:
+            if token.token_type == TokenType.VAR:
+                label = f'{{{{ {token.contents} }}}}'
+            else:
+                label = f'{{% {token.contents} %}}'
+            line, tag = token.lineno, tag_name(token)
+        if len(label) > LABEL_LENGTH:
+            label = label[:LABEL_LENGTH - 1] + '…'
+        key = node._profile_key = (str(name), line, label, tag)
+    return key
+
+
+def profiled_render_annotated(self, context):
+    profile = _profile.get()
+    if profile is None or isinstance(self, TextNode):
+        return _original_render_annotated(self, context)
+    return profile.call(
+        node_key(self), _original_render_annotated, self, context
+    )
+
+
+def profiled_template_render(self, context):
+    profile = _profile.get()
+    if profile is None:
+        return _original_template_render(self, context)
+    name = getattr(self.origin, 'template_name', None) or self.name
+    return profile.call(
+        (str(name), 0, TEMPLATE_ROW, str(name)), _original_template_render,
+        self, context
+    )
+
+
+def install_hooks() -> None:
+    """Подменяет методы шаблонов; без активного профиля они сразу
+    вызывают исходные.
+    """
+    with _hooks_lock:
+        Node.render_annotated = profiled_render_annotated
+        Template._render = profiled_template_render
+
+
+def start_profile() -> Tuple[TemplateProfile, object]:
+    profile = TemplateProfile()
+    return profile, _profile.set(profile)
+
+
+def stop_profile(token) -> None:
+    _profile.reset(token)
+
+
+def append_profile(path: str, record: dict) -> None:
+    line = json.dumps(record, ensure_ascii=False) + '\n'
+    with _file_lock, open(path, 'a', encoding='utf-8') as file:
+        file.write(line)
+
+
+def read_profiles(path: str) -> Iterable[dict]:
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def aggregate(
+    records: Iterable[dict],
+    view: Optional[str] = None,
+    by_tag: bool = False
+) -> Tuple[int, Dict[tuple, List]]:
+    """Суммирует профили запросов; возвращает число запросов и строки
+    [вызовы, полное время, собственное время].
+
+    by_tag сводит строки разных мест к имени тега или шаблона; полное
+    время вложенных одноименных тегов при этом считается дважды.
+    """
+    requests = 0
+    rows: Dict[tuple, List] = defaultdict(lambda: [0, 0.0, 0.0])
+    for record in records:
+        if view and record.get('view') != view:
+            continue
+        requests += 1
+        for name, line, label, tag, calls, cumulative, own in (
+            record['rows']
+        ):
+            key = (tag,) if by_tag else (name, line, label)
+            row = rows[key]
+            row[0] += calls
+            row[1] += cumulative
+            row[2] += own
+    return requests, dict(rows)
@@ -0,0 +1,657 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import caches
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import (IntegrityError, OperationalError, connections,
+                       transaction)
+from django.http import HttpResponse
+from django.template import Context, Engine
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.utils import timezone
+
+from posts.conditional import index_validators
+from posts.models import Post
+
+from .backends.sqlite3.base import DatabaseWrapper
+from .middleware import (QueryTraceMiddleware, ReplicaRoutingMiddleware,
+                         TemplateProfileMiddleware, WriteQueueMiddleware)
+from .models import MediaBlob, ReplicaHeartbeat, Task
+from .querytrace import query_budget
+from .routers import (PRIMARY_PIN_COOKIE, read_position, read_primary,
+                      replica_lag, sync_replicas)
+from .storage import ContentAddressedStorage, acquire_blob, release_blob
+from .tasks import enqueue, run_pending_tasks, task
+from .templateprof import (LABEL_LENGTH, TEMPLATE_ROW, install_hooks,
+                           start_profile, stop_profile)
+from .writer import WriteQueue, WriteTimeout, get_write_queue, write
+
+TIERED_CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': 'tiered-test',
+        'OPTIONS': {'SHARED': 'shared', 'GENERATION_CHECK_INTERVAL': 0},
+    },
+    'other_worker': {
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': 'tiered-test-other',
+        'OPTIONS': {'SHARED': 'shared', 'GENERATION_CHECK_INTERVAL': 0},
+    },
+}
+
+
+class TieredCacheTest(TestCase):
+    def setUp(self):
+        # L2 - файловый кэш, как в settings, но во временном каталоге.
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        cache_settings = override_settings(CACHES={
+            **TIERED_CACHES,
+            'shared': {
+                'BACKEND': (
+                    'django.core.cache.backends.filebased.FileBasedCache'
+                ),
+                'LOCATION': location,
+                'OPTIONS': {'MAX_ENTRIES': 1000},
+            },
+        })
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
+        # Два экземпляра с разным LOCATION - это два воркера с собственным
+        # L1 и общим L2.
+        self.worker = caches['default']
+        self.other_worker = caches['other_worker']
+        self.worker.clear()
+        self.other_worker.clear()
+
+    def test_hits_are_served_from_l1(self):
+        """Повторное чтение обслуживается L1, статистика по уровням."""
+        # Статистика общая для процесса, сравниваются приращения.
+        before = self.other_worker.get_stats()
+        self.worker.set('key', 'value')
+        self.assertEqual(self.other_worker.get('key'), 'value')
+        self.assertEqual(self.other_worker.get('key'), 'value')
+        stats = self.other_worker.get_stats()
+        for name in ('l1_hits', 'l2_hits', 'l1_misses'):
+            self.assertEqual(stats[name] - before[name], 1)
+
+    def test_write_invalidates_other_workers_l1(self):
+        """Запись и удаление в одном воркере видны в L1 другого."""
+        self.worker.set('key', 'old')
+        self.assertEqual(self.other_worker.get('key'), 'old')
+        self.worker.set('key', 'new')
+        self.assertEqual(self.other_worker.get('key'), 'new')
+        self.worker.delete('key')
+        self.assertIsNone(self.other_worker.get('key'))
+
+    def test_write_invalidates_only_its_namespace(self):
+        """Запись ключа сбрасывает в L1 других воркеров только ключи
+        его пространства."""
+        self.worker.set('feed:index', 1)
+        self.worker.set('feed:group', 1)
+        self.worker.set('timeline:celebrities', 1)
+        for key in ('feed:index', 'feed:group', 'timeline:celebrities'):
+            self.other_worker.get(key)
+        before = self.other_worker.get_stats()
+        self.worker.set('feed:index', 2)
+        self.assertEqual(self.other_worker.get('feed:index'), 2)
+        self.assertEqual(self.other_worker.get('feed:group'), 1)
+        self.assertEqual(self.other_worker.get('timeline:celebrities'), 1)
+        after = self.other_worker.get_stats()
+        self.assertEqual(after['l1_hits'] - before['l1_hits'], 1)
+        self.assertEqual(after['l2_hits'] - before['l2_hits'], 2)
+
+    def test_filling_new_key_keeps_other_workers_l1(self):
+        """Заполнение нового ключа не сбрасывает L1 других воркеров
+        даже в своем пространстве; перезапись - сбрасывает."""
+        self.worker.set('template.cache.page.first', 'первая')
+        self.assertEqual(
+            self.other_worker.get('template.cache.page.first'), 'первая'
+        )
+        before = self.other_worker.get_stats()
+        self.worker.set('template.cache.page.second', 'вторая')
+        self.worker.add('template.cache.page.third', 'третья')
+        self.worker.delete('template.cache.page.missing')
+        self.assertEqual(
+            self.other_worker.get('template.cache.page.first'), 'первая'
+        )
+        after = self.other_worker.get_stats()
+        self.assertEqual(after['l1_hits'] - before['l1_hits'], 1)
+
+        self.worker.set('template.cache.page.second', 'другая')
+        self.assertEqual(
+            self.other_worker.get('template.cache.page.first'), 'первая'
+        )
+        self.assertEqual(
+            self.other_worker.get_stats()['l2_hits'] - after['l2_hits'], 1
+        )
+
+    def test_incr_goes_through_shared_tier(self):
+        """incr выполняется в L2 и сбрасывает L1 других воркеров."""
+        self.worker.set('counter', 1)
+        self.assertEqual(self.other_worker.get('counter'), 1)
+        self.assertEqual(self.worker.incr('counter'), 2)
+        self.assertEqual(self.other_worker.get('counter'), 2)
+
+
+@task
+def failing_task():
+    raise ValueError('Ошибка задачи')
+
+
+class TaskQueueTest(TestCase):
+    def test_failed_task_is_retried_then_marked_failed(self):
+        """Упавшая задача откладывается и после последней попытки
+        остается в статусе failed.
+        """
+        queued = enqueue(failing_task)
+        self.assertEqual(run_pending_tasks(max_attempts=2), 1)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.PENDING)
+        self.assertGreater(queued.run_after, timezone.now())
+
+        Task.objects.filter(pk=queued.pk).update(run_after=timezone.now())
+        run_pending_tasks(max_attempts=2)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.FAILED)
+        self.assertEqual(queued.attempts, 2)
+        self.assertIn('Ошибка задачи', queued.error)
+
+
+class ContentAddressedStorageTest(TransactionTestCase):
+    # TransactionTestCase: файл удаляется в on_commit.
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.location)
+
+    def tearDown(self):
+        shutil.rmtree(self.location, ignore_errors=True)
+
+    def test_same_content_is_stored_once(self):
+        """Одинаковое содержимое получает одно имя в шардированном
+        каталоге."""
+        first = self.storage.save('posts/a.GIF', ContentFile(b'image'))
+        second = self.storage.save('posts/b.gif', ContentFile(b'image'))
+        other = self.storage.save('posts/c.gif', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        prefix, first_shard, second_shard, filename = first.split('/')
+        self.assertEqual(prefix, 'posts')
+        self.assertEqual(filename[:4], first_shard + second_shard)
+        self.assertTrue(filename.endswith('.gif'))
+        _, files = self.storage.listdir(f'posts/{first_shard}/{second_shard}')
+        self.assertEqual(files, [filename])
+
+    def test_file_deleted_with_last_reference(self):
+        """Файл удаляется, когда на него не остается ссылок."""
+        name = self.storage.save('posts/a.gif', ContentFile(b'image'))
+        acquire_blob(name)
+        acquire_blob(name)
+        release_blob(name, self.storage)
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 1)
+        self.assertTrue(self.storage.exists(name))
+        release_blob(name, self.storage)
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        self.assertFalse(self.storage.exists(name))
+
+    def test_file_without_references_is_written_again(self):
+        """Файл без ссылок может ждать удаления: загрузка того же
+        содержимого пишет его заново, а не полагается на старую копию.
+        """
+        name = self.storage.save('posts/a.gif', ContentFile(b'image'))
+        path = self.storage.path(name)
+        orphan = os.stat(path).st_ino
+        self.storage.save('posts/b.gif', ContentFile(b'image'))
+        self.assertNotEqual(os.stat(path).st_ino, orphan)
+
+        acquire_blob(name)
+        referenced = os.stat(path).st_ino
+        self.storage.save('posts/c.gif', ContentFile(b'image'))
+        self.assertEqual(os.stat(path).st_ino, referenced)
+
+    def test_orphan_is_deleted_under_write_lock(self):
+        """Проверка ссылок и удаление файла идут в одной транзакции."""
+        in_transaction = []
+
+        class RecordingStorage(ContentAddressedStorage):
+            def delete(self, name):
+                in_transaction.append(
+                    transaction.get_connection().in_atomic_block
+                )
+                super().delete(name)
+
+        storage = RecordingStorage(location=self.location)
+        name = storage.save('posts/a.gif', ContentFile(b'image'))
+        acquire_blob(name)
+        release_blob(name, storage)
+        self.assertEqual(in_transaction, [True])
+        self.assertFalse(storage.exists(name))
+
+
+@query_budget(2)
+def n_plus_one_view(request):
+    for username in ('first', 'second', 'first'):
+        get_user_model().objects.filter(username=username).exists()
+    return HttpResponse()
+
+
+@override_settings(QUERY_TRACE=True, QUERY_BUDGET_DEFAULT=None)
+class QueryTraceMiddlewareTest(TestCase):
+    def trace(self, view):
+        def get_response(request):
+            # Как у Django: process_view вызывается внутри цепочки.
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        request = RequestFactory().get('/traced/')
+        middleware = QueryTraceMiddleware(get_response)
+        middleware(request)
+        return request.query_trace
+
+    def test_over_budget_view_is_logged_with_call_sites(self):
+        """Превышение бюджета пишется в лог с повторами и местом вызова."""
+        with self.assertLogs('core.querytrace', 'WARNING') as logs:
+            trace = self.trace(n_plus_one_view)
+        self.assertEqual(trace['queries'], 3)
+        self.assertTrue(trace['over_budget'])
+        self.assertEqual(trace['similar'][0]['count'], 3)
+        self.assertEqual(trace['duplicates'][0]['count'], 2)
+        [call_site] = trace['duplicates'][0]['call_sites']
+        self.assertTrue(call_site.startswith('core/tests.py:'))
+        self.assertTrue(call_site.endswith(' in n_plus_one_view'))
+        record = logs.records[0].query_trace
+        self.assertEqual(record['view'], f'{__name__}.n_plus_one_view')
+        self.assertEqual(record['path'], '/traced/')
+
+    def test_view_within_budget_is_not_logged(self):
+        """Представление в пределах бюджета не попадает в лог."""
+        trace = self.trace(
+            query_budget(3)(lambda request: n_plus_one_view(request))
+        )
+        self.assertFalse(trace['over_budget'])
+
+
+def read_name_view(request):
+    user = get_user_model().objects.get(username='reader')
+    return HttpResponse(user.first_name)
+
+
+def write_name_view(request):
+    get_user_model().objects.filter(username='reader').update(
+        first_name='Записано'
+    )
+    return HttpResponse()
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica'],
+    REPLICA_MAX_LAG=30,
+    REPLICA_LAG_CHECK_INTERVAL=0
+)
+class ReplicaRouterTest(TransactionTestCase):
+    # TransactionTestCase: sqlite3 backup не пишет в базу с открытой
+    # транзакцией.
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        # Реплика есть в DATABASES только при настроенных репликах,
+        # тесту она подключается на время класса.
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.databases['replica'] = {
+            'ENGINE': 'core.backends.sqlite3',
+            'NAME': os.path.join(cls.replica_dir, 'db.replica.sqlite3'),
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections.databases['replica']
+        del connections['replica']
+        shutil.rmtree(cls.replica_dir, ignore_errors=True)
+
+    def setUp(self):
+        replica_lag.forget()
+        self.users = get_user_model().objects
+        self.users.create_user(username='reader', first_name='Копия')
+        sync_replicas()
+        self.users.filter(username='reader').update(first_name='Основная')
+
+    def request(self, view, method='get', cookies=None):
+        request = getattr(RequestFactory(), method)('/replicated/')
+        request.COOKIES.update(cookies or {})
+        return ReplicaRoutingMiddleware(view)(request)
+
+    def test_get_reads_replica_until_write(self):
+        """GET читает с реплики; после записи клиент читает с основной
+        базы, пока реплика не получит копию с его записью.
+        """
+        self.assertEqual(self.request(read_name_view).content.decode(),
+                         'Копия')
+        response = self.request(write_name_view, method='post')
+        cookies = {
+            PRIMARY_PIN_COOKIE: response.cookies[PRIMARY_PIN_COOKIE].value
+        }
+        self.assertEqual(
+            self.request(read_name_view, cookies=cookies).content.decode(),
+            'Записано'
+        )
+        self.assertEqual(self.request(read_name_view).content.decode(),
+                         'Копия')
+
+        sync_replicas()
+        self.users.filter(username='reader').update(first_name='Основная')
+        self.assertEqual(
+            self.request(read_name_view, cookies=cookies).content.decode(),
+            'Записано'
+        )
+
+    def test_cache_fills_read_primary_or_key_on_position(self):
+        """read_primary() читает основную базу посреди запроса к реплике,
+        read_position() называет реплику и ее метку.
+        """
+        def view(request):
+            position = read_position()
+            with read_primary():
+                primary = self.users.get(username='reader').first_name
+            replica = self.users.get(username='reader').first_name
+            return HttpResponse(f'{position} {primary} {replica}')
+
+        beat = ReplicaHeartbeat.objects.using('replica').get().beat
+        self.assertEqual(
+            self.request(view).content.decode(),
+            f'replica@{beat} Основная Копия'
+        )
+
+    def test_feed_etag_changes_when_replica_catches_up(self):
+        """Правка поднимает версию ленты раньше, чем реплика получает
+        копию: страница из старых строк под новой версией не должна
+        подтверждаться после синхронизации.
+        """
+        def view(request):
+            request.user = AnonymousUser()
+            return HttpResponse(index_validators(request).etag)
+
+        post = Post.objects.create(
+            text='Старый текст', author=self.users.get(username='reader')
+        )
+        sync_replicas()
+        post.text = 'Новый текст'
+        post.save()
+        stale = self.request(view).content
+        sync_replicas()
+        self.assertNotEqual(self.request(view).content, stale)
+
+    def test_stale_replica_falls_back_to_primary(self):
+        """Отставшая или пустая реплика не используется."""
+        stale = timezone.now() - timedelta(seconds=31)
+        ReplicaHeartbeat.objects.using('replica').update(beat=stale)
+        self.assertEqual(self.request(read_name_view).content.decode(),
+                         'Основная')
+        ReplicaHeartbeat.objects.using('replica').all().delete()
+        self.assertEqual(self.request(read_name_view).content.decode(),
+                         'Основная')
+
+
+class SQLiteBackendTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'db.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def connect(self, alias, **options):
+        wrapper = DatabaseWrapper(
+            {**connections['default'].settings_dict,
+             'NAME': self.path, 'OPTIONS': options},
+            alias
+        )
+        wrapper.stats.reset()
+        connections[alias] = wrapper
+        self.addCleanup(wrapper.close)
+        self.addCleanup(connections.__delitem__, alias)
+        return wrapper
+
+    def test_pragmas_applied_and_connects_counted(self):
+        """PRAGMA из OPTIONS применяются к новому соединению,
+        BEGIN IMMEDIATE учитывается как ожидание блокировки.
+        """
+        pragmas = {'journal_mode': 'wal', 'busy_timeout': 1234,
+                   'cache_size': -1000, 'synchronous': 'normal'}
+        wrapper = self.connect(
+            'sqlite-pragmas', pragmas=pragmas, transaction_mode='immediate'
+        )
+        with wrapper.cursor() as cursor:
+            for name, expected in (
+                ('journal_mode', 'wal'),
+                ('busy_timeout', 1234),
+                ('cache_size', -1000),
+                ('synchronous', 1),
+            ):
+                cursor.execute(f'PRAGMA {name}')
+                self.assertEqual(cursor.fetchone()[0], expected)
+        with transaction.atomic(using='sqlite-pragmas'):
+            pass
+        stats = wrapper.get_stats()
+        self.assertEqual(stats['connects'], 1)
+        self.assertEqual(stats['lock_waits'], 1)
+        self.assertEqual(stats['lock_timeouts'], 0)
+
+    def test_lock_timeout_is_counted(self):
+        """Транзакция, не дождавшаяся блокировки записи, попадает
+        в lock_timeouts.
+        """
+        holder = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(holder.close)
+        holder.execute('BEGIN IMMEDIATE')
+        wrapper = self.connect(
+            'sqlite-locked', pragmas={'busy_timeout': 0},
+            transaction_mode='IMMEDIATE'
+        )
+        with self.assertRaises(OperationalError):
+            with transaction.atomic(using='sqlite-locked'):
+                pass
+        stats = wrapper.get_stats()
+        self.assertEqual(stats['lock_waits'], 1)
+        self.assertEqual(stats['lock_timeouts'], 1)
+
+
+def create_user(username):
+    return get_user_model().objects.create_user(username=username)
+
+
+def writer_thread_name():
+    return threading.current_thread().name
+
+
+@override_settings(WRITE_QUEUE=True)
+class WriteQueueTest(TransactionTestCase):
+    # TransactionTestCase: писатель работает в своем соединении
+    # и должен видеть зафиксированные данные.
+    def test_waiting_writes_are_committed_together(self):
+        """Изменения, накопившиеся за время коммита, фиксируются одной
+        пачкой; ошибка одного изменения не откатывает остальные.
+        """
+        write_queue = WriteQueue(max_batch=10)
+        self.addCleanup(write_queue.stop)
+        started, release = threading.Event(), threading.Event()
+
+        def blocker():
+            started.set()
+            release.wait(5)
+
+        write_queue.submit(blocker)
+        started.wait(5)
+        futures = [
+            write_queue.submit(create_user, name)
+            for name in ('first', 'second', 'first')
+        ]
+        release.set()
+
+        self.assertEqual(futures[0].result(5).username, 'first')
+        self.assertEqual(futures[1].result(5).username, 'second')
+        with self.assertRaises(IntegrityError):
+            futures[2].result(5)
+        self.assertEqual(get_user_model().objects.count(), 2)
+        stats = write_queue.get_stats()
+        self.assertEqual(stats['operations'], 4)
+        self.assertEqual(stats['batches'], 2)
+        self.assertEqual(stats['batch_max'], 3)
+        self.assertEqual(stats['failed'], 1)
+
+    def test_write_uses_queue_outside_transaction(self):
+        """write() передает изменение писателю, а внутри открытой
+        транзакции выполняет его сразу.
+        """
+        self.addCleanup(get_write_queue().stop)
+        self.assertEqual(write(writer_thread_name), 'write-queue')
+        with transaction.atomic():
+            self.assertEqual(
+                write(writer_thread_name), threading.current_thread().name
+            )
+
+    @override_settings(WRITE_QUEUE_TIMEOUT=0.05)
+    def test_write_not_started_in_time_is_abandoned(self):
+        """Изменение, не дождавшееся писателя, отменяется и не
+        выполняется, а запрос получает 503.
+        """
+        write_queue = get_write_queue()
+        self.addCleanup(write_queue.stop)
+        started, release = threading.Event(), threading.Event()
+
+        def blocker():
+            started.set()
+            release.wait(5)
+
+        write_queue.submit(blocker)
+        started.wait(5)
+
+        def view(request):
+            return write(create_user, 'late')
+
+        request = RequestFactory().post('/write/')
+        middleware = WriteQueueMiddleware(view)
+        with self.assertRaises(WriteTimeout) as raised:
+            view(request)
+        response = middleware.process_exception(request, raised.exception)
+        self.assertEqual(response.status_code, 503)
+        release.set()
+        write_queue.stop()
+        self.assertFalse(
+            get_user_model().objects.filter(username='late').exists()
+        )
+        self.assertEqual(write_queue.get_stats()['abandoned'], 1)
+
+
+PROFILED_ENGINE = Engine(loaders=[('django.template.loaders.locmem.Loader', {
+    'page.html': (
+        "{% for item in items %}{% include 'item.html' %}{% endfor %}"
+    ),
+    'item.html': '<b>{{ item|upper }}</b>',
+})])
+
+
+def profiled_view(request):
+    page = PROFILED_ENGINE.get_template('page.html')
+    return HttpResponse(page.render(Context({'items': ['a', 'b', 'c']})))
+
+
+class TemplateProfileTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'profile.jsonl')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        profile_settings = override_settings(
+            TEMPLATE_PROFILE=True, TEMPLATE_PROFILE_FILE=self.path
+        )
+        profile_settings.enable()
+        self.addCleanup(profile_settings.disable)
+
+    def profile(self):
+        def get_response(request):
+            middleware.process_view(request, profiled_view, (), {})
+            return profiled_view(request)
+
+        request = RequestFactory().get('/profiled/')
+        middleware = TemplateProfileMiddleware(get_response)
+        middleware(request)
+        return request.template_profile
+
+    def test_rows_split_cumulative_and_self_time(self):
+        """Шаблоны, include и переменные получают вызовы, полное
+        и собственное время; собственное время в сумме дает весь
+        рендеринг.
+        """
+        profile = self.profile()
+        rows = profile.rows
+        include = rows[(
+            'page.html', 1, "{% include 'item.html' %}",
+            "{% include 'item.html' %}"
+        )]
+        variable = rows[('item.html', 1, '{{ item|upper }}', '{{ |upper }}')]
+        loop = rows[('page.html', 1, '{% for item in items %}', '{% for %}')]
+        self.assertEqual(include[0], 3)
+        self.assertEqual(variable[0], 3)
+        self.assertEqual(
+            rows[('item.html', 0, '<шаблон>', 'item.html')][0], 3
+        )
+        self.assertGreaterEqual(loop[1], include[1])
+        self.assertLessEqual(loop[2], loop[1])
+        self.assertAlmostEqual(
+            sum(own for _, _, own in rows.values()), profile.total,
+            places=6
+        )
+
+    def test_report_aggregates_requests(self):
+        """Отчет суммирует запросы, сводит места к тегам и фильтрует
+        по представлению.
+        """
+        self.profile()
+        self.profile()
+        out = StringIO()
+        call_command('template_profile', by_tag=True, stdout=out)
+        report = out.getvalue()
+        self.assertIn('Запросов: 2', report)
+        self.assertIn("{% include 'item.html' %}", report)
+        self.assertIn('{{ |upper }}', report)
+
+        out = StringIO()
+        call_command('template_profile', view='other.view', stdout=out)
+        self.assertIn('Нет запросов', out.getvalue())
+
+    def test_long_labels_keep_tag_name(self):
+        """Подпись длинного узла обрезается, а имя тега берется
+        из исходного токена целиком."""
+        template = PROFILED_ENGINE.from_string(
+            '{{ item|default:"' + 'x' * LABEL_LENGTH + '"|upper }}'
+        )
+        install_hooks()
+        profile, token = start_profile()
+        try:
+            template.render(Context({'item': 'a'}))
+        finally:
+            stop_profile(token)
+        (_, _, label, tag), = [
+            key for key in profile.rows if key[2] != TEMPLATE_ROW
+        ]
+        self.assertTrue(label.endswith('…'))
+        self.assertEqual(tag, '{{ |default|upper }}')
+
+    def test_disabled_profiler_is_not_used(self):
+        """Без TEMPLATE_PROFILE middleware отключается."""
+        with self.settings(TEMPLATE_PROFILE=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                TemplateProfileMiddleware(profiled_view)
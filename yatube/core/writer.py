@@ -0,0 +1,187 @@
+"""Единственный поток-писатель с групповой фиксацией.
+
+write(func, ...) выполняет изменение в транзакции. При WRITE_QUEUE
+изменения всех потоков процесса попадают в очередь, а поток-писатель
+забирает все накопившиеся (до WRITE_QUEUE_MAX_BATCH) и выполняет их
+в одной транзакции, каждое в своей точке сохранения: ошибка одного
+изменения не откатывает остальные. Запрос ждет результат до коммита
+пачки, поэтому после возврата изменение уже записано.
+
+Пока один коммит идет, следующие изменения копятся в очереди: под
+нагрузкой пачки растут сами, без искусственной задержки. Конкуренция
+за блокировку записи SQLite остается только между процессами.
+
+Изменение, которое писатель не начал за WRITE_QUEUE_TIMEOUT, отменяется
+и не выполняется никогда: запрос получает WriteTimeout (503), и его
+можно безопасно повторить.
+"""
+import queue
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+
+from .routers import note_write
+
+
+class WriteTimeout(Exception):
+    """Изменение не дождалось писателя и отменено."""
+
+
+class Operation(NamedTuple):
+    func: Callable
+    args: tuple
+    kwargs: dict
+    future: Future
+
+
+class WriteQueue:
+    def __init__(self, max_batch: int):
+        self.max_batch = max_batch
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(
+            ('operations', 'batches', 'batch_max', 'failed', 'abandoned'), 0
+        )
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """Ставит изменение в очередь; результат - в возвращенном Future."""
+        future: Future = Future()
+        self._queue.put(Operation(func, args, kwargs, future))
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='write-queue', daemon=True
+                )
+                self._thread.start()
+        return future
+
+    def in_writer(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def stop(self) -> None:
+        """Дописывает очередь и останавливает поток-писатель."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self) -> None:
+        stopping = False
+        try:
+            while not stopping:
+                batch, stopping = self._next_batch()
+                if batch:
+                    self._commit(batch)
+        finally:
+            connections.close_all()
+
+    def _next_batch(self) -> Tuple[list, bool]:
+        """Первое изменение ждет, остальные берутся без ожидания.
+        Второй элемент - получена ли команда остановки.
+        """
+        batch = []
+        operation = self._queue.get()
+        while operation is not None:
+            batch.append(operation)
+            if len(batch) == self.max_batch:
+                return batch, False
+            try:
+                operation = self._queue.get_nowait()
+            except queue.Empty:
+                return batch, False
+        return batch, True
+
+    def _commit(self, batch: list) -> None:
+        # Отмененные по таймауту изменения пропускаются, остальные
+        # больше отменить нельзя.
+        started = [
+            operation for operation in batch
+            if operation.future.set_running_or_notify_cancel()
+        ]
+        outcomes = []
+        try:
+            with transaction.atomic():
+                for operation in started:
+                    try:
+                        with transaction.atomic():
+                            result = operation.func(
+                                *operation.args, **operation.kwargs
+                            )
+                    except Exception as error:
+                        outcomes.append((operation, None, error))
+                    else:
+                        outcomes.append((operation, result, None))
+        except Exception as error:
+            outcomes = [(operation, None, error) for operation in started]
+        finally:
+            close_old_connections()
+
+        with self._lock:
+            self._stats['operations'] += len(started)
+            self._stats['abandoned'] += len(batch) - len(started)
+            self._stats['batches'] += 1
+            self._stats['batch_max'] = max(
+                self._stats['batch_max'], len(batch)
+            )
+            self._stats['failed'] += sum(
+                error is not None for _, _, error in outcomes
+            )
+        for operation, result, error in outcomes:
+            if error is None:
+                operation.future.set_result(result)
+            else:
+                operation.future.set_exception(error)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['batch_avg'] = (
+            stats['operations'] / stats['batches']
+            if stats['batches'] else None
+        )
+        return stats
+
+
+_write_queue: Optional[WriteQueue] = None
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue() -> WriteQueue:
+    global _write_queue
+    with _write_queue_lock:
+        if _write_queue is None:
+            _write_queue = WriteQueue(settings.WRITE_QUEUE_MAX_BATCH)
+        return _write_queue
+
+
+def write(func: Callable, *args, **kwargs):
+    """Выполняет func(*args, **kwargs) в транзакции и возвращает результат.
+
+    Без WRITE_QUEUE, внутри открытой транзакции (ее блокировку не
+    дождался бы писатель) и в самом писателе изменение выполняется сразу.
+    Если писатель не начал изменение за WRITE_QUEUE_TIMEOUT, оно
+    отменяется и выбрасывается WriteTimeout; начатое дожидается коммита.
+    """
+    note_write()
+    if (not settings.WRITE_QUEUE
+            or transaction.get_connection().in_atomic_block
+            or get_write_queue().in_writer()):
+        with transaction.atomic():
+            return func(*args, **kwargs)
+    future = get_write_queue().submit(func, *args, **kwargs)
+    try:
+        return future.result(settings.WRITE_QUEUE_TIMEOUT)
+    except FutureTimeoutError:
+        if future.cancel():
+            raise WriteTimeout(
+                f'Очередь записи не дошла до {func.__name__} '
+                f'за {settings.WRITE_QUEUE_TIMEOUT} с'
+            )
+    # Писатель уже выполняет изменение: ответ должен отражать его итог.
+    return future.result()
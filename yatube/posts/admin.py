@@ -1,9 +1,45 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db.models import Max, Sum
+from django.db.models.expressions import RawSQL
+from django.utils.functional import cached_property
 
-from .models import Comment, Follow, Group, Post
+from .models import Comment, Follow, Group, Post, PostDayCount
+from .search import POST_INDEX, build_match_query
 
 
-class PostAdmin(admin.ModelAdmin):
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор админки без полного COUNT(*).
+
+    Для списка без фильтров число строк оценивается по максимальному
+    первичному ключу, для отфильтрованного считается не дальше
+    COUNT_LIMIT строк.
+    """
+    COUNT_LIMIT = 10000
+
+    def estimate_total(self) -> int:
+        return self.object_list.aggregate(total=Max('pk'))['total'] or 0
+
+    @cached_property
+    def count(self) -> int:
+        if not self.object_list.query.where:
+            return self.estimate_total()
+        return self.object_list.order_by().values('pk')[
+            :self.COUNT_LIMIT
+        ].count()
+
+
+class PostPaginator(EstimatedCountPaginator):
+    def estimate_total(self) -> int:
+        return PostDayCount.objects.aggregate(total=Sum('count'))['total'] or 0
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class PostAdmin(ScalableAdmin):
     list_display = (
         'pk',
         'text',
@@ -12,12 +48,57 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    # Ссылки иерархии строит тег post_date_hierarchy по PostDayCount,
+    # см. templates/admin/posts/post/change_list.html.
+    date_hierarchy = 'pub_date'
+    autocomplete_fields = ('author',)
+    paginator = PostPaginator
     empty_value_display = '-пусто-'
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(
+            db_field, request, **kwargs
+        )
+        if db_field.name == 'group':
+            # В list_editable поле группы есть в каждой строке: список
+            # групп читается один раз на запрос, а не на строку.
+            formfield.choices = list(formfield.choices)
+        return formfield
+
+    def get_search_results(self, request, queryset, search_term):
+        match = build_match_query(search_term)
+        if match is None:
+            return queryset, False
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {POST_INDEX} WHERE {POST_INDEX} MATCH %s',
+            (match,)
+        )), False
+
+
+class GroupAdmin(ScalableAdmin):
+    list_display = ('pk', 'title', 'slug')
+    search_fields = ('title', 'slug')
+
+
+class CommentAdmin(ScalableAdmin):
+    list_display = ('pk', 'text', 'post', 'author', 'created')
+    list_select_related = ('post', 'author')
+    autocomplete_fields = ('post', 'author')
+    # Порядок модели (-created) не покрыт индексом, первичный ключ -
+    # тот же порядок без сортировки всей таблицы.
+    ordering = ('-pk',)
+
+
+class FollowAdmin(ScalableAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
-admin.site.register(Comment)
-admin.site.register(Follow)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Follow, FollowAdmin)
@@ -0,0 +1,87 @@
+from contextlib import contextmanager
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List
+
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.functions import TruncDate
+
+from .counters import (reconcile_day_counts, reconcile_loaded_posts,
+                       reconcile_loaded_users)
+from .feed_cache import (INDEX_SCOPE, author_scope, bump_feed_version,
+                         group_scope)
+from .models import Comment, Follow, Post
+from .search import index_new_rows
+from .timeline import fill_timelines
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+@contextmanager
+def keep_auto_now_add(*models):
+    """Явно заданные даты не перетираются auto_now_add при bulk_create."""
+    fields = [
+        field
+        for model in models
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def get_last_pks() -> Dict:
+    """Последние первичные ключи перед массовой загрузкой: все, что
+    больше, добавлено в обход сигналов.
+    """
+    return {
+        model: model.objects.aggregate(last=Max('pk'))['last'] or 0
+        for model in (Post, Comment, Follow)
+    }
+
+
+def bump_loaded_feeds(post_after: int, batch_size: int) -> None:
+    """Поднимает версии лент с новыми постами. Авторы и группы идут
+    потоком DISTINCT из базы пачками по batch_size.
+    """
+    bump_feed_version(INDEX_SCOPE)
+    new_posts = Post.objects.filter(pk__gt=post_after).order_by()
+    for field, scope in (('author', author_scope), ('group', group_scope)):
+        ids = new_posts.filter(**{f'{field}__isnull': False}).values_list(
+            field, flat=True
+        ).distinct().iterator()
+        for batch in chunked(ids, batch_size):
+            bump_feed_version(*map(scope, batch))
+
+
+def finish_bulk_load(last_pks: Dict, batch_size: int, stdout) -> None:
+    """bulk_create не вызывает сигналы: досчитывает то, что
+    поддерживают обработчики сигналов, для добавленных строк.
+
+    Пересчитываются только затронутые загрузкой пользователи, посты
+    и дни. Все шаги - запросы по pk больше last_pks, и память не растет
+    с числом загруженных строк.
+    """
+    stdout.write('Пересчет счетчиков, лент и поискового индекса')
+    days = Post.objects.filter(pk__gt=last_pks[Post]).annotate(
+        day=TruncDate('pub_date')
+    ).order_by().values_list('day', flat=True).distinct()
+    with transaction.atomic():
+        reconcile_loaded_users(last_pks[Post], last_pks[Follow])
+        reconcile_loaded_posts(last_pks[Post], last_pks[Comment])
+        reconcile_day_counts(days)
+        fill_timelines(last_pks[Post], last_pks[Follow])
+        index_new_rows(last_pks[Post], last_pks[Comment])
+    bump_loaded_feeds(last_pks[Post], batch_size)
@@ -0,0 +1,249 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from typing import Callable, NamedTuple, Optional
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, QuerySet, Subquery, Sum
+from django.http import HttpRequest
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from core.routers import read_position
+
+from .counters import get_user_stats
+from .feed_cache import (SUGGESTIONS_SCOPE, author_scope, get_feed_version,
+                         group_scope, post_scope)
+from .models import Comment, Follow, Group, Post, PostDayCount, Timeline, User
+from .timeline import get_celebrity_ids
+
+
+class Validators(NamedTuple):
+    """Валидаторы условного GET.
+
+    Last-Modified страницы не отдают: ни у одной нет даты любого
+    изменения. Дата нового поста не меняется при правке и удалении
+    постов, дата правки поста - при готовности превью и переименовании
+    автора или группы. Страницы проверяются только по ETag.
+    """
+    etag: Optional[str]
+
+
+def per_request(loader: Callable) -> Callable:
+    """Вызывает loader один раз за запрос: валидаторы и представление
+    получают один и тот же объект страницы без повторного запроса.
+    """
+    attr = f'_{loader.__name__}_result'
+
+    @wraps(loader)
+    def cached(request: HttpRequest, *args, **kwargs):
+        if not hasattr(request, attr):
+            setattr(request, attr, loader(request, *args, **kwargs))
+        return getattr(request, attr)
+    return cached
+
+
+def conditional_page(get_validators: Callable) -> Callable:
+    """Условный GET: при совпадении валидаторов ответ 304 отдается
+    без основного запроса страницы и рендеринга шаблона.
+
+    Страницы зависят от пользователя, поэтому браузер хранит их только
+    у себя и перепроверяет при каждом показе.
+    """
+    get_validators = per_request(get_validators)
+
+    def etag(request, *args, **kwargs):
+        return get_validators(request, *args, **kwargs).etag
+
+    def decorator(view: Callable) -> Callable:
+        view = condition(etag_func=etag)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def make_etag(request: HttpRequest, *parts) -> str:
+    """ETag из состояния страницы и того, кто ее смотрит.
+
+    Шапка, кнопки подписки и формы с CSRF-токеном зависят от
+    пользователя и его CSRF-cookie: после входа, выхода или смены cookie
+    старая копия страницы не подтверждается.
+
+    Версии лент берутся из кэша, а даты и счетчики - с реплики,
+    которая может отставать: read_position() меняет ETag, когда реплика
+    получает новую копию, и страница, собранная из старых строк под
+    новой версией, не подтверждается после догоняющей копии.
+    """
+    viewer = (
+        request.user.pk,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+    )
+    return hashlib.md5(
+        repr((viewer, read_position(), parts)).encode()
+    ).hexdigest()
+
+
+def latest_pub_date(posts: QuerySet) -> Subquery:
+    """Дата самого нового поста: один шаг по индексу (..., pub_date, id)."""
+    return Subquery(
+        posts.order_by('-pub_date').values('pub_date')[:1]
+    )
+
+
+def newest_pub_date(posts: QuerySet) -> Optional[datetime]:
+    return posts.order_by('-pub_date').values_list(
+        'pub_date', flat=True
+    ).first()
+
+
+def latest_of(*dates: Optional[datetime]) -> Optional[datetime]:
+    return max((date for date in dates if date is not None), default=None)
+
+
+@per_request
+def load_group(request: HttpRequest, slug: str) -> Group:
+    return get_object_or_404(
+        Group.objects.annotate(
+            latest_pub_date=latest_pub_date(
+                Post.objects.filter(group=OuterRef('pk'))
+            )
+        ),
+        slug=slug
+    )
+
+
+@per_request
+def load_author(request: HttpRequest, username: str) -> User:
+    """Автор профиля со счетчиками, датой последнего поста и признаком
+    подписки текущего пользователя.
+    """
+    authors = User.objects.select_related('stats').annotate(
+        latest_pub_date=latest_pub_date(
+            Post.objects.filter(author=OuterRef('pk'))
+        )
+    )
+    if request.user.is_authenticated:
+        authors = authors.annotate(
+            is_followed=Exists(
+                Follow.objects.filter(
+                    author=OuterRef('pk'), user=request.user
+                )
+            )
+        )
+    return get_object_or_404(authors, username=username)
+
+
+@per_request
+def load_post(request: HttpRequest, post_id: int) -> Post:
+    """Пост с автором, группой и последним комментарием.
+
+    Последний комментарий берется по индексу (post, created, id).
+    """
+    last_comment = Comment.objects.filter(
+        post=OuterRef('pk')
+    ).order_by('-created', '-pk')[:1]
+    return get_object_or_404(
+        Post.objects.select_related('author__stats', 'group').annotate(
+            last_comment_id=Subquery(last_comment.values('pk')),
+        ),
+        id=post_id
+    )
+
+
+def index_validators(request: HttpRequest) -> Validators:
+    latest = newest_pub_date(Post.objects)
+    total = PostDayCount.objects.aggregate(total=Sum('count'))['total']
+    return Validators(
+        make_etag(request, get_feed_version(), latest, total)
+    )
+
+
+def group_validators(request: HttpRequest, slug: str) -> Validators:
+    group = load_group(request, slug)
+    return Validators(
+        make_etag(
+            request,
+            get_feed_version(group_scope(group.pk)),
+            group.latest_pub_date,
+            group.title,
+            group.description,
+        )
+    )
+
+
+def profile_validators(request: HttpRequest, username: str) -> Validators:
+    author = load_author(request, username)
+    stats = get_user_stats(author)
+    return Validators(
+        make_etag(
+            request,
+            get_feed_version(author_scope(author.pk)),
+            get_feed_version(SUGGESTIONS_SCOPE),
+            author.latest_pub_date,
+            author.get_full_name(),
+            getattr(author, 'is_followed', None),
+            stats.posts_count,
+            stats.followers_count,
+            stats.following_count,
+        )
+    )
+
+
+def follow_validators(request: HttpRequest) -> Validators:
+    """Лента подписок: последняя запись ленты пользователя, последний
+    пост знаменитостей, на которых он подписан, и число подписок.
+
+    Своей версии у ленты подписок нет, правки постов отслеживает
+    версия главной ленты.
+    """
+    user = request.user
+    following_count, latest = User.objects.filter(pk=user.pk).annotate(
+        latest_pub_date=latest_pub_date(
+            Timeline.objects.filter(user=OuterRef('pk'))
+        )
+    ).values_list('stats__following_count', 'latest_pub_date').get()
+    celebrity_ids = get_celebrity_ids()
+    if celebrity_ids:
+        followed = user.follower.filter(
+            author_id__in=celebrity_ids
+        ).values('author_id')
+        latest = latest_of(
+            latest,
+            newest_pub_date(Post.objects.filter(author_id__in=followed))
+        )
+    return Validators(
+        make_etag(
+            request,
+            get_feed_version(),
+            get_feed_version(SUGGESTIONS_SCOPE),
+            latest,
+            following_count
+        )
+    )
+
+
+def post_validators(request: HttpRequest, post_id: int) -> Validators:
+    """Версия поста поднимается, когда готовы превью; версии автора
+    и группы - при их переименовании.
+    """
+    post = load_post(request, post_id)
+    return Validators(
+        make_etag(
+            request,
+            post.pk,
+            post.updated,
+            get_feed_version(post_scope(post.pk)),
+            get_feed_version(author_scope(post.author_id)),
+            post.group_id and get_feed_version(group_scope(post.group_id)),
+            post.comments_count,
+            post.last_comment_id,
+            get_user_stats(post.author).posts_count,
+        )
+    )
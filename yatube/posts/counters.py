@@ -0,0 +1,195 @@
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Comment, Follow, Post, PostDayCount, User, UserStats
+
+
+def change_user_counter(user_id: int, field: str, delta: int) -> None:
+    """Атомарно меняет счетчик пользователя одним UPDATE.
+
+    Счетчик не уходит ниже нуля; если при увеличении строки счетчиков
+    еще нет, она создается с точными значениями.
+    """
+    stats = UserStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats.filter(**{f'{field}__gte': -delta}).update(
+            **{field: F(field) + delta}
+        )
+    elif not stats.update(**{field: F(field) + delta}):
+        reconcile_users([user_id])
+
+
+def change_comments_count(post_id: int, delta: int) -> None:
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(comments_count=F('comments_count') + delta)
+
+
+def post_day(post: Post) -> date:
+    """День публикации в текущем часовом поясе, как в фильтрах админки."""
+    return timezone.localdate(post.pub_date)
+
+
+def change_day_count(day: date, delta: int) -> None:
+    days = PostDayCount.objects.filter(day=day)
+    if delta < 0:
+        days.filter(count__gte=-delta).update(count=F('count') + delta)
+        return
+    if days.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            PostDayCount.objects.create(day=day, count=delta)
+    except IntegrityError:
+        days.update(count=F('count') + delta)
+
+
+def get_user_stats(user: User) -> UserStats:
+    """Счетчики пользователя; недостающая строка создается на лету."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        reconcile_users([user.pk])
+        return UserStats.objects.get(user=user)
+
+
+def _count_by(queryset, field: str, ids: Iterable[int]) -> Dict[int, int]:
+    return dict(
+        queryset.filter(**{f'{field}__in': ids}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values_list(field, 'total')
+    )
+
+
+def reconcile_users(user_ids: List[int]) -> int:
+    """Пересчитывает счетчики пачки пользователей, возвращает число
+    исправленных строк.
+    """
+    posts = _count_by(Post.objects, 'author', user_ids)
+    followers = _count_by(Follow.objects, 'author', user_ids)
+    following = _count_by(Follow.objects, 'user', user_ids)
+    existing = UserStats.objects.in_bulk(user_ids)
+    to_create, to_update = [], []
+    for user_id in user_ids:
+        expected = {
+            'posts_count': posts.get(user_id, 0),
+            'followers_count': followers.get(user_id, 0),
+            'following_count': following.get(user_id, 0),
+        }
+        stats = existing.get(user_id)
+        if stats is None:
+            to_create.append(UserStats(user_id=user_id, **expected))
+        elif any(
+            getattr(stats, field) != value
+            for field, value in expected.items()
+        ):
+            for field, value in expected.items():
+                setattr(stats, field, value)
+            to_update.append(stats)
+    UserStats.objects.bulk_create(to_create, ignore_conflicts=True)
+    UserStats.objects.bulk_update(
+        to_update, ['posts_count', 'followers_count', 'following_count']
+    )
+    return len(to_create) + len(to_update)
+
+
+def reconcile_posts(post_ids: List[int]) -> int:
+    """Пересчитывает comments_count пачки постов."""
+    comments = _count_by(Comment.objects, 'post', post_ids)
+    to_update = []
+    for post in Post.objects.filter(pk__in=post_ids).only('comments_count'):
+        expected = comments.get(post.pk, 0)
+        if post.comments_count != expected:
+            post.comments_count = expected
+            to_update.append(post)
+    Post.objects.bulk_update(to_update, ['comments_count'])
+    return len(to_update)
+
+
+def reconcile_loaded_users(post_after: int, follow_after: int) -> None:
+    """Пересчитывает счетчики авторов новых постов и участников новых
+    подписок (pk больше заданных) запросами INSERT/UPDATE ... SELECT:
+    набор затронутых пользователей строит SQLite, а не Python.
+    """
+    stats = UserStats._meta.db_table
+    posts = Post._meta.db_table
+    follows = Follow._meta.db_table
+    touched = (
+        f'SELECT author_id FROM {posts} WHERE id > %s '
+        f'UNION SELECT user_id FROM {follows} WHERE id > %s '
+        f'UNION SELECT author_id FROM {follows} WHERE id > %s'
+    )
+    params = [post_after, follow_after, follow_after]
+    with connection.cursor() as db:
+        db.execute(
+            f'INSERT OR IGNORE INTO {stats} '
+            f'(user_id, posts_count, followers_count, following_count) '
+            f'SELECT id, 0, 0, 0 FROM {User._meta.db_table} '
+            f'WHERE id IN ({touched})',
+            params
+        )
+        db.execute(
+            f'UPDATE {stats} SET '
+            f'posts_count = (SELECT COUNT(*) FROM {posts} '
+            f'WHERE author_id = {stats}.user_id), '
+            f'followers_count = (SELECT COUNT(*) FROM {follows} '
+            f'WHERE author_id = {stats}.user_id), '
+            f'following_count = (SELECT COUNT(*) FROM {follows} '
+            f'WHERE user_id = {stats}.user_id) '
+            f'WHERE user_id IN ({touched})',
+            params
+        )
+
+
+def reconcile_loaded_posts(post_after: int, comment_after: int) -> None:
+    """Пересчитывает comments_count новых постов и постов с новыми
+    комментариями одним UPDATE ... SELECT.
+    """
+    posts = Post._meta.db_table
+    comments = Comment._meta.db_table
+    with connection.cursor() as db:
+        db.execute(
+            f'UPDATE {posts} SET comments_count = ('
+            f'SELECT COUNT(*) FROM {comments} '
+            f'WHERE post_id = {posts}.id) '
+            f'WHERE id > %s OR id IN ('
+            f'SELECT post_id FROM {comments} WHERE id > %s)',
+            [post_after, comment_after]
+        )
+
+
+def reconcile_day_counts(days: Optional[Iterable[date]] = None) -> int:
+    """Пересчитывает PostDayCount одним проходом по постам: целиком
+    или только за дни days.
+    """
+    posts = Post.objects.annotate(day=TruncDate('pub_date'))
+    day_counts = PostDayCount.objects.all()
+    if days is not None:
+        days = list(days)
+        posts = posts.filter(day__in=days)
+        day_counts = day_counts.filter(day__in=days)
+    expected = dict(
+        posts.order_by().values('day').annotate(
+            total=Count('pk')
+        ).values_list('day', 'total')
+    )
+    existing = day_counts.in_bulk()
+    to_create = [
+        PostDayCount(day=day, count=total)
+        for day, total in expected.items()
+        if day not in existing
+    ]
+    to_update = []
+    for day, day_count in existing.items():
+        if day_count.count != expected.get(day, 0):
+            day_count.count = expected.get(day, 0)
+            to_update.append(day_count)
+    PostDayCount.objects.bulk_create(to_create)
+    PostDayCount.objects.bulk_update(to_update, ['count'])
+    return len(to_create) + len(to_update)
@@ -0,0 +1,45 @@
+import time
+
+from django.core.cache import cache
+
+FEED_VERSION_KEY = 'feed_version:{scope}'
+INDEX_SCOPE = 'index'
+# Не лента постов: версия панели рекомендаций для валидаторов страниц.
+SUGGESTIONS_SCOPE = 'suggestions'
+
+
+def group_scope(group_id: int) -> str:
+    return f'group:{group_id}'
+
+
+def author_scope(author_id: int) -> str:
+    return f'author:{author_id}'
+
+
+def post_scope(post_id: int) -> str:
+    """Не лента: версия страницы поста для ее валидаторов."""
+    return f'post:{post_id}'
+
+
+def get_feed_version(scope: str = INDEX_SCOPE) -> int:
+    """Текущая версия ленты для ключа фрагментного кэша.
+
+    Начальное значение берется от времени, чтобы после вытеснения
+    счетчика из кэша версия не совпала со старыми фрагментами.
+    """
+    key = FEED_VERSION_KEY.format(scope=scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_feed_version(*scopes: str) -> None:
+    """Инвалидирует фрагменты лент: старые ключи больше не читаются."""
+    for scope in scopes:
+        key = FEED_VERSION_KEY.format(scope=scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            get_feed_version(scope)
@@ -0,0 +1,187 @@
+from typing import Callable
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+from django.views.decorators.http import condition
+
+from core.querytrace import query_budget
+from core.routers import read_primary
+
+from .conditional import per_request
+from .feed_cache import (INDEX_SCOPE, author_scope, get_feed_version,
+                         group_scope)
+from .models import Group, Post, User
+
+FEED_DOCUMENT_KEY = 'syndication:{feed}:{scope}:{version}:{origin}'
+
+
+class PostsFeed(Feed):
+    """RSS последних постов сайта."""
+    title = 'Yatube: последние записи'
+    description = 'Новые посты на сайте Yatube'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def items(self):
+        return Post.objects.select_related(
+            'group', 'author'
+        )[:settings.SYNDICATION_ITEMS]
+
+    def item_title(self, post: Post) -> str:
+        return Truncator(post.text).chars(60)
+
+    def item_description(self, post: Post) -> str:
+        return linebreaks(post.text, autoescape=True)
+
+    def item_link(self, post: Post) -> str:
+        return reverse('posts:post_detail', args=(post.pk,))
+
+    def item_author_name(self, post: Post) -> str:
+        return post.author.get_full_name() or post.author.username
+
+    def item_pubdate(self, post: Post):
+        return post.pub_date
+
+    def item_updateddate(self, post: Post):
+        return post.updated
+
+    def item_categories(self, post: Post):
+        return (post.group.title,) if post.group_id else ()
+
+
+class PostsAtomFeed(PostsFeed):
+    feed_type = Atom1Feed
+    subtitle = PostsFeed.description
+
+
+class GroupFeed(PostsFeed):
+    """RSS группы."""
+
+    def get_object(self, request, slug: str) -> Group:
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group: Group) -> str:
+        return f'Yatube: {group.title}'
+
+    def description(self, group: Group) -> str:
+        return group.description
+
+    def link(self, group: Group) -> str:
+        return reverse('posts:group_list', args=(group.slug,))
+
+    def items(self, group: Group):
+        return group.posts.select_related(
+            'group', 'author'
+        )[:settings.SYNDICATION_ITEMS]
+
+
+class GroupAtomFeed(GroupFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, group: Group) -> str:
+        return group.description
+
+
+class AuthorFeed(PostsFeed):
+    """RSS автора."""
+
+    def get_object(self, request, username: str) -> User:
+        return get_object_or_404(User, username=username)
+
+    def title(self, author: User) -> str:
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def description(self, author: User) -> str:
+        return f'Посты пользователя {author.username}'
+
+    def link(self, author: User) -> str:
+        return reverse('posts:profile', args=(author.username,))
+
+    def items(self, author: User):
+        return author.posts.select_related(
+            'group', 'author'
+        )[:settings.SYNDICATION_ITEMS]
+
+
+class AuthorAtomFeed(AuthorFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, author: User) -> str:
+        return self.description(author)
+
+
+def site_feed_scope(request) -> str:
+    return INDEX_SCOPE
+
+
+def group_feed_scope(request, slug: str) -> str:
+    return group_scope(get_object_or_404(
+        Group.objects.values_list('pk', flat=True), slug=slug
+    ))
+
+
+def author_feed_scope(request, username: str) -> str:
+    return author_scope(get_object_or_404(
+        User.objects.values_list('pk', flat=True), username=username
+    ))
+
+
+def cached_feed(feed: Feed, get_scope: Callable) -> Callable:
+    """Представление ленты, готовый документ которой лежит в кэше.
+
+    Ключ кэша и ETag строятся из версии ленты (feed_cache), которую
+    сигналы поднимают при сохранении и удалении поста, поэтому
+    опрос без изменений стоит одного чтения из кэша. Документ
+    собирается из основной базы: с отставшей реплики он закрепился бы
+    под новой версией. Ссылки в документе абсолютные, поэтому ключ
+    включает схему и хост запроса.
+    """
+    get_scope = per_request(get_scope)
+
+    @per_request
+    def feed_version(request, *args, **kwargs) -> str:
+        return str(get_feed_version(get_scope(request, *args, **kwargs)))
+
+    @query_budget(3)
+    @condition(etag_func=feed_version)
+    def view(request, *args, **kwargs):
+        key = FEED_DOCUMENT_KEY.format(
+            feed=type(feed).__name__,
+            scope=get_scope(request, *args, **kwargs),
+            version=feed_version(request, *args, **kwargs),
+            origin=f'{request.scheme}://{request.get_host()}',
+        )
+        document = cache.get(key)
+        if document is None:
+            with read_primary():
+                response = feed(request, *args, **kwargs)
+            document = (
+                response.content,
+                response['Content-Type'],
+                response.get('Last-Modified'),
+            )
+            cache.set(key, document, settings.SYNDICATION_CACHE_TIMEOUT)
+        content, content_type, last_modified = document
+        response = HttpResponse(content, content_type=content_type)
+        if last_modified:
+            response['Last-Modified'] = last_modified
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+    return view
+
+
+site_rss = cached_feed(PostsFeed(), site_feed_scope)
+site_atom = cached_feed(PostsAtomFeed(), site_feed_scope)
+group_rss = cached_feed(GroupFeed(), group_feed_scope)
+group_atom = cached_feed(GroupAtomFeed(), group_feed_scope)
+author_rss = cached_feed(AuthorFeed(), author_feed_scope)
+author_atom = cached_feed(AuthorAtomFeed(), author_feed_scope)
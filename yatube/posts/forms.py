@@ -1,6 +1,8 @@
 from django import forms
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import ingest_upload
 from .models import Comment, Post
 
 User = get_user_model()
@@ -16,6 +18,12 @@ class PostForm(forms.ModelForm):
             'group': 'Группа, к которой будет относиться пост'
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return ingest_upload(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
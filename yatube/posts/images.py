@@ -0,0 +1,133 @@
+import io
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps
+
+KEEP_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def process_image(
+    path: str,
+    max_side: int,
+    quality: int
+) -> Tuple[Optional[bytes], str]:
+    """Поворачивает картинку по EXIF, уменьшает до max_side и
+    перекодирует без метаданных.
+
+    Выполняется в отдельном процессе, поэтому получает только путь
+    к файлу и простые аргументы. Анимации возвращаются как есть (None).
+    """
+    with Image.open(path) as image:
+        source_format = image.format
+        if getattr(image, 'n_frames', 1) > 1:
+            return None, source_format
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        if source_format in KEEP_FORMATS:
+            output_format = source_format
+        elif 'A' in image.getbands():
+            output_format = 'PNG'
+        else:
+            output_format = 'JPEG'
+        if output_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        # exif и icc_profile не передаются - метаданные не сохраняются.
+        image.save(
+            output,
+            output_format,
+            quality=quality,
+            optimize=True
+        )
+    return output.getvalue(), output_format
+
+
+def get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+    if _executor is None and settings.IMAGE_INGEST_WORKERS:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_INGEST_WORKERS
+        )
+    return _executor
+
+
+def run_in_pool(path: str) -> Tuple[Optional[bytes], str]:
+    global _executor
+    args = (path, settings.IMAGE_MAX_SIDE, settings.IMAGE_QUALITY)
+    executor = get_executor()
+    if executor is None:
+        return process_image(*args)
+    future = executor.submit(process_image, *args)
+    try:
+        return future.result(timeout=settings.IMAGE_INGEST_TIMEOUT)
+    except FutureTimeoutError:
+        # Еще не начатая задача снимается с очереди пула; начатую
+        # остановить нельзя, ее результат просто никто не заберет.
+        future.cancel()
+        raise ValidationError('Изображение обрабатывается слишком долго.')
+    except BrokenProcessPool:
+        # Процесс пула убит (например, OOM): пересоздаем пул позже,
+        # а эту картинку обрабатываем на месте.
+        _executor = None
+        return process_image(*args)
+
+
+def spool_to_disk(upload: UploadedFile) -> Tuple[str, bool]:
+    """Путь к файлу загрузки на диске и признак, что его надо удалить.
+
+    Большие загрузки Django уже пишет во временный файл, маленькие
+    сбрасываются на диск по частям, не собираясь в памяти целиком.
+    """
+    if hasattr(upload, 'temporary_file_path'):
+        return upload.temporary_file_path(), False
+    suffix = os.path.splitext(upload.name)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as spool:
+        for chunk in upload.chunks():
+            spool.write(chunk)
+    return spool.name, True
+
+
+def check_dimensions(path: str) -> None:
+    """Проверяет размер по заголовку файла, не декодируя пиксели."""
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+    except Image.DecompressionBombError:
+        raise ValidationError('Слишком большое изображение.')
+    except OSError:
+        raise ValidationError('Не удалось прочитать изображение.')
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            f'Слишком большое изображение: {width}x{height}.'
+        )
+
+
+def ingest_upload(upload: UploadedFile) -> UploadedFile:
+    """Готовит загруженную картинку к хранению и показу."""
+    path, is_spooled = spool_to_disk(upload)
+    try:
+        check_dimensions(path)
+        data, output_format = run_in_pool(path)
+    except (OSError, Image.DecompressionBombError):
+        # Заголовок прочитался, а пиксели нет: файл обрезан или поврежден.
+        raise ValidationError('Не удалось обработать изображение.')
+    finally:
+        if is_spooled:
+            os.remove(path)
+    if data is None:
+        upload.seek(0)
+        return upload
+    name = os.path.splitext(upload.name)[0]
+    return ContentFile(data, name=f'{name}.{EXTENSIONS[output_format]}')
@@ -0,0 +1,164 @@
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts.models import Comment, Follow, Group, Post, User
+
+FULL_SCAN_RE = re.compile(r'SCAN (TABLE )?\w+$|USE TEMP B-TREE', re.M)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу тестовыми данными и печатает EXPLAIN QUERY PLAN '
+        'и время запросов лент до и после составных индексов. '
+        'Все изменения откатываются в конце.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument('--follows', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        with transaction.atomic():
+            self.seed(options)
+            queries = self.get_queries()
+            self.stdout.write(self.style.MIGRATE_HEADING('Без индексов'))
+            self.toggle_indexes(enable=False)
+            before = self.run_queries(queries)
+            self.stdout.write(self.style.MIGRATE_HEADING('С индексами'))
+            self.toggle_indexes(enable=True)
+            after = self.run_queries(queries)
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Итог, мс'))
+        for name in queries:
+            self.stdout.write(
+                f'{name:<16} {before[name]:>10.3f} {after[name]:>10.3f}'
+            )
+
+    def seed(self, options):
+        rnd = random.Random(options['seed'])
+        User.objects.bulk_create(
+            User(username=f'bench_{i}') for i in range(options['users'])
+        )
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'bench-{i}', description='')
+            for i in range(options['groups'])
+        )
+        # SQLite не возвращает pk из bulk_create, перечитываем их.
+        user_ids = list(
+            User.objects.filter(
+                username__startswith='bench_'
+            ).values_list('pk', flat=True)
+        )
+        group_ids = list(
+            Group.objects.filter(
+                slug__startswith='bench-'
+            ).values_list('pk', flat=True)
+        )
+        Post.objects.bulk_create(
+            (
+                Post(
+                    text=f'Пост {i}',
+                    author_id=rnd.choice(user_ids),
+                    group_id=rnd.choice(group_ids + [None]),
+                )
+                for i in range(options['posts'])
+            )
+        )
+        max_post_id = Post.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first()
+        Comment.objects.bulk_create(
+            (
+                Comment(
+                    text=f'Комментарий {i}',
+                    post_id=rnd.randint(1, max_post_id),
+                    author_id=rnd.choice(user_ids),
+                )
+                for i in range(options['comments'])
+            )
+        )
+        follows = {
+            (user_id, author_id)
+            for user_id in user_ids
+            for author_id in rnd.sample(
+                user_ids, min(options['follows'], len(user_ids))
+            )
+            if user_id != author_id
+        }
+        Follow.objects.bulk_create(
+            (Follow(user_id=u, author_id=a) for u, a in follows),
+            ignore_conflicts=True,
+        )
+        self.stdout.write(
+            f'Данные: {len(user_ids)} пользователей, {len(group_ids)} групп, '
+            f'{options["posts"]} постов, {options["comments"]} комментариев, '
+            f'{len(follows)} подписок'
+        )
+
+    def get_queries(self):
+        user = User.objects.filter(username__startswith='bench_').first()
+        group = Group.objects.filter(slug__startswith='bench-').first()
+        post = Post.objects.order_by('-pk').first()
+        feed = ('-pub_date', '-pk')
+        return {
+            'index': Post.objects.select_related(
+                'group', 'author'
+            ).order_by(*feed)[:11],
+            'group_posts': group.posts.select_related(
+                'author'
+            ).order_by(*feed)[:11],
+            'profile': user.posts.order_by(*feed)[:11],
+            'follow_index': Post.objects.select_related(
+                'group', 'author'
+            ).filter(
+                author_id__in=user.follower.values_list('author')
+            ).order_by(*feed)[:11],
+            'comments': post.comments.select_related(
+                'author'
+            ).order_by('-created', '-pk'),
+            'follow_exists': Follow.objects.filter(
+                user=user, author_id=post.author_id
+            ),
+            'followers': user.following.values_list('user'),
+        }
+
+    def toggle_indexes(self, enable):
+        schema_editor = connection.schema_editor(atomic=False)
+        for model in (Post, Comment, Follow):
+            for index in model._meta.indexes:
+                if enable:
+                    schema_editor.add_index(model, index)
+                else:
+                    schema_editor.remove_index(model, index)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def run_queries(self, queries):
+        timings = {}
+        for name, queryset in queries.items():
+            plan = queryset.explain()
+            best = None
+            for _ in range(self.repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                elapsed = (time.perf_counter() - start) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+            style = (
+                self.style.WARNING if FULL_SCAN_RE.search(plan)
+                else self.style.SUCCESS
+            )
+            self.stdout.write(style(f'{name}: {best:.3f} мс'))
+            self.stdout.write(plan)
+        return timings
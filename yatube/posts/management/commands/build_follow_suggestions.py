@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.follow_graph import iter_suggestions, load_follow_graph
+from posts.suggestions import publish_suggestions, replace_suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации «Кого почитать» по графу подписок '
+        'и общим группам. Запускается по расписанию, а не из запросов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=settings.FOLLOW_SUGGESTIONS_STORED,
+            help='Сколько рекомендаций хранить на пользователя.'
+        )
+        parser.add_argument(
+            '--max-group-size',
+            type=int,
+            default=1000,
+            help='Группы с большим числом авторов не учитываются.'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        graph = load_follow_graph(options['max_group_size'])
+        self.stdout.write(
+            f'Граф загружен: пользователей {graph.size}, '
+            f'подписок {len(graph.follows.indices)} '
+            f'за {time.monotonic() - started:.1f} с'
+        )
+        written = 0
+        for (first_id, last_id), rows in iter_suggestions(
+            graph, options['chunk_size'], options['limit']
+        ):
+            written += replace_suggestions(first_id, last_id, rows)
+        publish_suggestions()
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано рекомендаций: {written} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,347 @@
+import csv
+import json
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.bulk import (chunked, finish_bulk_load, get_last_pks,
+                        keep_auto_now_add)
+from posts.models import Comment, Follow, Group, Post, User
+
+MODELS = {
+    'groups': Group,
+    'posts': Post,
+    'comments': Comment,
+    'follows': Follow,
+}
+
+
+# Поля, которые должны быть целыми числами или датами, по моделям.
+INTEGER_FIELDS = {Post: ('id',), Comment: ('post',)}
+DATE_FIELDS = {Post: ('pub_date',), Comment: ('created',)}
+MAX_REPORTED_ERRORS = 20
+# Временная таблица id постов файла для первого прохода.
+IMPORT_IDS_TABLE = 'import_yatube_post_ids'
+
+
+def read_records(
+    path: str,
+    file_format: str
+) -> Iterator[Tuple[int, Optional[Dict]]]:
+    """Читает записи по одной, не загружая файл в память.
+
+    Возвращает номер строки и запись; строка с неверным JSON дает None.
+    """
+    with open(path, encoding='utf-8', newline='') as source:
+        if file_format == 'csv':
+            reader = csv.DictReader(source)
+            for record in reader:
+                yield reader.line_num, record
+            return
+        for number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+
+
+def is_positive_int(value) -> bool:
+    try:
+        return int(value) > 0
+    except (TypeError, ValueError):
+        return False
+
+
+def is_datetime(value) -> bool:
+    try:
+        return parse_datetime(str(value)) is not None
+    except ValueError:
+        return False
+
+
+def record_error(model, record: Optional[Dict]) -> Optional[str]:
+    """Ошибка формата записи или None, если запись читается."""
+    if not isinstance(record, dict):
+        return 'ожидается JSON-объект'
+    for field in INTEGER_FIELDS.get(model, ()):
+        value = record.get(field)
+        if value and not is_positive_int(value):
+            return f'{field}: ожидается положительное целое, а не {value!r}'
+    for field in DATE_FIELDS.get(model, ()):
+        value = record.get(field)
+        if value and not is_datetime(value):
+            return f'{field}: неверная дата {value!r}'
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково импортирует группы, посты, комментарии или подписки '
+        'из JSONL или CSV: bulk_create пачками, транзакция на каждые '
+        '--transaction-size строк. Авторов и группы ищет по username '
+        'и slug в словарях в памяти. После импорта пересчитывает '
+        'счетчики, ленты подписок и поисковый индекс.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(MODELS))
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('jsonl', 'csv'))
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--transaction-size', type=int, default=50000)
+        parser.add_argument(
+            '--create-users',
+            action='store_true',
+            help='Создавать неизвестных пользователей без пароля.'
+        )
+
+    def handle(self, *args, **options):
+        model = MODELS[options['model']]
+        file_format = options['format'] or os.path.splitext(
+            options['path']
+        )[1].lstrip('.').lower()
+        if file_format not in ('jsonl', 'csv'):
+            raise CommandError('Укажите --format: jsonl или csv.')
+        self.create_users = options['create_users']
+        self.batch_size = options['batch_size']
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.skipped = 0
+        self.first_explicit_pk = None
+        self.check_file(model, options['path'], file_format)
+        last_pks = get_last_pks()
+        build = getattr(self, f'build_{model._meta.model_name}')
+
+        started = time.monotonic()
+        imported = 0
+        records = (
+            record
+            for _, record in read_records(options['path'], file_format)
+        )
+        with keep_auto_now_add(model):
+            for chunk in chunked(records, options['transaction_size']):
+                with transaction.atomic():
+                    for batch in chunked(chunk, self.batch_size):
+                        imported += self.import_batch(model, build, batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'{options["model"]}: {imported} строк, '
+                    f'{imported / elapsed:.0f} строк/с'
+                )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано {imported} строк за {elapsed:.1f} с '
+            f'({imported / max(elapsed, 1e-9):.0f} строк/с), '
+            f'пропущено {self.skipped}'
+        ))
+        if model is not Group and imported:
+            if self.first_explicit_pk is not None:
+                last_pks[Post] = min(
+                    last_pks[Post], self.first_explicit_pk - 1
+                )
+            finish_bulk_load(last_pks, self.batch_size, self.stdout)
+
+    def check_file(self, model, path: str, file_format: str) -> None:
+        """Первый проход по файлу: формат записей и id постов.
+
+        Импорт начинается, только если файл целиком корректен, поэтому
+        ошибка в конце файла не оставляет базу загруженной наполовину.
+        id постов собираются во временной таблице SQLite, а не в памяти.
+        """
+        errors = 0
+        with connection.cursor() as db:
+            db.execute(
+                f'CREATE TEMP TABLE {IMPORT_IDS_TABLE} '
+                f'(id INTEGER PRIMARY KEY, line INTEGER)'
+            )
+            try:
+                for chunk in chunked(
+                    read_records(path, file_format), self.batch_size
+                ):
+                    for line, error in self.check_chunk(db, model, chunk):
+                        errors += 1
+                        if errors <= MAX_REPORTED_ERRORS:
+                            self.stderr.write(f'Строка {line}: {error}')
+                if errors:
+                    raise CommandError(
+                        f'Ошибок в файле: {errors}, ничего не импортировано.'
+                    )
+                self.check_free_post_ids(db)
+            finally:
+                db.execute(f'DROP TABLE {IMPORT_IDS_TABLE}')
+
+    def check_chunk(
+        self,
+        db,
+        model,
+        chunk: List[Tuple[int, Optional[Dict]]]
+    ) -> Iterator[Tuple[int, str]]:
+        """Ошибки пачки записей; id постов пачки сверяются с уже
+        записанными во временную таблицу и друг с другом.
+        """
+        ids: Dict[int, int] = {}
+        for line, record in chunk:
+            error = record_error(model, record)
+            if error is None and model is Post and record.get('id'):
+                pk = int(record['id'])
+                if pk in ids:
+                    error = f'id {pk} уже встречался в строке {ids[pk]}'
+                else:
+                    ids[pk] = line
+            if error is not None:
+                yield line, error
+        if not ids:
+            return
+        db.execute(
+            f'SELECT id, line FROM {IMPORT_IDS_TABLE} '
+            f'WHERE id IN ({", ".join(["%s"] * len(ids))})',
+            list(ids)
+        )
+        seen = dict(db.fetchall())
+        for pk, line in ids.items():
+            if pk in seen:
+                yield line, f'id {pk} уже встречался в строке {seen[pk]}'
+        db.executemany(
+            f'INSERT OR IGNORE INTO {IMPORT_IDS_TABLE} (id, line) '
+            f'VALUES (%s, %s)',
+            list(ids.items())
+        )
+
+    def check_free_post_ids(self, db) -> None:
+        """id постов из файла не должны быть заняты: bulk_create
+        с существующим pk оборвал бы импорт посередине.
+        """
+        taken = (
+            f'FROM {IMPORT_IDS_TABLE} i '
+            f'JOIN {Post._meta.db_table} p ON p.id = i.id'
+        )
+        db.execute(f'SELECT COUNT(*) {taken}')
+        count = db.fetchone()[0]
+        if not count:
+            return
+        db.execute(
+            f'SELECT i.id {taken} ORDER BY i.id LIMIT %s',
+            [MAX_REPORTED_ERRORS]
+        )
+        shown = ', '.join(str(pk) for pk, in db.fetchall())
+        raise CommandError(
+            f'id постов уже заняты ({count}): {shown}. '
+            f'Уберите id из файла, чтобы посты получили новые.'
+        )
+
+    def import_batch(self, model, build, batch: List[Dict]) -> int:
+        if self.create_users:
+            self.add_missing_users(batch)
+        if model is Comment:
+            # Внешние ключи SQLite проверяются при коммите: комментарий
+            # к несуществующему посту откатил бы всю транзакцию.
+            self.batch_posts = set(Post.objects.filter(pk__in={
+                int(record['post']) for record in batch if record.get('post')
+            }).values_list('pk', flat=True))
+        objects = []
+        for record in batch:
+            obj = build(record)
+            if obj is None:
+                self.skipped += 1
+            else:
+                objects.append(obj)
+        # batch_size не передается: Django 2.2 не ограничивает явный
+        # размер лимитами SQLite на число параметров в запросе.
+        model.objects.bulk_create(
+            objects,
+            ignore_conflicts=model in (Group, Follow)
+        )
+        return len(objects)
+
+    def add_missing_users(self, batch: List[Dict]) -> None:
+        usernames = {
+            record.get(field)
+            for record in batch
+            for field in ('author', 'user')
+            if record.get(field)
+        } - self.users.keys()
+        if not usernames:
+            return
+        password = make_password(None)
+        User.objects.bulk_create(
+            (User(username=username, password=password)
+             for username in usernames),
+            ignore_conflicts=True
+        )
+        self.users.update(
+            User.objects.filter(username__in=usernames).values_list(
+                'username', 'pk'
+            )
+        )
+
+    def parse_date(self, value: Optional[str]):
+        if not value:
+            return timezone.now()
+        date = parse_datetime(value)
+        if date is None:
+            raise CommandError(f'Неверная дата: {value}')
+        if timezone.is_naive(date):
+            date = timezone.make_aware(date)
+        return date
+
+    def build_group(self, record: Dict) -> Optional[Group]:
+        if not record.get('slug'):
+            return None
+        return Group(
+            title=record.get('title') or record['slug'],
+            slug=record['slug'],
+            description=record.get('description', ''),
+        )
+
+    def build_post(self, record: Dict) -> Optional[Post]:
+        author_id = self.users.get(record.get('author'))
+        group_id = self.groups.get(record.get('group'))
+        if (
+            author_id is None
+            or not record.get('text')
+            or (record.get('group') and group_id is None)
+        ):
+            return None
+        pk = int(record['id']) if record.get('id') else None
+        if pk is not None and (
+            self.first_explicit_pk is None or pk < self.first_explicit_pk
+        ):
+            self.first_explicit_pk = pk
+        return Post(
+            pk=pk,
+            text=record['text'],
+            author_id=author_id,
+            group_id=group_id,
+            pub_date=self.parse_date(record.get('pub_date')),
+        )
+
+    def build_comment(self, record: Dict) -> Optional[Comment]:
+        author_id = self.users.get(record.get('author'))
+        post_id = int(record['post']) if record.get('post') else None
+        if (
+            author_id is None
+            or post_id not in self.batch_posts
+            or not record.get('text')
+        ):
+            return None
+        return Comment(
+            post_id=post_id,
+            author_id=author_id,
+            text=record['text'],
+            created=self.parse_date(record.get('created')),
+        )
+
+    def build_follow(self, record: Dict) -> Optional[Follow]:
+        user_id = self.users.get(record.get('user'))
+        author_id = self.users.get(record.get('author'))
+        if user_id is None or author_id is None or user_id == author_id:
+            return None
+        return Follow(user_id=user_id, author_id=author_id)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново строит полнотекстовый индекс постов и комментариев '
+        'пачками по первичному ключу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        # Одна транзакция: поиск видит старый индекс до конца перестройки.
+        with transaction.atomic():
+            posts, comments = rebuild_index(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов {posts}, комментариев {comments}'
+        ))
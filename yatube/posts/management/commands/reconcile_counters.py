@@ -0,0 +1,51 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import (reconcile_day_counts, reconcile_posts,
+                            reconcile_users)
+from posts.models import Post, User
+from posts.timeline import CELEBRITIES_CACHE_KEY
+
+
+def iter_pk_batches(queryset, batch_size):
+    last_pk = 0
+    while True:
+        batch = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk').values_list(
+                'pk', flat=True
+            )[:batch_size]
+        )
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счетчики постов, комментариев, '
+        'подписок и постов по дням и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fixed_users = fixed_posts = 0
+        for user_ids in iter_pk_batches(User.objects, batch_size):
+            with transaction.atomic():
+                fixed_users += reconcile_users(user_ids)
+        if fixed_users:
+            # Исправленные followers_count могли сменить знаменитостей.
+            cache.delete(CELEBRITIES_CACHE_KEY)
+        for post_ids in iter_pk_batches(Post.objects, batch_size):
+            with transaction.atomic():
+                fixed_posts += reconcile_posts(post_ids)
+        with transaction.atomic():
+            fixed_days = reconcile_day_counts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счетчиков: пользователей {fixed_users}, '
+            f'постов {fixed_posts}, дней {fixed_days}'
+        ))
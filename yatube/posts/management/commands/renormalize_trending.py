@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.trending import renormalize
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит оценки популярности постов к текущему моменту '
+        'и удаляет затухшие. Запускается по расписанию.'
+    )
+
+    def handle(self, *args, **options):
+        moved, dropped = renormalize()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано оценок: {moved}, удалено затухших: {dropped}'
+        ))
@@ -0,0 +1,266 @@
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from posts.bulk import (chunked, finish_bulk_load, get_last_pks,
+                        keep_auto_now_add)
+from posts.models import Comment, Follow, Group, Post, User
+
+WORDS = (
+    'лента', 'пост', 'группа', 'автор', 'подписка', 'комментарий',
+    'кэш', 'индекс', 'запрос', 'страница', 'картинка', 'поиск', 'город',
+    'кот', 'ежик', 'барсук', 'лес', 'река', 'море', 'горы', 'утро',
+    'вечер', 'книга', 'музыка', 'кино', 'погода', 'работа', 'отпуск',
+    'новости', 'спорт', 'еда', 'кофе', 'чай', 'дорога', 'друзья',
+)
+
+
+def zipf_cum_weights(size: int, exponent: float) -> List[float]:
+    """Накопленные веса рангов 1..size по закону Ципфа для
+    random.choices: немногие элементы получают большую часть выборок.
+    """
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими данными: пользователи, группы, '
+        'посты, комментарии и граф подписок со степенным распределением '
+        'числа подписчиков и несколькими знаменитостями. Пишет через '
+        'bulk_create, при одинаковом --seed результат одинаковый.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--comments', type=int, default=1000000)
+        parser.add_argument(
+            '--avg-follows',
+            type=float,
+            default=20,
+            help='Среднее число подписок пользователя.'
+        )
+        parser.add_argument(
+            '--exponent',
+            type=float,
+            default=1.1,
+            help='Показатель степенного закона популярности авторов.'
+        )
+        parser.add_argument('--celebrities', type=int, default=5)
+        parser.add_argument(
+            '--celebrity-reach',
+            type=float,
+            default=0.3,
+            help='Доля пользователей, подписанных на каждую знаменитость.'
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument(
+            '--until',
+            default='2022-03-01',
+            help='Дата последнего поста, ГГГГ-ММ-ДД.'
+        )
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument(
+            '--password',
+            help='Пароль всех пользователей; по умолчанию вход запрещен.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--transaction-size', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.check_prefix()
+        self.rnd = random.Random(options['seed'])
+        self.started = time.monotonic()
+        self.until = timezone.make_aware(datetime.combine(
+            parse_date(options['until']), datetime.min.time()
+        ))
+        self.span = timedelta(days=options['days'])
+        last_pks = get_last_pks()
+
+        user_ids = self.seed_users()
+        group_ids = self.seed_groups()
+        self.author_weights = zipf_cum_weights(
+            len(user_ids), options['exponent']
+        )
+        # Плодовитость слабее связана с рангом, чем популярность, иначе
+        # ленты подписчиков первых авторов растут квадратично.
+        self.writer_weights = zipf_cum_weights(
+            len(user_ids), options['exponent'] / 2
+        )
+        with keep_auto_now_add(Post, Comment):
+            post_ids = self.seed_posts(user_ids, group_ids)
+            self.seed_comments(user_ids, post_ids)
+        self.seed_follows(user_ids)
+        finish_bulk_load(last_pks, options['batch_size'], self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - self.started:.1f} с'
+        ))
+
+    def check_prefix(self) -> None:
+        """Новые пользователи и группы выбираются по префиксу: занятый
+        префикс дал бы пустой или смешанный с чужими строками набор.
+        """
+        prefix = self.options['prefix']
+        if self.options['users'] < 1:
+            raise CommandError('--users должно быть больше нуля.')
+        users = User.objects.filter(username__startswith=f'{prefix}_')
+        groups = Group.objects.filter(slug__startswith=f'{prefix}-')
+        if users.exists() or groups.exists():
+            raise CommandError(
+                f'Префикс {prefix} уже занят, укажите другой --prefix.'
+            )
+
+    def insert(self, model, objects: Iterable, **kwargs) -> None:
+        """Пишет объекты пачками, транзакция на --transaction-size
+        строк, и печатает скорость.
+        """
+        started = time.monotonic()
+        total = 0
+        for chunk in chunked(objects, self.options['transaction_size']):
+            with transaction.atomic():
+                for batch in chunked(chunk, self.options['batch_size']):
+                    # batch_size не передается: Django 2.2 не ограничивает
+                    # явный размер лимитами SQLite.
+                    model.objects.bulk_create(batch, **kwargs)
+            total += len(chunk)
+            elapsed = max(time.monotonic() - started, 1e-9)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {total} строк, '
+                f'{total / elapsed:.0f} строк/с'
+            )
+
+    def new_ids(self, queryset) -> List[int]:
+        # SQLite не возвращает pk из bulk_create, перечитываем их.
+        return list(queryset.order_by('pk').values_list('pk', flat=True))
+
+    def seed_users(self) -> List[int]:
+        prefix = self.options['prefix']
+        last_pk = User.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        password = make_password(self.options['password'])
+        self.insert(User, (
+            User(username=f'{prefix}_{i}', password=password)
+            for i in range(self.options['users'])
+        ), ignore_conflicts=True)
+        return self.new_ids(User.objects.filter(
+            pk__gt=last_pk, username__startswith=f'{prefix}_'
+        ))
+
+    def seed_groups(self) -> List[int]:
+        prefix = self.options['prefix']
+        last_pk = Group.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        self.insert(Group, (
+            Group(
+                title=f'Группа {i}',
+                slug=f'{prefix}-{i}',
+                description=self.text(5, 20),
+            )
+            for i in range(self.options['groups'])
+        ), ignore_conflicts=True)
+        return self.new_ids(Group.objects.filter(
+            pk__gt=last_pk, slug__startswith=f'{prefix}-'
+        ))
+
+    def text(self, min_words: int, max_words: int) -> str:
+        return ' '.join(self.rnd.choices(
+            WORDS, k=self.rnd.randint(min_words, max_words)
+        )).capitalize()
+
+    def post_date(self, number: int) -> datetime:
+        # Даты растут вместе с номером поста, как при живой публикации.
+        total = max(self.options['posts'], 1)
+        return self.until - self.span * (1 - number / total)
+
+    def seed_posts(
+        self,
+        user_ids: List[int],
+        group_ids: List[int]
+    ) -> List[int]:
+        last_pk = Post.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        group_weights = zipf_cum_weights(len(group_ids), 1)
+        rnd = self.rnd
+
+        def posts() -> Iterator[Post]:
+            for number in range(self.options['posts']):
+                group_id = None
+                if group_ids and rnd.random() < 0.7:
+                    group_id = rnd.choices(
+                        group_ids, cum_weights=group_weights
+                    )[0]
+                yield Post(
+                    text=self.text(5, 60),
+                    author_id=rnd.choices(
+                        user_ids, cum_weights=self.writer_weights
+                    )[0],
+                    group_id=group_id,
+                    pub_date=self.post_date(number),
+                )
+
+        self.insert(Post, posts())
+        # pk новых постов не обязаны идти подряд от last_pk + 1
+        # (AUTOINCREMENT не переиспользует номера удаленных строк).
+        return self.new_ids(Post.objects.filter(pk__gt=last_pk))
+
+    def seed_comments(self, user_ids: List[int], post_ids: List[int]) -> None:
+        if not post_ids:
+            return
+        rnd = self.rnd
+
+        def comments() -> Iterator[Comment]:
+            for _ in range(self.options['comments']):
+                # Посты вставлены по порядку номеров, номер дает и дату.
+                number = rnd.randrange(len(post_ids))
+                yield Comment(
+                    post_id=post_ids[number],
+                    author_id=rnd.choice(user_ids),
+                    text=self.text(2, 30),
+                    created=self.post_date(number) + timedelta(
+                        minutes=rnd.randint(1, 600)
+                    ),
+                )
+
+        self.insert(Comment, comments())
+
+    def seed_follows(self, user_ids: List[int]) -> None:
+        """Число подписчиков автора подчиняется закону Ципфа по его
+        рангу, на знаменитостей дополнительно подписана заданная доля
+        всех пользователей.
+        """
+        rnd = self.rnd
+        celebrities = user_ids[:self.options['celebrities']]
+        reach = self.options['celebrity_reach']
+        avg_follows = self.options['avg_follows']
+
+        def follows() -> Iterator[Follow]:
+            for user_id in user_ids:
+                wanted = int(rnd.expovariate(1 / avg_follows))
+                authors = set(rnd.choices(
+                    user_ids, cum_weights=self.author_weights, k=wanted
+                ))
+                authors.update(
+                    celebrity for celebrity in celebrities
+                    if rnd.random() < reach
+                )
+                authors.discard(user_id)
+                for author_id in sorted(authors):
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        self.insert(Follow, follows(), ignore_conflicts=True)
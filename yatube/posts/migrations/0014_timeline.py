@@ -0,0 +1,53 @@
+# Generated by Django 2.2.6 on 2026-10-18 04:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Один INSERT ... SELECT по всему графу подписок вместо запроса
+# на каждую подписку.
+BACKFILL_TIMELINES = (
+    'INSERT OR IGNORE INTO posts_timeline '
+    '(user_id, post_id, author_id, pub_date) '
+    'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+    'FROM posts_post p '
+    'JOIN posts_follow f ON f.author_id = p.author_id'
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0013_auto_20261018_0417'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Timeline',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.Post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timeline',
+            index=models.Index(fields=['user', 'pub_date', 'post'], name='timeline_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeline',
+            index=models.Index(fields=['user', 'author'], name='timeline_user_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timeline',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_timeline_post'),
+        ),
+        migrations.RunSQL(BACKFILL_TIMELINES, migrations.RunSQL.noop),
+    ]
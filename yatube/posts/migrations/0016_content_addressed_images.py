@@ -0,0 +1,35 @@
+# Generated by Django 2.2.6 on 2026-10-18 04:30
+
+import core.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_image_references(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    MediaBlob = apps.get_model('core', 'MediaBlob')
+    images = Post.objects.exclude(image='').order_by().values(
+        'image'
+    ).annotate(total=Count('pk')).values_list('image', 'total')
+    MediaBlob.objects.bulk_create(
+        MediaBlob(name=name, refcount=total) for name, total in images
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_mediablob'),
+        ('posts', '0015_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=core.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(
+            count_image_references, migrations.RunPython.noop
+        ),
+    ]
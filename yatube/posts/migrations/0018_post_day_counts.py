@@ -0,0 +1,37 @@
+# Generated by Django 2.2.6 on 2026-10-18 04:34
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def fill_day_counts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    PostDayCount = apps.get_model('posts', 'PostDayCount')
+    days = Post.objects.annotate(day=TruncDate('pub_date')).order_by(
+    ).values('day').annotate(total=Count('pk')).values_list('day', 'total')
+    PostDayCount.objects.bulk_create(
+        PostDayCount(day=day, count=total) for day, total in days
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostDayCount',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False, verbose_name='День')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Число постов')),
+            ],
+            options={
+                'verbose_name': 'Постов за день',
+                'verbose_name_plural': 'Постов по дням',
+            },
+        ),
+        migrations.RunPython(fill_day_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.6 on 2026-10-18 05:11
+
+from django.db import migrations, models
+import django.db.models.expressions
+from django.db.models import F
+
+
+def delete_self_follows(apps, schema_editor):
+    # Сигналы в миграции не работают: счетчики и ленты правятся здесь.
+    # Подписка уникальна, у каждого пользователя самоподписка одна.
+    Follow = apps.get_model('posts', 'Follow')
+    Timeline = apps.get_model('posts', 'Timeline')
+    UserStats = apps.get_model('posts', 'UserStats')
+    self_follows = Follow.objects.filter(user=F('author'))
+    user_ids = list(self_follows.values_list('user_id', flat=True))
+    if not user_ids:
+        return
+    self_follows.delete()
+    Timeline.objects.filter(user_id__in=user_ids, author=F('user')).delete()
+    for field in ('followers_count', 'following_count'):
+        UserStats.objects.filter(
+            user_id__in=user_ids, **{f'{field}__gt': 0}
+        ).update(**{field: F(field) - 1})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_trending_scores'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_self_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(check=models.Q(_negated=True, user=django.db.models.expressions.F('author')), name='prevent_self_follow'),
+        ),
+    ]
@@ -2,6 +2,8 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from pytils.translit import slugify
 
+from core.storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -46,13 +48,39 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Индексы под курсорную пагинацию лент: (pub_date, id)
+        # с префиксом фильтра ленты.
+        indexes = [
+            models.Index(
+                fields=['pub_date', 'id'],
+                name='post_feed_idx',
+            ),
+            models.Index(
+                fields=['author', 'pub_date', 'id'],
+                name='post_author_feed_idx',
+            ),
+            models.Index(
+                fields=['group', 'pub_date', 'id'],
+                name='post_group_feed_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
@@ -83,6 +111,12 @@ class Comment(models.Model):
         ordering = ('-created',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -104,4 +138,168 @@ class Follow(models.Model):
                 fields=['user', 'author'],
                 name='unique_follows',
             ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='prevent_self_follow',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
         ]
+
+
+class UserStats(models.Model):
+    """Счетчики пользователя, которые иначе считались бы через COUNT."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0,
+        db_index=True
+    )
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счетчики пользователя'
+        verbose_name_plural = 'Счетчики пользователей'
+
+    def __str__(self) -> str:
+        return f'{self.user}'
+
+
+class Timeline(models.Model):
+    """Материализованная лента подписок: строка на пару (подписчик, пост).
+
+    Заполняется при публикации поста (fan-out on write), поэтому
+    follow_index читает ленту одного пользователя по индексу.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_post',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date', 'post'],
+                name='timeline_feed_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx',
+            ),
+        ]
+
+
+class PostDayCount(models.Model):
+    """Число постов за день: иерархия дат в админке и оценка числа
+    постов читают эту таблицу вместо агрегатов по posts_post.
+    """
+    day = models.DateField('День', primary_key=True)
+    count = models.PositiveIntegerField('Число постов', default=0)
+
+    class Meta:
+        verbose_name = 'Постов за день'
+        verbose_name_plural = 'Постов по дням'
+
+    def __str__(self) -> str:
+        return f'{self.day}: {self.count}'
+
+
+class FollowSuggestion(models.Model):
+    """Кого предложить в подписки: готовый список на пользователя.
+
+    Пересчитывается пакетно командой build_follow_suggestions, панель
+    «Кого почитать» читает его одним запросом по индексу (user, -score).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+        verbose_name='Пользователь'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Предлагаемый автор'
+    )
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        verbose_name = 'Рекомендация подписки'
+        verbose_name_plural = 'Рекомендации подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow_suggestion',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-score'],
+                name='suggestion_user_score_idx',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.user} -> {self.author}'
+
+
+class TrendingScore(models.Model):
+    """Оценка популярности поста с экспоненциальным затуханием.
+
+    Событие в момент t добавляет вес * 2 ** ((t - epoch) / период
+    полураспада). Порядок по score совпадает с порядком затухших оценок
+    на любой момент, поэтому при событии меняется одна строка, а не все.
+    Значения растут со временем - команда renormalize_trending
+    периодически пересчитывает их к новой точке отсчета.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+        verbose_name='Пост'
+    )
+    score = models.FloatField('Оценка', db_index=True)
+    epoch = models.DateTimeField('Точка отсчета', db_index=True)
+
+    class Meta:
+        verbose_name = 'Популярность поста'
+        verbose_name_plural = 'Популярность постов'
+
+    def __str__(self) -> str:
+        return f'{self.post_id}: {self.score:.3f}'
@@ -0,0 +1,97 @@
+"""Изменения, которые представления выполняют через core.writer.write.
+
+Функции получают уже проверенные формы, загруженные объекты или имена
+пользователей, поэтому в транзакции остаются только записи.
+"""
+from typing import List, Sequence
+
+from django.db import connection
+from django.db.models.signals import post_save
+
+from core.tasks import enqueue
+
+from .forms import CommentForm, PostForm
+from .models import Comment, Follow, Post, User
+from .thumbnails import generate_post_thumbnails
+
+# Автор ищется по имени в том же запросе. Подписка на себя отсекается
+# условием (ограничение prevent_self_follow иначе прервало бы весь
+# INSERT), существующие подписки - ON CONFLICT.
+FOLLOW_SQL = f'''
+    INSERT INTO {Follow._meta.db_table} (user_id, author_id)
+    SELECT %s, id FROM {User._meta.db_table}
+    WHERE username IN ({{usernames}}) AND id <> %s
+    ON CONFLICT (user_id, author_id) DO NOTHING
+    RETURNING id, author_id
+'''
+
+
+def create_post(form: PostForm, author: User) -> Post:
+    post = form.save(commit=False)
+    post.author = author
+    form.save(commit=True)
+    if post.image:
+        enqueue(generate_post_thumbnails, post_id=post.pk)
+    return post
+
+
+def edit_post(form: PostForm) -> Post:
+    post = form.save()
+    if post.image and 'image' in form.changed_data:
+        enqueue(generate_post_thumbnails, post_id=post.pk)
+    return post
+
+
+def create_comment(form: CommentForm, post: Post, author: User) -> Comment:
+    comment = form.save(commit=False)
+    comment.author = author
+    comment.post = post
+    comment.save()
+    return comment
+
+
+def follow_authors(user: User, usernames: Sequence[str]) -> List[int]:
+    """Подписывает user на авторов одним INSERT ... ON CONFLICT DO NOTHING.
+
+    Для новых подписок отправляется post_save, как после
+    Follow.objects.create: счетчики, ленты и популярное обновляются
+    обычными обработчиками. Возвращает id авторов новых подписок.
+    """
+    if not usernames:
+        return []
+    placeholders = ', '.join(['%s'] * len(usernames))
+    with connection.cursor() as db:
+        db.execute(
+            FOLLOW_SQL.format(usernames=placeholders),
+            [user.pk, *usernames, user.pk]
+        )
+        rows = db.fetchall()
+    for pk, author_id in rows:
+        post_save.send(
+            sender=Follow,
+            instance=Follow(pk=pk, user_id=user.pk, author_id=author_id),
+            created=True,
+            update_fields=None,
+            raw=False,
+            using=connection.alias,
+        )
+    return [author_id for _, author_id in rows]
+
+
+def unfollow_authors(user: User, usernames: Sequence[str]) -> int:
+    """Удаляет подписки user на авторов; возвращает их число."""
+    if not usernames:
+        return 0
+    deleted, _ = Follow.objects.filter(
+        user=user, author__username__in=usernames
+    ).delete()
+    return deleted
+
+
+def change_follows(
+    user: User,
+    follow: Sequence[str],
+    unfollow: Sequence[str]
+) -> None:
+    follow_authors(user, follow)
+    unfollow_authors(user, unfollow)
@@ -0,0 +1,216 @@
+import re
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection
+from django.utils.encoding import force_bytes, force_str
+from django.utils.html import escape
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.utils.safestring import SafeString, mark_safe
+
+from .models import Comment, Post
+
+POST_INDEX = 'posts_post_fts'
+COMMENT_INDEX = 'posts_comment_fts'
+POST_HIT = 'p'
+COMMENT_HIT = 'c'
+
+# Границы совпадения в snippet(): управляющие символы не встречаются
+# в тексте, поэтому после экранирования их можно заменить на <mark>.
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+SNIPPET_TOKENS = 16
+MAX_TERMS = 10
+
+SEARCH_SQL = f'''
+    SELECT kind, rowid, post_id, fragment, score FROM (
+        SELECT '{POST_HIT}' AS kind, rowid, rowid AS post_id,
+            snippet({POST_INDEX}, 0, %s, %s, '…', %s) AS fragment,
+            bm25({POST_INDEX}) AS score
+        FROM {POST_INDEX} WHERE {POST_INDEX} MATCH %s
+        UNION ALL
+        SELECT '{COMMENT_HIT}', rowid, post_id,
+            snippet({COMMENT_INDEX}, 0, %s, %s, '…', %s),
+            bm25({COMMENT_INDEX})
+        FROM {COMMENT_INDEX} WHERE {COMMENT_INDEX} MATCH %s
+    )
+    WHERE (score, kind, rowid) > (%s, %s, %s)
+    ORDER BY score, kind, rowid
+    LIMIT %s
+'''
+
+
+class SearchHit(NamedTuple):
+    kind: str
+    post: Post
+    snippet: SafeString
+
+    @property
+    def is_comment(self) -> bool:
+        return self.kind == COMMENT_HIT
+
+
+def build_match_query(text: str) -> Optional[str]:
+    """Превращает ввод пользователя в запрос FTS5: каждое слово
+    в кавычках, слова через И. Операторы FTS5 из ввода не проходят.
+    """
+    words = re.findall(r'\w+', text)[:MAX_TERMS]
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words)
+
+
+def encode_search_cursor(score: float, kind: str, rowid: int) -> str:
+    return urlsafe_base64_encode(force_bytes(f'{score!r}|{kind}|{rowid}'))
+
+
+def decode_search_cursor(token: Optional[str]) -> Optional[Tuple]:
+    """Позиция (score, kind, rowid); для битого токена - None."""
+    if not token:
+        return None
+    try:
+        score, kind, rowid = force_str(
+            urlsafe_base64_decode(token)
+        ).split('|')
+        return float(score), kind, int(rowid)
+    except (TypeError, ValueError):
+        return None
+
+
+def highlight(fragment: str) -> SafeString:
+    return mark_safe(
+        escape(fragment).replace(
+            MATCH_START, '<mark>'
+        ).replace(MATCH_END, '</mark>')
+    )
+
+
+def search(
+    text: str,
+    cursor: Optional[str] = None,
+    limit: int = settings.NUM_POSTS
+) -> Tuple[List[SearchHit], Optional[str]]:
+    """Ищет по постам и комментариям, лучшие совпадения первыми.
+
+    Возвращает страницу результатов и курсор следующей страницы.
+    Ранжирование - bm25 индекса FTS5; страницы режутся по ключу
+    (score, kind, rowid), без OFFSET.
+    """
+    match = build_match_query(text)
+    if match is None:
+        return [], None
+    position = decode_search_cursor(cursor) or (float('-inf'), '', 0)
+    snippet_args = (MATCH_START, MATCH_END, SNIPPET_TOKENS)
+    with connection.cursor() as db:
+        db.execute(
+            SEARCH_SQL,
+            (*snippet_args, match, *snippet_args, match, *position,
+             limit + 1)
+        )
+        rows = db.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        kind, rowid, _, _, score = rows[-1]
+        next_cursor = encode_search_cursor(score, kind, rowid)
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        {row[2] for row in rows}
+    )
+    hits = [
+        SearchHit(kind, posts[post_id], highlight(fragment))
+        for kind, _, post_id, fragment, _ in rows
+        if post_id in posts
+    ]
+    return hits, next_cursor
+
+
+def index_post(post: Post) -> None:
+    with connection.cursor() as db:
+        db.execute(f'DELETE FROM {POST_INDEX} WHERE rowid = %s', [post.pk])
+        db.execute(
+            f'INSERT INTO {POST_INDEX} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text]
+        )
+
+
+def unindex_post(post_id: int) -> None:
+    with connection.cursor() as db:
+        db.execute(f'DELETE FROM {POST_INDEX} WHERE rowid = %s', [post_id])
+
+
+def index_comment(comment: Comment) -> None:
+    with connection.cursor() as db:
+        db.execute(
+            f'DELETE FROM {COMMENT_INDEX} WHERE rowid = %s', [comment.pk]
+        )
+        db.execute(
+            f'INSERT INTO {COMMENT_INDEX} (rowid, text, post_id) '
+            f'VALUES (%s, %s, %s)',
+            [comment.pk, comment.text, comment.post_id]
+        )
+
+
+def unindex_comment(comment_id: int) -> None:
+    with connection.cursor() as db:
+        db.execute(
+            f'DELETE FROM {COMMENT_INDEX} WHERE rowid = %s', [comment_id]
+        )
+
+
+def index_new_rows(post_after: int, comment_after: int) -> None:
+    """Индексирует строки, добавленные в обход сигналов (bulk_create),
+    с первичным ключом больше заданного.
+    """
+    with connection.cursor() as db:
+        db.execute(
+            f'INSERT OR REPLACE INTO {POST_INDEX} (rowid, text) '
+            f'SELECT id, text FROM {Post._meta.db_table} WHERE id > %s',
+            [post_after]
+        )
+        db.execute(
+            f'INSERT OR REPLACE INTO {COMMENT_INDEX} (rowid, text, post_id) '
+            f'SELECT id, text, post_id FROM {Comment._meta.db_table} '
+            f'WHERE id > %s',
+            [comment_after]
+        )
+
+
+def _iter_batches(queryset, fields: Tuple, batch_size: int) -> Iterable:
+    last_pk = 0
+    while True:
+        batch = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk').values_list(
+                'pk', *fields
+            )[:batch_size]
+        )
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1][0]
+
+
+def rebuild_index(batch_size: int) -> Tuple[int, int]:
+    """Заново заполняет оба индекса пачками по первичному ключу.
+
+    Возвращает число проиндексированных постов и комментариев.
+    """
+    totals = []
+    for index, queryset, fields in (
+        (POST_INDEX, Post.objects.all(), ('text',)),
+        (COMMENT_INDEX, Comment.objects.all(), ('text', 'post_id')),
+    ):
+        columns = ', '.join(('rowid',) + fields)
+        placeholders = ', '.join(['%s'] * (len(fields) + 1))
+        total = 0
+        with connection.cursor() as db:
+            db.execute(f'DELETE FROM {index}')
+            for batch in _iter_batches(queryset, fields, batch_size):
+                db.executemany(
+                    f'INSERT INTO {index} ({columns}) '
+                    f'VALUES ({placeholders})',
+                    batch
+                )
+                total += len(batch)
+            db.execute(f"INSERT INTO {index} ({index}) VALUES ('optimize')")
+        totals.append(total)
+    return tuple(totals)
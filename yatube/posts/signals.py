@@ -0,0 +1,176 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from core.storage import acquire_blob, release_blob
+
+from .counters import (change_comments_count, change_day_count,
+                       change_user_counter, post_day)
+from .feed_cache import (INDEX_SCOPE, author_scope, bump_feed_version,
+                         group_scope)
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .search import (index_comment, index_post, unindex_comment,
+                     unindex_post)
+from .timeline import (backfill_timeline, fan_out_post, followers_changed,
+                       remove_from_timeline)
+from .trending import record_activity, record_follow
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    if created:
+        fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_on_follow(sender, instance, created, **kwargs):
+    if created:
+        backfill_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def clean_up_on_unfollow(sender, instance, **kwargs):
+    remove_from_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(post_init, sender=Post)
+def remember_loaded_state(sender, instance, **kwargs):
+    # Группа и картинка поста при загрузке: при смене группы в post_edit
+    # нужно сбросить кэш и старой, и новой группы, при смене картинки -
+    # освободить старый файл. __dict__ не трогает отложенные поля.
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+    image = instance.__dict__.get('image')
+    instance._loaded_image = getattr(image, 'name', image)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_feeds(sender, instance, **kwargs):
+    scopes = {INDEX_SCOPE, author_scope(instance.author_id)}
+    for group_id in (instance._loaded_group_id, instance.group_id):
+        if group_id is not None:
+            scopes.add(group_scope(group_id))
+    bump_feed_version(*scopes)
+    instance._loaded_group_id = instance.group_id
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_feeds(sender, instance, created, **kwargs):
+    # Название группы - категория постов в общей ленте.
+    if not created:
+        bump_feed_version(INDEX_SCOPE, group_scope(instance.pk))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_feeds(sender, instance, created, update_fields,
+                            **kwargs):
+    # Имя автора есть в его ленте и в общей; вход пользователя
+    # сохраняет только last_login и ленты не меняет.
+    if created or (
+        update_fields is not None
+        and not update_fields & {'username', 'first_name', 'last_name'}
+    ):
+        return
+    bump_feed_version(INDEX_SCOPE, author_scope(instance.pk))
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        change_user_counter(instance.author_id, 'posts_count', 1)
+        change_day_count(post_day(instance), 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change_user_counter(instance.author_id, 'posts_count', -1)
+    change_day_count(post_day(instance), -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    change_comments_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, **kwargs):
+    if created:
+        change_user_counter(instance.author_id, 'followers_count', 1)
+        change_user_counter(instance.user_id, 'following_count', 1)
+        followers_changed(instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    change_user_counter(instance.author_id, 'followers_count', -1)
+    change_user_counter(instance.user_id, 'following_count', -1)
+    followers_changed(instance.author_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def track_image_references(sender, instance, created, **kwargs):
+    # None - картинка не загружалась (отложенное поле), сравнить не с чем.
+    old_name = '' if created else instance._loaded_image
+    if old_name is None:
+        return
+    new_name = instance.image.name or ''
+    if new_name != old_name:
+        if new_name:
+            acquire_blob(new_name)
+        if old_name:
+            release_blob(old_name, instance.image.storage)
+    instance._loaded_image = new_name
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    if instance.image:
+        release_blob(instance.image.name, instance.image.storage)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, **kwargs):
+    index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_saved_comment(sender, instance, **kwargs):
+    index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_deleted_comment(sender, instance, **kwargs):
+    unindex_comment(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def trend_on_comment(sender, instance, created, **kwargs):
+    if created:
+        record_activity(
+            instance.post_id,
+            settings.TRENDING_COMMENT_WEIGHT,
+            instance.created
+        )
+
+
+@receiver(post_save, sender=Follow)
+def trend_on_follow(sender, instance, created, **kwargs):
+    if created:
+        record_follow(instance.author_id)
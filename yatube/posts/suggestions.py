@@ -0,0 +1,45 @@
+from typing import List
+
+from django.conf import settings
+from django.db import transaction
+
+from .feed_cache import SUGGESTIONS_SCOPE, bump_feed_version
+from .models import FollowSuggestion, User
+
+
+def get_follow_suggestions(
+    user: User,
+    limit: int = settings.FOLLOW_SUGGESTIONS
+) -> List[FollowSuggestion]:
+    """Панель «Кого почитать»: один запрос по индексу (user, -score).
+
+    Авторы, на которых пользователь подписался после пересчета,
+    отсекаются в том же запросе.
+    """
+    if not user.is_authenticated:
+        return []
+    return list(
+        FollowSuggestion.objects.filter(user=user).exclude(
+            author__following__user=user
+        ).select_related('author').order_by('-score')[:limit]
+    )
+
+
+def replace_suggestions(first_user_id: int, last_user_id: int, rows) -> int:
+    """Заменяет рекомендации пользователей из диапазона id одной
+    транзакцией и возвращает число записанных строк.
+    """
+    with transaction.atomic():
+        FollowSuggestion.objects.filter(
+            user_id__gte=first_user_id, user_id__lte=last_user_id
+        ).delete()
+        FollowSuggestion.objects.bulk_create(
+            FollowSuggestion(user_id=user_id, author_id=author_id, score=score)
+            for user_id, author_id, score in rows
+        )
+    return len(rows)
+
+
+def publish_suggestions() -> None:
+    """Сбрасывает валидаторы страниц с панелью после пересчета."""
+    bump_feed_version(SUGGESTIONS_SCOPE)
@@ -0,0 +1,123 @@
+import datetime
+
+from django import template
+from django.db.models import Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import formats
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+from ..models import PostDayCount
+
+register = template.Library()
+
+
+def titled(title: str, count: int) -> str:
+    return f'{title} ({count})'
+
+
+@register.inclusion_tag('admin/date_hierarchy.html')
+def post_date_hierarchy(cl):
+    """Иерархия дат списка постов по таблице PostDayCount.
+
+    Повторяет тег date_hierarchy из django.contrib.admin, но вместо
+    DISTINCT по дате публикации всех постов читает готовые счетчики
+    по дням и показывает их рядом с годами, месяцами и днями. Прочие
+    фильтры списка на счетчики не влияют.
+    """
+    field_name = cl.date_hierarchy
+    year_field = f'{field_name}__year'
+    month_field = f'{field_name}__month'
+    day_field = f'{field_name}__day'
+    year_lookup = cl.params.get(year_field)
+    month_lookup = cl.params.get(month_field)
+    day_lookup = cl.params.get(day_field)
+    days = PostDayCount.objects.filter(count__gt=0).order_by()
+
+    def link(filters):
+        return cl.get_query_string(filters, [f'{field_name}__'])
+
+    if not (year_lookup or month_lookup or day_lookup):
+        first, last = (
+            days.order_by('day').values_list('day', flat=True).first(),
+            days.order_by('-day').values_list('day', flat=True).first(),
+        )
+        if first and last and first.year == last.year:
+            year_lookup = first.year
+            if first.month == last.month:
+                month_lookup = first.month
+
+    if year_lookup and month_lookup and day_lookup:
+        day = datetime.date(
+            int(year_lookup), int(month_lookup), int(day_lookup)
+        )
+        count = days.filter(day=day).values_list('count', flat=True).first()
+        return {
+            'show': True,
+            'back': {
+                'link': link({
+                    year_field: year_lookup, month_field: month_lookup
+                }),
+                'title': capfirst(
+                    formats.date_format(day, 'YEAR_MONTH_FORMAT')
+                ),
+            },
+            'choices': [{
+                'title': titled(
+                    capfirst(formats.date_format(day, 'MONTH_DAY_FORMAT')),
+                    count or 0
+                ),
+            }],
+        }
+    if year_lookup and month_lookup:
+        return {
+            'show': True,
+            'back': {
+                'link': link({year_field: year_lookup}),
+                'title': str(year_lookup),
+            },
+            'choices': [{
+                'link': link({
+                    year_field: year_lookup,
+                    month_field: month_lookup,
+                    day_field: day.day,
+                }),
+                'title': titled(
+                    capfirst(formats.date_format(day, 'MONTH_DAY_FORMAT')),
+                    count
+                ),
+            } for day, count in days.filter(
+                day__year=year_lookup, day__month=month_lookup
+            ).order_by('day').values_list('day', 'count')],
+        }
+    if year_lookup:
+        months = days.filter(day__year=year_lookup).annotate(
+            month=ExtractMonth('day')
+        ).values('month').annotate(total=Sum('count')).order_by('month')
+        return {
+            'show': True,
+            'back': {'link': link({}), 'title': _('All dates')},
+            'choices': [{
+                'link': link({
+                    year_field: year_lookup, month_field: month['month']
+                }),
+                'title': titled(
+                    capfirst(formats.date_format(
+                        datetime.date(int(year_lookup), month['month'], 1),
+                        'YEAR_MONTH_FORMAT'
+                    )),
+                    month['total']
+                ),
+            } for month in months],
+        }
+    years = days.annotate(year=ExtractYear('day')).values('year').annotate(
+        total=Sum('count')
+    ).order_by('year')
+    return {
+        'show': True,
+        'back': None,
+        'choices': [{
+            'link': link({year_field: str(year['year'])}),
+            'title': titled(str(year['year']), year['total']),
+        } for year in years],
+    }
@@ -0,0 +1,11 @@
+from django import template
+
+from ..thumbnails import get_ready_thumbnail
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(image, geometry_string):
+    """Готовое превью картинки или None, пока воркер его не создал."""
+    return get_ready_thumbnail(image, geometry_string)
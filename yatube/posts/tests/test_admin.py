@@ -0,0 +1,74 @@
+from http import HTTPStatus
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Follow, Group, Post, PostDayCount, User
+
+
+class ScalableAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        self.client.force_login(ScalableAdminTest.admin)
+
+    def add_posts(self, number):
+        start = Post.objects.count()
+        for i in range(start, start + number):
+            author = User.objects.create_user(username=f'author{i}')
+            post = Post.objects.create(
+                text=f'Пост номер {i}', author=author, group=self.group
+            )
+            Comment.objects.create(post=post, author=author, text='Ок')
+            Follow.objects.create(user=author, author=self.admin)
+
+    def count_changelist_queries(self, model):
+        url = reverse(f'admin:posts_{model._meta.model_name}_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Число запросов списка не зависит от числа строк."""
+        self.add_posts(2)
+        models = (Post, Comment, Follow, Group)
+        before = {model: self.count_changelist_queries(model)
+                  for model in models}
+        self.add_posts(5)
+        for model in models:
+            with self.subTest(model=model.__name__):
+                self.assertEqual(
+                    self.count_changelist_queries(model), before[model]
+                )
+
+    def test_date_hierarchy_uses_day_counts(self):
+        """Иерархия дат показывает счетчики из PostDayCount."""
+        self.add_posts(3)
+        today = timezone.localdate()
+        self.assertEqual(PostDayCount.objects.get(day=today).count, 3)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertContains(response, '(3)')
+
+    def test_search_uses_full_text_index(self):
+        """Поиск в админке идет по полнотекстовому индексу."""
+        self.add_posts(3)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'номер 1'}
+        )
+        self.assertEqual(
+            [post.text for post in response.context['cl'].result_list],
+            ['Пост номер 1']
+        )
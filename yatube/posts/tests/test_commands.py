@@ -0,0 +1,207 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, Timeline, User
+from ..search import search
+
+
+class BenchFeedsCommandTest(TestCase):
+    def test_bench_feeds_uses_indexes_and_rolls_back(self):
+        """bench_feeds печатает планы запросов, ленты идут по составным
+        индексам, а тестовые данные откатываются.
+        """
+        out = StringIO()
+        call_command(
+            'bench_feeds', users=5, groups=2, posts=50, comments=20,
+            follows=2, repeat=1, stdout=out
+        )
+        output = out.getvalue()
+        for index_name in (
+            'post_feed_idx',
+            'post_group_feed_idx',
+            'post_author_feed_idx',
+            'comment_post_created_idx',
+        ):
+            with self.subTest(index_name=index_name):
+                self.assertIn(index_name, output)
+        self.assertFalse(Post.objects.exists())
+
+
+class ImportCommandTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(content)
+        return path
+
+    def import_file(self, model, name, content, **options):
+        out = StringIO()
+        self.err = StringIO()
+        call_command(
+            'import_yatube', model, self.write(name, content),
+            batch_size=2, transaction_size=3, stdout=out, stderr=self.err,
+            **options
+        )
+        return out.getvalue()
+
+    def test_import_all_models(self):
+        """Импорт групп, постов, подписок и комментариев: даты из файла,
+        пересчитанные счетчики, ленты и поисковый индекс."""
+        reader = User.objects.create_user(username='reader')
+        self.import_file('groups', 'groups.jsonl', '\n'.join(
+            json.dumps({'title': f'Группа {i}', 'slug': f'group-{i}'})
+            for i in range(2)
+        ))
+        self.import_file('follows', 'follows.csv', (
+            'user,author\n'
+            'reader,writer\n'
+            'reader,reader\n'
+        ), create_users=True)
+        output = self.import_file('posts', 'posts.csv', (
+            'id,text,author,group,pub_date\n'
+            '100,Импортированный барсук,writer,group-1,2020-01-02T03:04:05\n'
+            ',Без группы,writer,,\n'
+            ',Чужая группа,writer,missing,\n'
+        ), create_users=True)
+        self.assertIn('Импортировано 2 строк', output)
+        self.assertIn('пропущено 1', output)
+        self.import_file('comments', 'comments.jsonl', '\n'.join(
+            json.dumps(record) for record in (
+                {'post': 100, 'author': 'reader', 'text': 'Ок'},
+                {'post': 999, 'author': 'reader', 'text': 'Нет поста'},
+            )
+        ))
+
+        self.assertEqual(Group.objects.count(), 2)
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.group.slug, 'group-1')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(Comment.objects.get().post, post)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.author.stats.posts_count, 2)
+        self.assertEqual(post.author.stats.followers_count, 1)
+        self.assertEqual(Timeline.objects.filter(user=reader).count(), 2)
+        self.assertEqual(search('барсук')[0][0].post, post)
+
+    def test_bad_records_and_taken_ids_abort_before_import(self):
+        """Неверные записи называются по номерам строк, занятые id постов
+        отклоняются; в обоих случаях ничего не импортируется.
+        """
+        User.objects.create_user(username='writer')
+        with self.assertRaisesMessage(CommandError, 'Ошибок в файле: 2'):
+            self.import_file('comments', 'comments.jsonl', '\n'.join((
+                json.dumps({'post': 'x', 'author': 'writer', 'text': 'Ок'}),
+                '{',
+                json.dumps({'post': 1, 'author': 'writer', 'text': 'Ок'}),
+            )))
+        self.assertIn('Строка 1: post', self.err.getvalue())
+        self.assertIn('Строка 2:', self.err.getvalue())
+
+        taken = Post.objects.create(
+            text='Уже есть', author=User.objects.get(username='writer')
+        )
+        with self.assertRaisesMessage(CommandError, str(taken.pk)):
+            self.import_file('posts', 'posts.csv', (
+                'id,text,author\n'
+                f'{taken.pk + 1},Новый,writer\n'
+                f'{taken.pk},Занятый,writer\n'
+            ))
+        self.assertEqual(Post.objects.count(), 1)
+
+        # Повтор в другой пачке первого прохода (batch_size=2).
+        with self.assertRaisesMessage(CommandError, 'Ошибок в файле: 1'):
+            self.import_file('posts', 'posts.csv', (
+                'id,text,author\n'
+                '500,Первый,writer\n'
+                '501,Второй,writer\n'
+                '500,Повтор,writer\n'
+            ))
+        self.assertIn(
+            'Строка 4: id 500 уже встречался в строке 2', self.err.getvalue()
+        )
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_import_reconciles_only_touched_rows(self):
+        """После импорта пересчитываются счетчики только затронутых
+        пользователей."""
+        bystander = User.objects.create_user(username='bystander')
+        bystander.stats.posts_count = 5
+        bystander.stats.save()
+        self.import_file('posts', 'posts.jsonl', json.dumps(
+            {'text': 'Пост', 'author': 'writer'}
+        ), create_users=True)
+        self.assertEqual(
+            User.objects.get(username='writer').stats.posts_count, 1
+        )
+        bystander.stats.refresh_from_db()
+        self.assertEqual(bystander.stats.posts_count, 5)
+
+
+class SeedCommandTest(TestCase):
+    def seed(self, prefix):
+        call_command(
+            'seed', users=50, groups=3, posts=200, comments=100,
+            avg_follows=3, celebrities=2, celebrity_reach=0.5,
+            prefix=prefix, seed=7, stdout=StringIO()
+        )
+        users = User.objects.filter(username__startswith=f'{prefix}_')
+        posts = Post.objects.filter(author__in=users).order_by('pk')
+        follows = Follow.objects.filter(user__in=users).order_by('pk')
+        return (
+            [(post.author.username.split('_')[1], post.text, post.pub_date)
+             for post in posts.select_related('author')],
+            [(follow.user.username.split('_')[1],
+              follow.author.username.split('_')[1])
+             for follow in follows.select_related('user', 'author')],
+        )
+
+    def test_seed_is_deterministic_and_skewed(self):
+        """Одинаковый seed дает одинаковые данные; у знаменитостей
+        подписчиков больше, чем у остальных."""
+        posts, follows = self.seed('a')
+        self.assertEqual(len(posts), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertEqual((posts, follows), self.seed('b'))
+        followers = list(
+            User.objects.filter(username__startswith='a_').order_by(
+                'pk'
+            ).values_list('stats__followers_count', flat=True)
+        )
+        self.assertGreater(min(followers[:2]), max(followers[2:]))
+        self.assertTrue(Timeline.objects.exists())
+
+    def test_seed_comments_follow_real_post_ids(self):
+        """Комментарии достаются только новым постам, даже если номера
+        pk идут не подряд от MAX(pk) + 1."""
+        author = User.objects.create_user(username='removed')
+        Post.objects.bulk_create(
+            Post(text='Удаленный пост', author=author) for _ in range(50)
+        )
+        Post.objects.filter(author=author).delete()
+        self.seed('c')
+        seeded = Post.objects.filter(author__username__startswith='c_')
+        self.assertEqual(
+            Comment.objects.filter(post__in=seeded).count(), 100
+        )
+
+    def test_seed_rejects_taken_prefix(self):
+        """Повторный запуск с тем же префиксом останавливается до записи,
+        а не падает на пустом списке новых пользователей."""
+        self.seed('d')
+        posts = Post.objects.count()
+        with self.assertRaisesMessage(CommandError, 'Префикс d уже занят'):
+            self.seed('d')
+        self.assertEqual(Post.objects.count(), posts)
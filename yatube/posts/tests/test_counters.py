@@ -0,0 +1,68 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post, User, UserStats
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_views_keep_counters_in_sync(self):
+        """Создание поста, комментарий, подписка и отписка обновляют
+        счетчики без COUNT-запросов на страницах.
+        """
+        self.author_client.post(
+            reverse('posts:post_create'), {'text': 'Пост'}
+        )
+        post = Post.objects.get()
+        self.reader_client.post(
+            reverse('posts:add_comment', args=(post.pk,)), {'text': 'Ок'}
+        )
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        author_stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1
+        )
+
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,))
+        )
+        post.delete()
+        author_stats.refresh_from_db()
+        self.assertEqual(author_stats.posts_count, 0)
+        self.assertEqual(author_stats.followers_count, 0)
+
+    def test_reconcile_counters_fixes_drift(self):
+        """reconcile_counters исправляет разошедшиеся счетчики
+        и создает недостающие строки.
+        """
+        post = Post.objects.create(text='Пост', author=self.author)
+        UserStats.objects.filter(user=self.author).update(posts_count=7)
+        UserStats.objects.filter(user=self.reader).delete()
+        Post.objects.filter(pk=post.pk).update(comments_count=3)
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1
+        )
+        self.assertTrue(UserStats.objects.filter(user=self.reader).exists())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
@@ -0,0 +1,102 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post, User
+
+
+class SyndicationFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Первый пост', author=cls.author, group=cls.group
+        )
+        cls.urls = [
+            reverse('posts:rss'),
+            reverse('posts:atom'),
+            reverse('posts:group_rss', args=(cls.group.slug,)),
+            reverse('posts:group_atom', args=(cls.group.slug,)),
+            reverse('posts:profile_rss', args=(cls.author.username,)),
+            reverse('posts:profile_atom', args=(cls.author.username,)),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_feeds_list_posts_and_answer_not_modified(self):
+        """Ленты отдают посты, повторный опрос с ETag получает 304,
+        новый пост меняет документ.
+        """
+        etags = {}
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertIn('Первый пост', response.content.decode())
+                etags[url] = response['ETag']
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+
+        Post.objects.create(
+            text='Второй пост', author=self.author, group=self.group
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertIn('Второй пост', response.content.decode())
+
+    def test_site_feed_is_served_from_cache(self):
+        """Повторный запрос ленты сайта не обращается к базе."""
+        url = reverse('posts:atom')
+        expected = self.client.get(url).content
+        Post.objects.filter(pk=self.post.pk).update(text='Изменено в базе')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.content, expected)
+
+    def test_unknown_group_feed_is_not_found(self):
+        """Лента несуществующей группы отдает 404."""
+        response = self.client.get(reverse('posts:group_rss', args=('no',)))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_feed_cache_depends_on_host_and_renames(self):
+        """Документ кэшируется отдельно для каждого хоста; переименование
+        группы и автора меняет их ленты.
+        """
+        url = self.urls[2]
+        response = self.client.get(url, HTTP_HOST='localhost')
+        self.assertIn('http://localhost/', response.content.decode())
+        response = self.client.get(url, HTTP_HOST='127.0.0.1')
+        self.assertIn('http://127.0.0.1/', response.content.decode())
+        etag = response['ETag']
+
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('Новое название', response.content.decode())
+
+        url = self.urls[4]
+        etag = self.client.get(url)['ETag']
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Автор'
+        author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('Автор', response.content.decode())
@@ -1,3 +1,4 @@
+import io
 import shutil
 import tempfile
 from http import HTTPStatus
@@ -6,11 +7,16 @@ from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
+
+from core.models import MediaBlob
 
 from ..forms import PostForm
 from ..models import Comment, Group, Post, User
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+EXIF_MAKE = 0x010F
+EXIF_ORIENTATION = 0x0112
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -130,3 +136,98 @@ class PostFormTest(TestCase):
         self.assertEqual(expected_comment.post, response.context['post'])
         self.assertEqual(expected_comment.text, form_data['text'])
         self.assertEqual(expected_comment.author, commentator)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    IMAGE_MAX_SIDE=100,
+    IMAGE_MAX_PIXELS=500 * 500
+)
+class PostImageIngestTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(PostImageIngestTest.user)
+
+    def make_jpeg(self, size, orientation=None):
+        exif = Image.Exif()
+        exif[EXIF_MAKE] = 'Camera'
+        if orientation is not None:
+            exif[EXIF_ORIENTATION] = orientation
+        output = io.BytesIO()
+        Image.new('RGB', size, 'red').save(output, 'JPEG', exif=exif)
+        return SimpleUploadedFile(
+            name='photo.jpeg',
+            content=output.getvalue(),
+            content_type='image/jpeg'
+        )
+
+    def test_image_rotated_resized_and_stripped(self):
+        """Картинка поворачивается по EXIF, уменьшается и теряет
+        метаданные."""
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с фото',
+                'image': self.make_jpeg((400, 200), orientation=6),
+            }
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        post = Post.objects.get(text='Пост с фото')
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (50, 100))
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_too_large_image_rejected(self):
+        """Картинка больше IMAGE_MAX_PIXELS не принимается."""
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Огромное фото',
+                'image': self.make_jpeg((1000, 1000)),
+            }
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.context['form'].has_error('image'))
+        self.assertFalse(Post.objects.filter(text='Огромное фото').exists())
+
+    def test_truncated_image_rejected(self):
+        """Обрезанная картинка дает ошибку формы, а не ошибку сервера."""
+        upload = self.make_jpeg((400, 400))
+        upload.file.truncate(len(upload.file.getvalue()) // 2)
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Обрезанное фото', 'image': upload}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.context['form'].has_error('image'))
+        self.assertFalse(Post.objects.filter(text='Обрезанное фото').exists())
+
+    def test_same_image_shared_between_posts(self):
+        """Одинаковые картинки хранятся одним файлом со счетчиком ссылок."""
+        for text in ('Первый пост', 'Второй пост'):
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': text, 'image': self.make_jpeg((80, 40))}
+            )
+        first, second = Post.objects.filter(
+            text__in=('Первый пост', 'Второй пост')
+        )
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            MediaBlob.objects.get(name=first.image.name).refcount, 2
+        )
+        first.delete()
+        self.assertEqual(
+            MediaBlob.objects.get(name=second.image.name).refcount, 1
+        )
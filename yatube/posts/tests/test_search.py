@@ -0,0 +1,85 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post, User
+from ..search import COMMENT_INDEX, POST_INDEX, search
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(
+            text='Ежи живут в лесу и едят <b>яблоки</b>',
+            author=cls.user,
+        )
+        cls.other_post = Post.objects.create(
+            text='Про котов и собак',
+            author=cls.user,
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.other_post,
+            author=cls.user,
+            text='А ежи лучше котов',
+        )
+
+    def test_search_finds_posts_and_comments(self):
+        """Ищутся и посты, и комментарии, совпадение подсвечено,
+        текст экранирован."""
+        hits, next_cursor = search('ежи')
+        self.assertIsNone(next_cursor)
+        found = {(hit.post.pk, hit.is_comment) for hit in hits}
+        self.assertEqual(
+            found, {(self.post.pk, False), (self.other_post.pk, True)}
+        )
+        post_hit = next(hit for hit in hits if not hit.is_comment)
+        self.assertIn('<mark>Ежи</mark>', post_hit.snippet)
+        self.assertIn('&lt;b&gt;', post_hit.snippet)
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при изменении и удалении."""
+        self.post.text = 'Теперь про ежевику'
+        self.post.save()
+        self.assertFalse(any(
+            hit.post.pk == self.post.pk for hit in search('ежи')[0]
+        ))
+        self.assertEqual(search('ежевику')[0][0].post, self.post)
+        self.comment.delete()
+        self.assertEqual(search('ежи')[0], [])
+
+    def test_cursor_pagination(self):
+        """Страницы по курсору не повторяются и не теряют результаты."""
+        for i in range(5):
+            Post.objects.create(text=f'Барсук номер {i}', author=self.user)
+        seen = []
+        hits, cursor = search('барсук', limit=2)
+        seen.extend(hit.post.pk for hit in hits)
+        while cursor:
+            hits, cursor = search('барсук', cursor, limit=2)
+            seen.extend(hit.post.pk for hit in hits)
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+    def test_query_syntax_is_not_passed_to_fts(self):
+        """Операторы FTS5 во вводе не ломают запрос."""
+        for query in ('"ежи', 'ежи OR', 'NEAR(', '***', ''):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    reverse('posts:search'), {'q': query}
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_rebuild_command_restores_index(self):
+        """rebuild_search_index заново наполняет индекс."""
+        with connection.cursor() as db:
+            db.execute(f'DELETE FROM {POST_INDEX}')
+            db.execute(f'DELETE FROM {COMMENT_INDEX}')
+        self.assertEqual(search('ежи')[0], [])
+        out = StringIO()
+        call_command('rebuild_search_index', batch_size=1, stdout=out)
+        self.assertIn('постов 2, комментариев 1', out.getvalue())
+        self.assertEqual(len(search('ежи')[0]), 2)
@@ -0,0 +1,90 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, FollowSuggestion, Group, Post, User
+
+
+class FollowSuggestionTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader, cls.friend, cls.friend_of_friend, cls.neighbour = (
+            User.objects.create_user(username=name)
+            for name in ('reader', 'friend', 'friend_of_friend', 'neighbour')
+        )
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.friend)
+        Follow.objects.create(user=cls.friend, author=cls.friend_of_friend)
+        Follow.objects.create(user=cls.friend, author=cls.neighbour)
+        for author in (cls.reader, cls.neighbour):
+            Post.objects.create(text='Пост', author=author, group=group)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def build(self, **options):
+        call_command(
+            'build_follow_suggestions', chunk_size=2, stdout=StringIO(),
+            **options
+        )
+
+    def suggestions(self, user):
+        return list(
+            FollowSuggestion.objects.filter(user=user).order_by(
+                '-score', 'author_id'
+            ).values_list('author__username', 'score')
+        )
+
+    def test_scores_friends_of_friends_and_shared_groups(self):
+        """Подписки подписок и общие группы складываются в оценку,
+        себя и уже отслеживаемых авторов не предлагают.
+        """
+        self.build()
+        self.assertEqual(
+            self.suggestions(self.reader),
+            [('neighbour', 1.5), ('friend_of_friend', 1.0)]
+        )
+        self.assertEqual(self.suggestions(self.friend), [])
+        self.assertEqual(
+            self.suggestions(self.neighbour), [('reader', 0.5)]
+        )
+
+    def test_rebuild_replaces_and_respects_limits(self):
+        """Пересчет заменяет старые рекомендации, большие группы
+        не учитываются, на пользователя хранится не больше limit.
+        """
+        self.build()
+        self.build(limit=1, max_group_size=1)
+        self.assertEqual(
+            self.suggestions(self.reader), [('friend_of_friend', 1.0)]
+        )
+        self.assertEqual(self.suggestions(self.neighbour), [])
+
+    def test_panel_shows_suggestions(self):
+        """Панель на follow_index и profile показывает рекомендации,
+        новые подписки из нее пропадают сразу.
+        """
+        self.build()
+        for url in (
+            reverse('posts:follow_index'),
+            reverse('posts:profile', args=(self.friend.username,)),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(
+                    [s.author for s in response.context['suggestions']],
+                    [self.neighbour, self.friend_of_friend]
+                )
+
+        Follow.objects.create(user=self.reader, author=self.neighbour)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [s.author for s in response.context['suggestions']],
+            [self.friend_of_friend]
+        )
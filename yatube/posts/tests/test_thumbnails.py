@@ -0,0 +1,95 @@
+import shutil
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.models import Task
+from core.tasks import run_pending_tasks
+
+from ..models import Post, User
+from .test_forms import TEMP_MEDIA_ROOT
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPregenerationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_thumbnail_is_generated_by_worker(self):
+        """Сохранение картинки ставит задачу, до ее выполнения страницы
+        показывают заглушку, после - готовое превью.
+        """
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            {
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(
+                    'small.gif', SMALL_GIF, content_type='image/gif'
+                ),
+            }
+        )
+        post = Post.objects.get()
+        self.assertEqual(Task.objects.count(), 1)
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:post_detail', args=(post.pk,)),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                content = self.authorized_client.get(url).content.decode()
+                self.assertIn('img/placeholder.svg', content)
+
+        self.assertEqual(run_pending_tasks(), 1)
+        self.assertFalse(Task.objects.exists())
+        for url in urls:
+            with self.subTest(url=url):
+                content = self.authorized_client.get(url).content.decode()
+                self.assertNotIn('img/placeholder.svg', content)
+                self.assertIn('/media/cache/', content)
+
+    def test_post_etag_changes_when_thumbnail_is_ready(self):
+        """Браузер, сохранивший страницу поста с заглушкой, получает
+        новую страницу, когда превью готово.
+        """
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            {
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(
+                    'small.gif', SMALL_GIF, content_type='image/gif'
+                ),
+            }
+        )
+        url = reverse('posts:post_detail', args=(Post.objects.get().pk,))
+        # Форма комментария выдает CSRF-cookie, а он входит в ETag.
+        self.authorized_client.get(url)
+        etag = self.authorized_client.get(url)['ETag']
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(run_pending_tasks(), 1)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('img/placeholder.svg', response.content.decode())
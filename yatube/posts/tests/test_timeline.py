@@ -0,0 +1,105 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ..models import Follow, Post, Timeline, User
+from ..timeline import get_timeline_page
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.old_post = Post.objects.create(
+            text='Пост до подписки',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_follow_backfills_and_new_post_fans_out(self):
+        """Подписка добавляет в ленту старые посты автора, новый пост
+        раскладывается по лентам подписчиков.
+        """
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertTrue(
+            Timeline.objects.filter(
+                user=self.follower, post=self.old_post
+            ).exists()
+        )
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        page_obj = get_timeline_page(self.follower, None)
+        self.assertEqual(list(page_obj), [new_post, self.old_post])
+
+    def test_unfollow_and_delete_remove_entries(self):
+        """Отписка и удаление поста убирают записи из ленты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        post.delete()
+        self.assertEqual(
+            list(get_timeline_page(self.follower, None)), [self.old_post]
+        )
+        Follow.objects.filter(user=self.follower, author=self.author).delete()
+        self.assertFalse(Timeline.objects.filter(user=self.follower).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_posts_are_read_directly(self):
+        """Посты знаменитостей не раскладываются по лентам, но попадают
+        в ленту подписок вперемешку с обычными и листаются курсором.
+        """
+        regular = User.objects.create_user(username='regular')
+        Follow.objects.create(user=self.follower, author=self.author)
+        with override_settings(TIMELINE_FANOUT_LIMIT=1):
+            Follow.objects.create(user=self.follower, author=regular)
+            regular_post = Post.objects.create(text='Обычный', author=regular)
+        celebrity_post = Post.objects.create(
+            text='Знаменитость', author=self.author
+        )
+        self.assertFalse(
+            Timeline.objects.filter(post=celebrity_post).exists()
+        )
+        first_page = get_timeline_page(self.follower, None, 2)
+        self.assertEqual(list(first_page), [celebrity_post, regular_post])
+        second_page = get_timeline_page(
+            self.follower, first_page.paginator.next_cursor, 2
+        )
+        self.assertEqual(list(second_page), [self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_crosses_fanout_limit_both_ways(self):
+        """Автор, ставший знаменитостью, читается напрямую; переставший -
+        снова в Timeline, включая посты, написанные в статусе знаменитости.
+        """
+        second = User.objects.create_user(username='second')
+        Follow.objects.create(user=self.follower, author=self.author)
+        get_timeline_page(self.follower, None)
+        Follow.objects.create(user=second, author=self.author)
+        celebrity_post = Post.objects.create(
+            text='Знаменитость', author=self.author
+        )
+        self.assertFalse(
+            Timeline.objects.filter(post=celebrity_post).exists()
+        )
+        self.assertEqual(
+            list(get_timeline_page(self.follower, None)),
+            [celebrity_post, self.old_post]
+        )
+
+        Follow.objects.filter(user=second, author=self.author).delete()
+        self.assertTrue(
+            Timeline.objects.filter(
+                user=self.follower, post=celebrity_post
+            ).exists()
+        )
+        regular_post = Post.objects.create(text='Обычный', author=self.author)
+        self.assertTrue(
+            Timeline.objects.filter(
+                user=self.follower, post=regular_post
+            ).exists()
+        )
+        self.assertEqual(
+            list(get_timeline_page(self.follower, None)),
+            [regular_post, celebrity_post, self.old_post]
+        )
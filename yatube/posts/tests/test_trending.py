@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Follow, Post, TrendingScore, User
+from ..trending import record_activity, renormalize
+
+
+class TrendingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.quiet, cls.discussed, cls.latest = (
+            Post.objects.create(text=text, author=cls.author)
+            for text in ('Тихий', 'Обсуждаемый', 'Последний')
+        )
+
+    def score(self, post):
+        return TrendingScore.objects.get(post=post).score
+
+    def test_comments_and_follows_rank_posts(self):
+        """Комментарии и подписки на автора поднимают посты на странице
+        популярного.
+        """
+        for _ in range(3):
+            Comment.objects.create(
+                post=self.discussed, author=self.reader, text='Ого'
+            )
+        Comment.objects.create(post=self.quiet, author=self.reader, text='Ок')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+        response = Client().get(reverse('posts:trending'))
+        self.assertEqual(
+            response.context['posts'],
+            [self.discussed, self.latest, self.quiet]
+        )
+
+    def test_older_activity_weighs_less(self):
+        """Событие на период полураспада старше весит вдвое меньше."""
+        now = timezone.now()
+        half_life = timedelta(seconds=settings.TRENDING_HALF_LIFE)
+        record_activity(self.quiet.pk, 1.0, now)
+        record_activity(self.discussed.pk, 1.0, now - half_life)
+        self.assertAlmostEqual(
+            self.score(self.discussed) / self.score(self.quiet), 0.5
+        )
+
+    def test_renormalize_keeps_order_and_drops_faded(self):
+        """Перенос к новой точке отсчета сохраняет порядок, оценка
+        становится затухшим весом, затухшие строки удаляются.
+        """
+        now = timezone.now()
+        half_life = timedelta(seconds=settings.TRENDING_HALF_LIFE)
+        record_activity(self.quiet.pk, 1.0, now)
+        record_activity(self.discussed.pk, 2.0, now)
+        record_activity(self.latest.pk, settings.TRENDING_MIN_SCORE, now)
+
+        moved, dropped = renormalize(now + half_life)
+        self.assertEqual((moved, dropped), (3, 1))
+        self.assertAlmostEqual(self.score(self.quiet), 0.5)
+        self.assertAlmostEqual(self.score(self.discussed), 1.0)
+
+        record_activity(self.quiet.pk, 1.0, now + half_life)
+        self.assertAlmostEqual(self.score(self.quiet), 1.5)
+
+    def test_far_epoch_renormalizes_instead_of_overflowing(self):
+        """Событие далеко от точки отсчета сначала переносит оценки
+        к текущему моменту, а не дает бесконечную оценку.
+        """
+        now = timezone.now()
+        record_activity(self.quiet.pk, 1.0, now)
+        record_activity(self.discussed.pk, 2.0, now)
+        later = now + timedelta(seconds=settings.TRENDING_HALF_LIFE * 2000)
+        record_activity(self.latest.pk, 1.0, later)
+        self.assertEqual(
+            list(TrendingScore.objects.values_list('post', 'epoch')),
+            [(self.latest.pk, later)]
+        )
+        self.assertAlmostEqual(self.score(self.latest), 1.0)
@@ -27,6 +27,7 @@ class PostsUrlTest(TestCase):
         )
         cls.url_posts = (f'/posts/{cls.post.id}/', 'posts/post_detail.html',)
         cls.url_group = (f'/group/{cls.group.slug}/', 'posts/group_list.html',)
+        cls.url_search = ('/search/?q=текст', 'posts/search.html',)
         cls.url_create = ('/create/', 'posts/post_create.html',)
         cls.url_edit = (
             f'/posts/{cls.post.id}/edit/',
@@ -50,6 +51,7 @@ class PostsUrlTest(TestCase):
             PostsUrlTest.url_profile,
             PostsUrlTest.url_posts,
             PostsUrlTest.url_group,
+            PostsUrlTest.url_search,
         ]
         for url, _ in urls_names:
             with self.subTest(url=url):
@@ -1,7 +1,8 @@
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 from ..models import Group, Post, User
+from ..utils import get_legacy_page_cursor, get_page_obj
 
 
 class PaginatorViewsTest(TestCase):
@@ -61,7 +62,8 @@ class PaginatorViewsTest(TestCase):
         for reverse_name, params in self.url_names.items():
             with self.subTest(reverse_name=reverse_name):
                 response = self.authorized_client.get(
-                    reverse(reverse_name, kwargs=params), {'page': '2'}
+                    reverse(reverse_name, kwargs=params), {'page': '2'},
+                    follow=True
                 )
                 num_posts = len(response.context['page_obj'])
                 expected_post_text = Post.objects.get(id=1).text
@@ -71,3 +73,61 @@ class PaginatorViewsTest(TestCase):
                 self.assertTrue(post_text, 'Пост не передан на страницу')
                 self.assertIsNotNone(post_text, 'Пост не передан на страницу')
                 self.assertEqual(post_text, expected_post_text)
+
+    def test_legacy_page_redirects_to_cursor(self):
+        """Старая ссылка ?page=N перенаправляет на курсорную страницу,
+        первая страница и страница за концом ленты - на адрес без параметров.
+        """
+        url = reverse('posts:index')
+        cursor = get_legacy_page_cursor('2', Post.objects.all())
+        expected_redirects = {
+            '2': f'{url}?cursor={cursor}',
+            '1': url,
+            '100': url,
+            'abc': url,
+        }
+        for page, expected_url in expected_redirects.items():
+            with self.subTest(page=page):
+                response = self.guest_client.get(url, {'page': page})
+                self.assertRedirects(response, expected_url)
+
+    @override_settings(MAX_PAGE_NUMBER=2)
+    def test_legacy_page_number_is_capped(self):
+        """Слишком глубокий номер страницы ограничивается MAX_PAGE_NUMBER."""
+        post_list = Post.objects.all()
+        self.assertEqual(
+            get_legacy_page_cursor('1000', post_list),
+            get_legacy_page_cursor('2', post_list)
+        )
+
+    def test_cursor_navigation_forward_and_back(self):
+        """Курсоры next/previous проходят ленту в обе стороны без пропусков
+        и без COUNT-запроса.
+        """
+        post_list = Post.objects.all()
+        with self.assertNumQueries(1):
+            first_page = get_page_obj(None, post_list)
+            self.assertTrue(first_page.has_next())
+            self.assertFalse(first_page.has_previous())
+        second_page = get_page_obj(
+            first_page.paginator.next_cursor, post_list
+        )
+        self.assertEqual(
+            [post.id for post in second_page], [3, 2, 1]
+        )
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+        back_page = get_page_obj(
+            second_page.paginator.previous_cursor, post_list
+        )
+        self.assertEqual(list(back_page), list(first_page))
+        self.assertFalse(back_page.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор отдает первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': 'broken'}
+        )
+        self.assertEqual(
+            response.context['page_obj'][0], Post.objects.get(id=13)
+        )
@@ -1,13 +1,16 @@
 import shutil
+from datetime import timedelta
 from http import HTTPStatus
 
 from django import forms
+from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, transaction
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Comment, Follow, Group, Post, User
+from ..models import Comment, Follow, Group, Post, User, UserStats
 from .test_forms import TEMP_MEDIA_ROOT
 
 
@@ -293,19 +296,206 @@ class PostsPagesTest(TestCase):
         self.assertEqual(received_author_comment, new_comment.author)
         self.assertEqual(received_id_comment, new_comment.id)
 
+    def test_post_detail_query_budget(self):
+        """post_detail укладывается в два запроса при любом числе
+        комментариев, остальные комментарии догружаются по курсору.
+        """
+        authors = [
+            User.objects.create_user(username=f'commentator_{i}')
+            for i in range(settings.NUM_COMMENTS + 2)
+        ]
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=author, text=f'Комментарий {i}')
+            for i, author in enumerate(authors)
+        )
+        url = reverse(self.post_detail_url[0], args=self.post_detail_url[1])
+        with self.assertNumQueries(2):
+            response = self.guest_client.get(url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), settings.NUM_COMMENTS)
+        self.assertTrue(comments.has_next())
+
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(
+                reverse('posts:post_comments', args=(self.post.id,)),
+                {'cursor': comments.paginator.next_cursor}
+            )
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Комментарий 1', 'Комментарий 0']
+        )
+
+    def test_pages_stay_within_query_budget(self):
+        """Страницы укладываются в бюджеты запросов своих представлений."""
+        for i in range(settings.NUM_POSTS + 2):
+            post = Post.objects.create(
+                text=f'Пост {i}', author=self.user, group=self.group
+            )
+            Comment.objects.create(post=post, author=self.user, text='Ок')
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:post_detail', args=(post.pk,)),
+            reverse('posts:post_edit', args=(post.pk,)),
+            reverse('posts:follow_index'),
+            reverse('posts:search') + '?q=Пост',
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                trace = response.wsgi_request.query_trace
+                self.assertIsNotNone(trace['budget'])
+                self.assertFalse(trace['over_budget'], trace)
+
     def test_cache_index_page(self):
-        """Страница index кэшируется."""
+        """Фрагмент index кэшируется и сбрасывается при удалении поста."""
         cache.clear()
         response = self.authorized_client.get(reverse('posts:index'))
         cache_expected = response.content
-        post = Post.objects.get(pk=1)
-        post.delete()
+        # update() не шлет сигналов: фрагмент остается в кэше.
+        Post.objects.filter(pk=self.post.pk).update(text='Изменено в базе')
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(response.content, cache_expected)
-        cache.clear()
+        post = Post.objects.get(pk=1)
+        post.delete()
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(response.content, cache_expected)
 
+    def test_feed_cache_varies_by_page_and_invalidates(self):
+        """Кэш лент различает страницы, новый пост сразу виден
+        на index, group_list и profile.
+        """
+        cache.clear()
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=self.user, group=self.group)
+            for i in range(settings.NUM_POSTS)
+        )
+        first_page = self.guest_client.get(reverse('posts:index'))
+        second_page = self.guest_client.get(
+            reverse('posts:index'),
+            {'cursor': first_page.context['page_obj'].paginator.next_cursor}
+        )
+        self.assertIn(self.post.text, second_page.content.decode())
+        self.assertNotIn(self.post.text, first_page.content.decode())
+
+        urls = [
+            reverse('posts:index'),
+            reverse(self.group_list_url[0], args=self.group_list_url[1]),
+            reverse(self.profile_url[0], args=self.profile_url[1]),
+        ]
+        for url in urls:
+            self.guest_client.get(url)
+        Post.objects.create(
+            text='Свежий пост', author=self.user, group=self.group
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn('Свежий пост', response.content.decode())
+
+    def test_conditional_get_skips_unchanged_pages(self):
+        """Повторный запрос с ETag получает 304 без основного запроса
+        страницы, после изменений - новую страницу.
+        """
+        urls = [
+            reverse('posts:index'),
+            reverse(self.group_list_url[0], args=self.group_list_url[1]),
+            reverse(self.profile_url[0], args=self.profile_url[1]),
+            reverse(self.post_detail_url[0], args=self.post_detail_url[1]),
+            reverse('posts:follow_index'),
+        ]
+        etags = {}
+        # Форма комментария выдает CSRF-cookie, а он входит в ETag.
+        self.authorized_follower.get(urls[3])
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_follower.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertIn('no-cache', response['Cache-Control'])
+                etags[url] = response['ETag']
+                response = self.authorized_follower.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                self.assertLessEqual(
+                    response.wsgi_request.query_trace['queries'], 4
+                )
+
+        Follow.objects.create(user=self.follower, author=self.user)
+        Comment.objects.create(
+            post=self.post, author=self.follower, text='Новый комментарий'
+        )
+        Post.objects.create(
+            text='Свежий пост', author=self.user, group=self.group
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_follower.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_list_pages_notice_edits_and_deletes(self):
+        """Ленты не отдают Last-Modified по дате нового поста: правка
+        и удаление меняют ETag, хотя новых постов нет.
+        """
+        urls = [
+            reverse('posts:index'),
+            reverse(self.group_list_url[0], args=self.group_list_url[1]),
+            reverse(self.profile_url[0], args=self.profile_url[1]),
+        ]
+        post = Post.objects.get(pk=self.post.pk)
+        etags = {}
+        for url in urls:
+            response = self.guest_client.get(url)
+            self.assertNotIn('Last-Modified', response)
+            etags[url] = response['ETag']
+        post.text = 'Исправленный текст'
+        post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                etags[url] = response['ETag']
+        post.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_conditional_get_depends_on_viewer_and_edits(self):
+        """ETag поста различает пользователей и меняется при правке
+        поста и переименовании автора; Last-Modified страница не отдает.
+        """
+        url = reverse(self.post_detail_url[0], args=self.post_detail_url[1])
+        response = self.guest_client.get(url)
+        etag = response['ETag']
+        self.assertNotIn('Last-Modified', response)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+        Post.objects.filter(pk=self.post.pk).update(
+            updated=self.post.updated + timedelta(minutes=1)
+        )
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        etag = response['ETag']
+
+        author = User.objects.get(pk=self.post.author_id)
+        author.first_name = 'Переименованный'
+        author.save(update_fields=['first_name'])
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
     def test_authorized_client_can_follow(self):
         """Авторизованный пользователь может подписываться
         на других пользователей.
@@ -346,6 +536,62 @@ class PostsPagesTest(TestCase):
             author=self.user,
         ).count()
         self.assertEqual(expected_num_follow, initial_num_follow - 1)
+        response = self.authorized_follower.get(
+            reverse(self.profile_unfollow_url[0], args=('missing',))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_follow_is_single_insert_guarded_by_database(self):
+        """Повторная подписка и подписка на себя ничего не меняют,
+        подписку на себя запрещает база, неизвестный автор - 404.
+        """
+        url = reverse(
+            self.profile_follow_url[0], args=self.profile_follow_url[1]
+        )
+        self.authorized_follower.get(url)
+        self.authorized_follower.get(url)
+        self.authorized_client.get(url)
+        self.assertEqual(
+            list(Follow.objects.values_list('user', 'author')),
+            [(self.follower.pk, self.user.pk)]
+        )
+        response = self.authorized_follower.get(
+            reverse(self.profile_follow_url[0], args=('missing',))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.user, author=self.user)
+
+    def test_follow_batch_changes_many_follows(self):
+        """follow_batch подписывает и отписывает несколько авторов
+        одним запросом и ограничивает их число.
+        """
+        first, second = (
+            User.objects.create_user(username=name)
+            for name in ('first', 'second')
+        )
+        Follow.objects.create(user=self.follower, author=self.user)
+        url = reverse('posts:follow_batch')
+        response = self.authorized_follower.post(url, {
+            'follow': [first.username, second.username,
+                       self.follower.username, 'missing'],
+            'unfollow': [self.user.username],
+        })
+        self.assertRedirects(response, reverse(self.follow_url[0]))
+        self.assertEqual(
+            set(self.follower.follower.values_list('author', flat=True)),
+            {first.pk, second.pk}
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.follower).following_count, 2
+        )
+
+        with self.settings(FOLLOW_BATCH_MAX=1):
+            response = self.authorized_follower.post(
+                url, {'unfollow': [first.username, second.username]}
+            )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(self.follower.follower.count(), 2)
 
     def test_follow_index_new_post_is_correct_visible(self):
         """Новая запись пользователя появляется в ленте тех, кто на него подписан
@@ -0,0 +1,70 @@
+from typing import Optional
+
+from django.conf import settings
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from core.tasks import task
+
+from .feed_cache import (INDEX_SCOPE, author_scope, bump_feed_version,
+                         group_scope, post_scope)
+from .models import Post
+
+
+class ReadyThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, который только ищет готовое превью и никогда
+    не открывает исходную картинку.
+    """
+
+    def get_ready_thumbnail(
+        self,
+        file_,
+        geometry_string: str,
+        **options
+    ) -> Optional[ImageFile]:
+        source = ImageFile(file_)
+        # Опции дополняются так же, как в ThumbnailBackend.get_thumbnail,
+        # иначе имя превью не совпадет с созданным воркером.
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+ready_backend = ReadyThumbnailBackend()
+
+
+def get_ready_thumbnail(file_, geometry_string: str) -> Optional[ImageFile]:
+    if not file_:
+        return None
+    options = settings.THUMBNAIL_GEOMETRIES.get(geometry_string, {})
+    return ready_backend.get_ready_thumbnail(
+        file_, geometry_string, **options
+    )
+
+
+@task
+def generate_post_thumbnails(post_id: int) -> None:
+    """Готовит превью всех размеров из THUMBNAIL_GEOMETRIES."""
+    post = Post.objects.filter(pk=post_id).only(
+        'image', 'author', 'group'
+    ).first()
+    if post is None or not post.image:
+        return
+    for geometry_string, options in settings.THUMBNAIL_GEOMETRIES.items():
+        get_thumbnail(post.image, geometry_string, **options)
+    # Во фрагментном кэше лент и в копии страницы поста у браузера
+    # лежит заглушка вместо картинки.
+    scopes = [INDEX_SCOPE, author_scope(post.author_id), post_scope(post.pk)]
+    if post.group_id:
+        scopes.append(group_scope(post.group_id))
+    bump_feed_version(*scopes)
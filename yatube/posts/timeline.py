@@ -0,0 +1,215 @@
+from typing import List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.db import connection
+
+from .models import Follow, Post, Timeline, User, UserStats
+from .utils import PREVIOUS, CursorPaginator, keyset_slice
+
+CELEBRITIES_CACHE_KEY = 'timeline:celebrities'
+
+
+def is_celebrity(author_id: int) -> bool:
+    """Проверяет, что подписчиков у автора больше лимита fan-out.
+
+    Запись в ленты и чтение ленты опираются на один и тот же список
+    get_celebrity_ids, иначе после смены статуса автора посты терялись
+    бы между Timeline и прямым чтением.
+    """
+    return author_id in get_celebrity_ids()
+
+
+def get_celebrity_ids() -> Set[int]:
+    """Авторы, чьи посты не раскладываются по лентам подписчиков.
+
+    Список сбрасывается, когда автор пересекает лимит
+    (followers_changed), и при смене самого лимита.
+    """
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    cached = cache.get(CELEBRITIES_CACHE_KEY)
+    if cached is not None and cached[0] == limit:
+        return cached[1]
+    celebrity_ids = set(
+        UserStats.objects.filter(
+            followers_count__gt=limit
+        ).values_list('user_id', flat=True)
+    )
+    cache.set(
+        CELEBRITIES_CACHE_KEY,
+        (limit, celebrity_ids),
+        settings.TIMELINE_CELEBRITIES_TIMEOUT
+    )
+    return celebrity_ids
+
+
+def followers_changed(author_id: int, delta: int) -> None:
+    """Вызывается после изменения followers_count автора на delta.
+
+    Если автор пересек лимит fan-out, список знаменитостей сбрасывается.
+    Автор, переставший быть знаменитостью, снова пишет в Timeline, и
+    его посты раскладываются по лентам всех подписчиков - пока он был
+    знаменитостью, туда ничего не попадало.
+    """
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    crossed = limit if delta < 0 else limit + 1
+    if not UserStats.objects.filter(
+        user_id=author_id, followers_count=crossed
+    ).exists():
+        return
+    cache.delete(CELEBRITIES_CACHE_KEY)
+    if delta < 0:
+        backfill_followers(author_id)
+
+
+def fan_out_post(post: Post) -> None:
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    follower_ids = list(
+        Follow.objects.filter(
+            author_id=post.author_id
+        ).values_list('user_id', flat=True)
+    )
+    Timeline.objects.bulk_create(
+        (
+            Timeline(
+                user_id=user_id,
+                post=post,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in follower_ids
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_timeline(user_id: int, author_id: int) -> None:
+    """Добавляет в ленту подписчика уже опубликованные посты автора.
+
+    Посты читаются пачками по первичному ключу, чтобы подписка на
+    плодовитого автора не поднимала в память все его посты сразу.
+    """
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(
+            posts.filter(pk__gt=last_pk).values_list(
+                'pk', 'pub_date'
+            )[:settings.TIMELINE_BATCH_SIZE]
+        )
+        if not batch:
+            break
+        Timeline.objects.bulk_create(
+            (
+                Timeline(
+                    user_id=user_id,
+                    post_id=post_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                )
+                for post_id, pub_date in batch
+            ),
+            ignore_conflicts=True,
+        )
+        last_pk = batch[-1][0]
+
+
+def backfill_followers(author_id: int) -> None:
+    """Раскладывает все посты автора по лентам всех его подписчиков."""
+    with connection.cursor() as db:
+        db.execute(
+            f'INSERT OR IGNORE INTO {Timeline._meta.db_table} '
+            f'(user_id, post_id, author_id, pub_date) '
+            f'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+            f'FROM {Post._meta.db_table} p '
+            f'JOIN {Follow._meta.db_table} f ON f.author_id = p.author_id '
+            f'WHERE p.author_id = %s',
+            [author_id]
+        )
+
+
+def fill_timelines(post_after: int, follow_after: int) -> None:
+    """Раскладывает по лентам посты и подписки, добавленные в обход
+    сигналов (bulk_create): новые посты - всем подписчикам, новые
+    подписки - всеми постами автора. Знаменитости пропускаются.
+    """
+    timeline = Timeline._meta.db_table
+    insert = (
+        f'INSERT OR IGNORE INTO {timeline} '
+        f'(user_id, post_id, author_id, pub_date) '
+        f'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+        f'FROM {Post._meta.db_table} p '
+        f'JOIN {Follow._meta.db_table} f ON f.author_id = p.author_id '
+        f'WHERE {{}} > %s AND p.author_id NOT IN ('
+        f'SELECT user_id FROM {UserStats._meta.db_table} '
+        f'WHERE followers_count > %s)'
+    )
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    with connection.cursor() as db:
+        db.execute(insert.format('p.id'), [post_after, limit])
+        db.execute(insert.format('f.id'), [follow_after, limit])
+    cache.delete(CELEBRITIES_CACHE_KEY)
+
+
+def remove_from_timeline(user_id: int, author_id: int) -> None:
+    Timeline.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорная пагинация ленты подписок.
+
+    Посты обычных авторов берутся из Timeline, посты знаменитостей -
+    напрямую из Post; оба источника сливаются по (pub_date, id).
+    """
+
+    def __init__(self, user: User, per_page: int) -> None:
+        self.user = user
+        super().__init__(
+            Post.objects.select_related('group', 'author'),
+            per_page
+        )
+
+    def fetch(self, position: Optional[Tuple], limit: int) -> List:
+        entries = keyset_slice(
+            Timeline.objects.filter(user=self.user).select_related(
+                'post__group', 'post__author'
+            ),
+            position,
+            limit,
+            tiebreaker='post_id'
+        )
+        posts = {entry.post.pk: entry.post for entry in entries}
+
+        celebrity_ids = get_celebrity_ids()
+        if celebrity_ids:
+            followed_celebrities = self.user.follower.filter(
+                author_id__in=celebrity_ids
+            ).values_list('author_id', flat=True)
+            direct_posts = keyset_slice(
+                self.object_list.filter(author_id__in=followed_celebrities),
+                position,
+                limit
+            )
+            posts.update((post.pk, post) for post in direct_posts)
+
+        direction = position[0] if position else None
+        return sorted(
+            posts.values(),
+            key=lambda post: (post.pub_date, post.pk),
+            reverse=direction != PREVIOUS
+        )[:limit]
+
+
+def get_timeline_page(
+    user: User,
+    cursor: Optional[str],
+    num_posts: int = settings.NUM_POSTS
+) -> Page:
+    paginator = TimelinePaginator(user, num_posts)
+    return paginator.get_page(cursor)
@@ -0,0 +1,118 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .models import Post, TrendingScore
+
+MAX_ATTEMPTS = 3
+# Прибавки растут как 2 ** (полураспадов от точки отсчета); дальше
+# этого числа полураспадов оценки переносятся к текущему моменту сами,
+# не дожидаясь renormalize_trending, - далеко до переполнения float.
+MAX_HALF_LIVES = 64
+
+
+def half_lives(moment: datetime, epoch: datetime) -> float:
+    return (moment - epoch).total_seconds() / settings.TRENDING_HALF_LIFE
+
+
+def decay_factor(moment: datetime, epoch: datetime) -> float:
+    """Вес события в момент moment относительно точки отсчета epoch."""
+    return 2 ** half_lives(moment, epoch)
+
+
+def current_epoch(now: datetime) -> datetime:
+    """Точка отсчета таблицы; пока таблица пуста - текущий момент."""
+    epoch = TrendingScore.objects.aggregate(epoch=Max('epoch'))['epoch']
+    return epoch or now
+
+
+def record_activity(
+    post_id: int,
+    weight: float,
+    now: Optional[datetime] = None
+) -> None:
+    """Добавляет посту событие одним условным UPDATE его строки.
+
+    Чтение точки отсчета и запись идут в одной транзакции, которая
+    сразу берет блокировку записи (transaction_mode IMMEDIATE): перенос
+    оценок renormalize не может вклиниться между ними, и у всех строк
+    остается одна точка отсчета.
+    """
+    now = now or timezone.now()
+    scores = TrendingScore.objects.filter(post_id=post_id)
+    with transaction.atomic():
+        for _ in range(MAX_ATTEMPTS):
+            epoch = scores.values_list('epoch', flat=True).first()
+            exists = epoch is not None
+            if not exists:
+                epoch = current_epoch(now)
+            if half_lives(now, epoch) > MAX_HALF_LIVES:
+                renormalize(now)
+                continue
+            if exists:
+                if scores.filter(epoch=epoch).update(
+                    score=F('score') + weight * decay_factor(now, epoch)
+                ):
+                    return
+                continue
+            try:
+                with transaction.atomic():
+                    TrendingScore.objects.create(
+                        post_id=post_id,
+                        epoch=epoch,
+                        score=weight * decay_factor(now, epoch)
+                    )
+                return
+            except IntegrityError:
+                continue
+
+
+def renormalize(now: Optional[datetime] = None) -> Tuple[int, int]:
+    """Переносит все оценки к точке отсчета now и удаляет затухшие.
+
+    После переноса оценка равна затухшему к now весу событий, поэтому
+    значения не растут неограниченно. Возвращает число перенесенных
+    и удаленных строк.
+    """
+    now = now or timezone.now()
+    moved = 0
+    with transaction.atomic():
+        epochs = list(
+            TrendingScore.objects.order_by().values_list(
+                'epoch', flat=True
+            ).distinct()
+        )
+        for epoch in epochs:
+            # Умножение на обратный множитель: давно не переносившиеся
+            # оценки уходят в ноль, а не переполняют делитель.
+            moved += TrendingScore.objects.filter(epoch=epoch).update(
+                score=F('score') * decay_factor(epoch, now),
+                epoch=now
+            )
+        dropped, _ = TrendingScore.objects.filter(
+            score__lt=settings.TRENDING_MIN_SCORE
+        ).delete()
+    return moved, dropped
+
+
+def record_follow(author_id: int, now: Optional[datetime] = None) -> None:
+    """Новый подписчик автора поднимает его последний пост."""
+    post_id = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date'
+    ).values_list('pk', flat=True).first()
+    if post_id is not None:
+        record_activity(post_id, settings.TRENDING_FOLLOW_WEIGHT, now)
+
+
+def get_trending_posts(
+    limit: int = settings.TRENDING_POSTS
+) -> List[Post]:
+    """Самые популярные посты: top-N по индексу score."""
+    scores = TrendingScore.objects.select_related(
+        'post__author', 'post__group'
+    ).order_by('-score')[:limit]
+    return [score.post for score in scores]
@@ -1,15 +1,193 @@
+from typing import List, Optional, Tuple
+
 from django.conf import settings
-from django.core.paginator import Paginator
-from django.db.models import QuerySet
+from django.core.paginator import Page, Paginator
+from django.db.models import Q, QuerySet
+from django.http import HttpRequest, HttpResponseRedirect
+from django.shortcuts import redirect
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import Comment, Post
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction: str, key_value, pk: int) -> str:
+    """Упаковывает позицию в ленте в непрозрачный токен для URL."""
+    raw = f'{direction}|{key_value.isoformat()}|{pk}'
+    return urlsafe_base64_encode(force_bytes(raw))
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Tuple]:
+    """Распаковывает токен; для битого токена возвращает None."""
+    if not token:
+        return None
+    try:
+        direction, key_value, pk = force_str(
+            urlsafe_base64_decode(token)
+        ).split('|')
+        key_value = parse_datetime(key_value)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or key_value is None:
+        return None
+    return direction, key_value, pk
+
+
+def keyset_slice(
+    queryset: QuerySet,
+    position: Optional[Tuple],
+    limit: int,
+    key: str = 'pub_date',
+    tiebreaker: str = 'pk'
+) -> QuerySet:
+    """Срез ленты после позиции курсора по индексу (key, tiebreaker).
+
+    Для направления «назад» строки идут в обратном порядке.
+    """
+    order = (f'-{key}', f'-{tiebreaker}')
+    if position is None:
+        return queryset.order_by(*order)[:limit]
+    direction, key_value, pk = position
+    if direction == NEXT:
+        queryset = queryset.filter(
+            Q(**{f'{key}__lt': key_value})
+            | Q(**{key: key_value, f'{tiebreaker}__lt': pk})
+        ).order_by(*order)
+    else:
+        queryset = queryset.filter(
+            Q(**{f'{key}__gt': key_value})
+            | Q(**{key: key_value, f'{tiebreaker}__gt': pk})
+        ).order_by(key, tiebreaker)
+    return queryset[:limit]
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по паре (key, id) без COUNT(*) и OFFSET.
+
+    Каждая страница выбирается одним запросом по диапазону индекса.
+    Экземпляр обслуживает одну страницу: после get_page() в нем лежат
+    токены соседних страниц.
+    """
 
-from .models import Post
+    def __init__(
+        self,
+        object_list: QuerySet,
+        per_page: int,
+        key: str = 'pub_date'
+    ) -> None:
+        self.key = key
+        self._number = 1
+        self.next_cursor: Optional[str] = None
+        self.previous_cursor: Optional[str] = None
+        super().__init__(
+            object_list.order_by(f'-{key}', '-pk'),
+            per_page
+        )
+
+    @property
+    def num_pages(self) -> int:
+        # Общее число страниц неизвестно: Page сравнивает номер текущей
+        # страницы с num_pages, поэтому хватает «текущая + есть ли дальше».
+        return self._number + int(self.next_cursor is not None)
+
+    def fetch(self, position: Optional[Tuple], limit: int) -> List:
+        return list(
+            keyset_slice(self.object_list, position, limit, self.key)
+        )
+
+    def get_page(self, cursor: Optional[str]) -> Page:
+        position = decode_cursor(cursor)
+        direction = position[0] if position else None
+        key = self.key
+
+        objects = self.fetch(position, self.per_page + 1)
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if direction == PREVIOUS:
+            objects.reverse()
+        has_next = has_more if direction != PREVIOUS else True
+        has_previous = has_more if direction == PREVIOUS else (
+            direction is not None
+        )
+
+        if objects and has_next:
+            last = objects[-1]
+            self.next_cursor = encode_cursor(
+                NEXT, getattr(last, key), last.pk
+            )
+        if objects and has_previous:
+            first = objects[0]
+            self.previous_cursor = encode_cursor(
+                PREVIOUS, getattr(first, key), first.pk
+            )
+        self._number = 2 if self.previous_cursor else 1
+        return Page(objects, self._number, self)
 
 
 def get_page_obj(
-    page_number: int,
+    cursor: Optional[str],
     post_list: QuerySet,
     num_posts: int = settings.NUM_POSTS
 ) -> Post:
-    paginator: Paginator = Paginator(post_list, num_posts)
-    page_obj: Post = paginator.get_page(page_number)
+    paginator: CursorPaginator = CursorPaginator(post_list, num_posts)
+    page_obj: Post = paginator.get_page(cursor)
     return page_obj
+
+
+def get_comments_page(
+    post_id: int,
+    cursor: Optional[str],
+    num_comments: int = settings.NUM_COMMENTS
+) -> Page:
+    """Страница комментариев поста вместе с авторами одним запросом."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    )
+    paginator = CursorPaginator(comments, num_comments, key='created')
+    return paginator.get_page(cursor)
+
+
+def get_legacy_page_cursor(
+    page_number: Optional[str],
+    post_list: QuerySet,
+    num_posts: int = settings.NUM_POSTS,
+    key: str = 'pub_date'
+) -> Optional[str]:
+    """Переводит старый ?page=N в курсор следующей страницы.
+
+    Номер страницы ограничен MAX_PAGE_NUMBER, чтобы глубокий OFFSET
+    не превращался в полный проход по таблице. Для первой страницы,
+    мусора в параметре и номера за концом ленты возвращает None.
+    """
+    try:
+        page_number = int(page_number)
+    except (TypeError, ValueError):
+        return None
+    page_number = min(page_number, settings.MAX_PAGE_NUMBER)
+    if page_number <= 1:
+        return None
+    offset = (page_number - 1) * num_posts
+    boundary = list(post_list.order_by(f'-{key}', '-pk').values_list(
+        key, 'pk'
+    )[offset - 1:offset])
+    if not boundary:
+        return None
+    return encode_cursor(NEXT, *boundary[0])
+
+
+def get_legacy_page_redirect(
+    request: HttpRequest,
+    post_list: QuerySet
+) -> Optional[HttpResponseRedirect]:
+    """Редирект со старых ссылок ?page=N на курсорную пагинацию."""
+    if 'page' not in request.GET:
+        return None
+    cursor = get_legacy_page_cursor(request.GET['page'], post_list)
+    if cursor is None:
+        return redirect(request.path)
+    return redirect(f'{request.path}?cursor={cursor}')
@@ -1,66 +1,131 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseBadRequest
 from django.shortcuts import get_object_or_404, redirect, render
-
+from django.views.decorators.http import require_POST
+
+from core.querytrace import query_budget
+from core.routers import read_position
+from core.writer import write
+
+from .conditional import (conditional_page, follow_validators,
+                          group_validators, index_validators, load_author,
+                          load_group, load_post, post_validators,
+                          profile_validators)
+from .counters import get_user_stats
+from .feed_cache import author_scope, get_feed_version, group_scope
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import get_page_obj
-
-
+from .models import Post, User
+from .mutations import (change_follows, create_comment, create_post,
+                        edit_post, follow_authors, unfollow_authors)
+from .search import search as search_posts
+from .suggestions import get_follow_suggestions
+from .timeline import get_timeline_page
+from .trending import get_trending_posts
+from .utils import (get_comments_page, get_legacy_page_redirect,
+                    get_page_obj)
+
+
+@query_budget(5)
+@conditional_page(index_validators)
 def index(request):
     template = 'posts/index.html'
 
     post_list = Post.objects.select_related('group', 'author')
-    page_number = request.GET.get('page')
-    page_obj = get_page_obj(page_number, post_list)
+    legacy_redirect = get_legacy_page_redirect(request, post_list)
+    if legacy_redirect:
+        return legacy_redirect
+    page_obj = get_page_obj(request.GET.get('cursor'), post_list)
     index = True
 
-    context = {'page_obj': page_obj, 'index': index}
+    context = {
+        'page_obj': page_obj,
+        'index': index,
+        'feed_version': get_feed_version(),
+        'read_position': read_position(),
+    }
     return render(request, template, context)
 
 
+@query_budget(4)
+@conditional_page(group_validators)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
 
-    group = get_object_or_404(Group, slug=slug)
+    group = load_group(request, slug)
     post_list = group.posts.select_related('author')
-    page_number = request.GET.get('page')
-    page_obj = get_page_obj(page_number, post_list)
+    legacy_redirect = get_legacy_page_redirect(request, post_list)
+    if legacy_redirect:
+        return legacy_redirect
+    page_obj = get_page_obj(request.GET.get('cursor'), post_list)
 
     context = {
         'group': group,
         'page_obj': page_obj,
+        'feed_version': get_feed_version(group_scope(group.pk)),
+        'read_position': read_position(),
     }
     return render(request, template, context)
 
 
+@query_budget(6)
+@conditional_page(profile_validators)
 def profile(request, username):
     template = 'posts/profile.html'
 
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    page_number = request.GET.get('page')
-    page_obj = get_page_obj(page_number, post_list)
+    author = load_author(request, username)
+    post_list = author.posts.select_related('group')
+    legacy_redirect = get_legacy_page_redirect(request, post_list)
+    if legacy_redirect:
+        return legacy_redirect
+    page_obj = get_page_obj(request.GET.get('cursor'), post_list)
     if not request.user.is_authenticated:
         following = None
     else:
-        following = author.following.filter(user=request.user).exists()
+        following = author.is_followed
 
     context = {
         'author': author,
+        'stats': get_user_stats(author),
         'page_obj': page_obj,
         'following': following,
+        'feed_version': get_feed_version(author_scope(author.pk)),
+        'read_position': read_position(),
+        'suggestions': get_follow_suggestions(request.user),
+    }
+    return render(request, template, context)
+
+
+@query_budget(3)
+def trending(request):
+    template = 'posts/trending.html'
+    context = {'posts': get_trending_posts()}
+    return render(request, template, context)
+
+
+@query_budget(4)
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '')
+    hits, next_cursor = search_posts(query, request.GET.get('cursor'))
+    context = {
+        'query': query,
+        'hits': hits,
+        'next_cursor': next_cursor,
     }
     return render(request, template, context)
 
 
+@query_budget(4)
+@conditional_page(post_validators)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
 
     form = CommentForm(request.POST or None)
-    post = get_object_or_404(Post, id=post_id)
+    post = load_post(request, post_id)
     text = post.text
-    num_posts = post.author.posts.count()
-    post_comments = post.comments.all()
+    num_posts = get_user_stats(post.author).posts_count
+    post_comments = get_comments_page(post.pk, request.GET.get('cursor'))
 
     context = {
         'post': post,
@@ -72,6 +137,16 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+@query_budget(3)
+def post_comments(request, post_id):
+    template = 'posts/includes/comments.html'
+
+    comments = get_comments_page(post_id, request.GET.get('cursor'))
+    context = {'comments': comments, 'post_id': post_id}
+    return render(request, template, context)
+
+
+@query_budget(15)
 @login_required
 def post_create(request):
     template = 'posts/post_create.html'
@@ -87,18 +162,17 @@ def post_create(request):
     if not form.is_valid():
         return render(request, template, {'form': form})
 
-    post = form.save(commit=False)
-    post.author = request.user
-    form.save(commit=True)
+    write(create_post, form, request.user)
     return redirect('posts:profile', username=request.user)
 
 
+@query_budget(10)
 @login_required
 def post_edit(request, post_id):
     template = 'posts/post_create.html'
 
     post = get_object_or_404(Post, id=post_id)
-    if post.author != request.user:
+    if post.author_id != request.user.pk:
         return redirect('posts:post_detail', post_id)
 
     is_edit = True
@@ -124,55 +198,70 @@ def post_edit(request, post_id):
         }
         return render(request, template, context)
 
-    form.save()
+    write(edit_post, form)
     return redirect('posts:post_detail', post_id)
 
 
+@query_budget(9)
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
-        comment = form.save(commit=False)
-        comment.author = request.user
-        comment.post = post
-        comment.save()
+        write(create_comment, form, post, request.user)
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(8)
 @login_required
+@conditional_page(follow_validators)
 def follow_index(request):
     template = 'posts/follow.html'
 
     following = request.user.follower.values_list('author')
-    post_list = Post.objects.select_related('group', 'author').filter(
-        author_id__in=following
-    )
-    page_number = request.GET.get('page')
-    page_obj = get_page_obj(page_number, post_list)
+    post_list = Post.objects.filter(author_id__in=following)
+    legacy_redirect = get_legacy_page_redirect(request, post_list)
+    if legacy_redirect:
+        return legacy_redirect
+    page_obj = get_timeline_page(request.user, request.GET.get('cursor'))
     follow = True
 
-    context = {'page_obj': page_obj, 'follow': follow}
+    context = {
+        'page_obj': page_obj,
+        'follow': follow,
+        'suggestions': get_follow_suggestions(request.user),
+    }
     return render(request, template, context)
 
 
+@query_budget(10)
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
-    is_exist = Follow.objects.filter(
-        user=request.user, author=author
-    ).exists()
-    if request.user != author and not is_exist:
-        Follow.objects.get_or_create(
-            user=request.user,
-            author=author
-        )
+    if not write(follow_authors, request.user, [username]):
+        # Подписка уже была, это сам пользователь или такого автора нет.
+        get_object_or_404(User, username=username)
     return redirect('posts:profile', username=username)
 
 
+# Без бюджета: обработчики post_save и post_delete делают запросы
+# на каждую подписку пачки.
+@login_required
+@require_POST
+def follow_batch(request):
+    follow = request.POST.getlist('follow')
+    unfollow = request.POST.getlist('unfollow')
+    if len(follow) + len(unfollow) > settings.FOLLOW_BATCH_MAX:
+        return HttpResponseBadRequest(
+            f'Не больше {settings.FOLLOW_BATCH_MAX} авторов за раз'
+        )
+    write(change_follows, request.user, follow, unfollow)
+    return redirect('posts:follow_index')
+
+
+@query_budget(6)
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-    delete_author = Follow.objects.filter(user=request.user, author=author)
-    delete_author.delete()
+    if not write(unfollow_authors, request.user, [username]):
+        # Подписки не было или такого автора нет.
+        get_object_or_404(User, username=username)
     return redirect('posts:profile', username=username)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
 
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -55,6 +57,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.QueryTraceMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
+    'core.middleware.WriteQueueMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -62,6 +67,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    # Последним: рендеринг панели debug_toolbar не попадает в профиль
+    'core.middleware.TemplateProfileMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -90,12 +97,49 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Настройка каждого нового соединения SQLite (core.backends.sqlite3).
+# WAL: читатели не ждут писателя; synchronous=NORMAL в режиме WAL
+# сохраняет согласованность базы; busy_timeout, мс - сколько писатель
+# ждет блокировку; cache_size < 0 - размер кэша страниц в КиБ.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,
+}
+
+# CONN_MAX_AGE: соединение переиспользуется запросами потока, пока
+# не старше указанного числа секунд.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'pragmas': SQLITE_PRAGMAS,
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
 }
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Реплики для чтения GET-запросов; пустой список - всё читается из default.
+# Реплика - копия файла основной базы db.<имя>.sqlite3, ее обновляет
+# manage.py sync_replicas.
+# Реплика с меткой старше REPLICA_MAX_LAG секунд не используется, метки
+# перечитываются не чаще раза в REPLICA_LAG_CHECK_INTERVAL секунд.
+DATABASE_REPLICAS: list = []
+DATABASES.update({
+    alias: {
+        'ENGINE': 'core.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {'pragmas': SQLITE_PRAGMAS},
+    }
+    for alias in DATABASE_REPLICAS
+})
+REPLICA_MAX_LAG: int = 30
+REPLICA_LAG_CHECK_INTERVAL: int = 5
 
 
 # Password validation
@@ -149,14 +193,109 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# default: LRU в памяти процесса поверх общего для воркеров файлового кэша
 CACHES = {
     'default': {
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': 'yatube',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 60,
+            'GENERATION_CHECK_INTERVAL': 1,
+        },
+    },
+    # MAX_ENTRIES по умолчанию (300) меньше L1 одного воркера: L2
+    # вытеснял бы записи раньше, чем их успевают прочитать.
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'django_cache'),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+# Тесты (manage.py test, pytest) вызывают cache.clear(): им отдельный L2
+# в памяти, чтобы не стирать файловый кэш разработки.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    CACHES['shared'] = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'yatube-tests',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
     }
-}
 
 NUM_POSTS: int = 10
+NUM_COMMENTS: int = 20
+# Наибольший размер страницы JSON API (?limit=)
+API_MAX_LIMIT: int = 100
+# RSS/Atom: число постов в документе и срок хранения готового документа.
+# Документ хранится под версией ленты и сбрасывается новым постом.
+SYNDICATION_ITEMS: int = 20
+SYNDICATION_CACHE_TIMEOUT: int = 60 * 60 * 24
 
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Глубже этой страницы старые ссылки ?page=N не пересчитываются
+MAX_PAGE_NUMBER: int = 100
+
+# Посты авторов с большим числом подписчиков не раскладываются по лентам
+# подписчиков, а читаются напрямую при показе follow_index
+TIMELINE_FANOUT_LIMIT: int = 1000
+TIMELINE_BATCH_SIZE: int = 500
+TIMELINE_CELEBRITIES_TIMEOUT: int = 600
+
+# Панель «Кого почитать»: сколько авторов показывать и сколько хранить
+# на пользователя (запас на тех, на кого подпишутся до пересчета).
+FOLLOW_SUGGESTIONS: int = 5
+FOLLOW_SUGGESTIONS_STORED: int = 20
+# Сколько авторов можно подписать и отписать одним запросом follow_batch
+FOLLOW_BATCH_MAX: int = 100
+
+# Популярное: вес событий затухает вдвое за TRENDING_HALF_LIFE секунд.
+# renormalize_trending переносит оценки к текущему моменту и удаляет
+# оценки меньше TRENDING_MIN_SCORE (веса свежего комментария).
+TRENDING_HALF_LIFE: int = 12 * 60 * 60
+TRENDING_COMMENT_WEIGHT: float = 1.0
+TRENDING_FOLLOW_WEIGHT: float = 2.0
+TRENDING_MIN_SCORE: float = 0.01
+TRENDING_POSTS: int = 20
+
+# Размеры превью, которые фоновый воркер готовит для картинок постов.
+# Шаблоны показывают только готовые превью, до этого - заглушку.
+THUMBNAIL_GEOMETRIES = {
+    '960x339': {'crop': 'center', 'upscale': True},
+}
+
+# Обработка загруженных картинок: проверка размеров по заголовку,
+# поворот по EXIF, удаление метаданных и уменьшение до IMAGE_MAX_SIDE.
+# Перекодирование идет в пуле из IMAGE_INGEST_WORKERS процессов,
+# 0 - обработка в процессе запроса.
+IMAGE_MAX_PIXELS: int = 40_000_000
+IMAGE_MAX_SIDE: int = 1920
+IMAGE_QUALITY: int = 85
+IMAGE_INGEST_WORKERS: int = 2
+IMAGE_INGEST_TIMEOUT: int = 30
+
+# Трассировка SQL по запросам (core.middleware.QueryTraceMiddleware):
+# представление объявляет бюджет декоратором core.querytrace.query_budget,
+# для остальных действует QUERY_BUDGET_DEFAULT (None - без лимита).
+QUERY_TRACE: bool = True
+QUERY_BUDGET_DEFAULT = None
+
+# Профиль рендеринга шаблонов (core.middleware.TemplateProfileMiddleware):
+# время каждого шаблона, {% include %}, тега и переменной по запросам
+# дописывается в TEMPLATE_PROFILE_FILE, отчет - manage.py template_profile.
+TEMPLATE_PROFILE: bool = False
+TEMPLATE_PROFILE_FILE = os.path.join(BASE_DIR, 'template_profile.jsonl')
+
+# Очередь записи (core.writer): создание и правка постов, комментарии
+# и подписки выполняет один поток-писатель процесса, фиксируя до
+# WRITE_QUEUE_MAX_BATCH накопившихся изменений одной транзакцией.
+# False - каждый запрос пишет сам. WRITE_QUEUE_TIMEOUT - сколько
+# запрос ждет, пока писатель возьмется за изменение, секунды; не
+# начатое за это время изменение отменяется, запрос получает 503.
+WRITE_QUEUE: bool = False
+WRITE_QUEUE_MAX_BATCH: int = 64
+WRITE_QUEUE_TIMEOUT: float = 30.0
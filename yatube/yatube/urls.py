@@ -18,11 +18,15 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import cache_stats
+
 urlpatterns = [
+    path('admin/cache-stats/', cache_stats, name='cache_stats'),
     path('admin/', admin.site.urls),
     path('about/', include('about.urls', namespace='about')),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
+    path('api/', include('api.urls', namespace='api')),
     path('', include('posts.urls', namespace='posts')),
 ]
 handler404 = 'core.views.page_not_found'